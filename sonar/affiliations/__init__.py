@@ -16,5 +16,6 @@
 """Affiliations."""
 
 from .affiliation_resolver import AffiliationResolver
+from .matcher import AffiliationMatcher
 
-__all__ = ("AffiliationResolver",)
+__all__ = ("AffiliationMatcher", "AffiliationResolver")
@@ -17,15 +17,24 @@
 
 import csv
 
-from fuzzywuzzy import fuzz
 from werkzeug.utils import cached_property
 
+from .matcher import AffiliationMatcher
+
 CSV_FILE = "./data/affiliations.csv"
 
+# Matches to reject, the first column is the lowered variant (empty for all
+# variants) and the second the term which invalidates the match when it is
+# contained in the searched affiliation.
+REJECTIONS_FILE = "./data/affiliations_rejections.csv"
+
 
 class AffiliationResolver:
     """Affiliation resolver."""
 
+    # Compiled matcher, shared by all instances of the process.
+    _matcher = None
+
     @cached_property
     def affiliations(self):
         """List of affiliations retrieved from a dedicated file.
@@ -47,6 +56,26 @@ class AffiliationResolver:
 
         return affiliations
 
+    @cached_property
+    def rejections(self):
+        """List of rejected matches retrieved from a dedicated file.
+
+        :returns: List of tuples (variant, term).
+        """
+        with open(REJECTIONS_FILE) as file:
+            reader = csv.reader(file, delimiter="\t")
+            return [(row[0] or None, row[1]) for row in reader if len(row) > 1 and row[1]]
+
+    @property
+    def matcher(self):
+        """Compiled matcher, built once per process.
+
+        :returns: AffiliationMatcher instance.
+        """
+        if not AffiliationResolver._matcher:
+            AffiliationResolver._matcher = AffiliationMatcher(self.affiliations, self.rejections)
+        return AffiliationResolver._matcher
+
     def resolve(self, searched_affiliation):
         """Resolve affiliations from given parameter.
 
@@ -56,27 +85,16 @@ class AffiliationResolver:
         if not searched_affiliation:
             return None
 
-        collected_affiliations = []
-        for affiliations in self.affiliations:
-            # the first string in the row is the standard form, to be stored
-            standard_form = affiliations[0]
-            for affiliation in affiliations:
-                score = fuzz.partial_ratio(searched_affiliation, affiliation)
-                if score > 92 and standard_form not in collected_affiliations:
-                    # handle special case UZH / ZHdK
-                    # TODO: solve this special case by converting the CSV file to JSON
-                    # using rejected forms https://github.com/rero/sonar/issues/824
-                    if (
-                        affiliation.lower() == "zurich university"
-                        and "zurich university of the arts" in searched_affiliation.lower()
-                    ):
-                        continue
-                    # handle special case CERN/Lucerne
-                    if affiliation.lower() == "cern" and "lucerne" in searched_affiliation.lower():
-                        continue
-                    # handle special case Freiburg im Breisgau
-                    if "university of freiburg" in searched_affiliation.lower():
-                        break
-
-                    collected_affiliations.append(standard_form)
-        return collected_affiliations
+        return list(self.matcher.resolve(searched_affiliation))
+
+    def resolve_many(self, searched_affiliations):
+        """Resolve several affiliations at once.
+
+        Each distinct string is resolved only once.
+
+        :param searched_affiliations: List of affiliations to match.
+        :returns: Dictionary of matching affiliations, keyed by searched
+            affiliation.
+        """
+        matcher = self.matcher
+        return {value: list(matcher.resolve(value)) for value in dict.fromkeys(filter(None, searched_affiliations))}
@@ -0,0 +1,163 @@
+# Swiss Open Access Repository
+# Copyright (C) 2021 RERO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Precompiled affiliation matcher."""
+
+import math
+from collections import Counter, defaultdict
+from functools import lru_cache
+
+from fuzzywuzzy import fuzz
+
+# A variant matches when its partial ratio is strictly greater than this score.
+MIN_SCORE = 92
+
+# Lower bound of the similarity ratio needed to reach a score > `MIN_SCORE`.
+# It is slightly below the real limit (0.925) to stay on the safe side of
+# rounding, so that the prefilter never discards a real match.
+MIN_RATIO = 0.92
+
+# Maximum share of bigrams of the shorter string which can be broken by the
+# edit operations needed to reach `MIN_RATIO`. Each unmatched character breaks
+# at most two bigrams and the number of unmatched characters is bounded by
+# (2 - 2 * ratio) / ratio * length.
+MAX_BROKEN_BIGRAMS = 2 * (2 - 2 * MIN_RATIO) / MIN_RATIO
+
+# Under this length, a string can only reach `MIN_RATIO` if it is entirely
+# contained in the other one.
+MIN_FUZZY_LENGTH = math.ceil(1 / (1 - MIN_RATIO / (2 - MIN_RATIO)))
+
+# Number of resolved affiliation strings kept in memory per process.
+MEMO_SIZE = 10000
+
+
+def bigrams(value):
+    """Get the list of bigrams of a string.
+
+    :param value: String to split.
+    :returns: List of bigrams, in order and with duplicates.
+    """
+    return [value[index : index + 2] for index in range(len(value) - 1)]
+
+
+class AffiliationMatcher:
+    """Affiliation matcher compiled from the affiliations list.
+
+    The matcher gives exactly the same results as comparing the searched
+    string with each variant using `fuzz.partial_ratio`, but the comparison is
+    only done for the variants sharing enough bigrams with the searched string
+    to be able to reach the minimum score.
+    """
+
+    def __init__(self, affiliations, rejections=None):
+        """Compile the matcher.
+
+        :param affiliations: List of affiliations, each one being a list of
+            variants starting with the standard form.
+        :param rejections: List of tuples (variant, term). A match on the
+            variant is rejected if the searched string contains the term. A
+            `None` variant rejects all matches.
+        """
+        self.standard_forms = []
+        # List of tuples (row index, variant) for each variant.
+        self.variants = []
+        self.exact = defaultdict(list)
+        self.bigrams_index = defaultdict(list)
+        self.rejected_terms = []
+        self.rejected_variants = defaultdict(list)
+
+        for row, affiliation in enumerate(affiliations):
+            self.standard_forms.append(affiliation[0])
+            for variant in affiliation:
+                variant_id = len(self.variants)
+                self.variants.append((row, variant))
+                self.exact[variant].append(variant_id)
+                for bigram, count in Counter(bigrams(variant)).items():
+                    self.bigrams_index[bigram].append((variant_id, count))
+
+        for variant, term in rejections or []:
+            if variant:
+                self.rejected_variants[variant.lower()].append(term.lower())
+            else:
+                self.rejected_terms.append(term.lower())
+
+        self.resolve = lru_cache(maxsize=MEMO_SIZE)(self._resolve)
+
+    def is_rejected(self, variant, searched_affiliation):
+        """Check if the match between a variant and the searched string is rejected.
+
+        :param variant: Matching variant.
+        :param searched_affiliation: Lowered searched string.
+        :returns: True if the match has to be ignored.
+        """
+        return any(term in searched_affiliation for term in self.rejected_variants.get(variant.lower(), []))
+
+    def candidates(self, searched_affiliation):
+        """Get the variants which can possibly match the searched string.
+
+        :param searched_affiliation: Searched string.
+        :returns: Set of variant ids.
+        """
+        searched_length = len(searched_affiliation)
+        # Number of bigrams of the variant found in the searched string.
+        variant_hits = defaultdict(int)
+        # Number of bigrams of the searched string found in the variant.
+        searched_hits = defaultdict(int)
+        for bigram, count in Counter(bigrams(searched_affiliation)).items():
+            for variant_id, variant_count in self.bigrams_index.get(bigram, []):
+                variant_hits[variant_id] += variant_count
+                searched_hits[variant_id] += count
+
+        candidates = set()
+        for variant_id, (_, variant) in enumerate(self.variants):
+            if len(variant) <= searched_length:
+                shorter, longer, hits = variant, searched_affiliation, variant_hits
+            else:
+                shorter, longer, hits = searched_affiliation, variant, searched_hits
+
+            length = len(shorter)
+            if length < MIN_FUZZY_LENGTH:
+                if shorter in longer:
+                    candidates.add(variant_id)
+            elif hits[variant_id] >= length - 1 - math.ceil(MAX_BROKEN_BIGRAMS * length):
+                candidates.add(variant_id)
+        return candidates
+
+    def _resolve(self, searched_affiliation):
+        """Resolve the standard forms matching the searched string.
+
+        :param searched_affiliation: Affiliation to match.
+        :returns: Tuple of matching standard forms.
+        """
+        lowered = searched_affiliation.lower()
+        if any(term in lowered for term in self.rejected_terms):
+            return ()
+
+        exact = set(self.exact.get(searched_affiliation, []))
+        candidates = self.candidates(searched_affiliation) | exact
+
+        collected_affiliations = []
+        for variant_id in sorted(candidates):
+            row, variant = self.variants[variant_id]
+            standard_form = self.standard_forms[row]
+            if standard_form in collected_affiliations:
+                continue
+            if variant_id not in exact and fuzz.partial_ratio(searched_affiliation, variant) <= MIN_SCORE:
+                continue
+            if self.is_rejected(variant, lowered):
+                continue
+            collected_affiliations.append(standard_form)
+
+        return tuple(collected_affiliations)
@@ -0,0 +1,39 @@
+# SONAR
+# Copyright (C) 2022 RERO+
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Index the identifiers of the records."""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "8c1d4e2f7a93"
+down_revision = "e1eb7549728f"
+branch_labels = ()
+depends_on = None
+
+
+def upgrade():
+    """Upgrade database."""
+    # Used for the containment queries on identifiers, see
+    # `DocumentRecord.get_records_by_identifiers`.
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_records_metadata_identified_by "
+        "ON records_metadata USING gin ((json -> 'identifiedBy') jsonb_path_ops)"
+    )
+
+
+def downgrade():
+    """Downgrade database."""
+    op.execute("DROP INDEX IF EXISTS ix_records_metadata_identified_by")
@@ -24,6 +24,11 @@ SONAR_APP_PRODUCTION_STATE = False
 
 SONAR_APP_SITEMAP_ENTRY_SIZE = 10000
 
+SONAR_APP_SITEMAP_INCREMENTAL = True
+"""Only rewrite the sitemap files containing documents updated since the
+last generation. Files are compared with the fingerprints stored in
+`sitemap.json`."""
+
 SONAR_APP_LANGUAGES_MAP = {
     "aar": "aa",
     "abk": "ab",
@@ -531,6 +536,59 @@ SONAR_APP_DEFAULT_ORGANISATION = "global"
 SONAR_APP_STORAGE_PATH = None
 """File storage location."""
 
+SONAR_APP_INDEXER_REFRESH = "refresh"
+"""Refresh policy applied after indexing or deleting a single record.
+
+- `flush`: flush and refresh the index.
+- `refresh`: refresh the index, without forcing a flush.
+- `wait_for`: the request waits for the next periodic refresh of the index.
+- `deferred`: writes done in `SONAR_APP_INDEXER_REFRESH_WINDOW` are made
+  visible by one refresh per index.
+- `none`: no refresh, for bulk operations.
+"""
+
+SONAR_APP_INDEXER_REFRESH_WINDOW = 1
+"""Delay in seconds before running a deferred refresh."""
+
+SONAR_APP_DOWNLOAD_WORKERS = 8
+"""Number of concurrent downloads of external files during imports."""
+
+SONAR_APP_DOWNLOAD_WORKERS_PER_HOST = 4
+"""Number of concurrent downloads of external files on the same host."""
+
+SONAR_APP_DOWNLOAD_TIMEOUT = (10, 60)
+"""Connect and read timeouts in seconds for the downloads of external files."""
+
+SONAR_APP_DOWNLOAD_RETRIES = 3
+"""Number of retries, with exponential backoff, for the downloads of
+external files."""
+
+SONAR_APP_REFS_CACHE_TTL = 300
+"""Lifetime in seconds of the resources linked by `$ref` cached during bulk
+indexing. Resources updated in the same process are invalidated at once."""
+
+SONAR_APP_REFS_CACHE_PREFETCH = 100
+"""Number of records whose linked resources are loaded at once during bulk
+indexing, 0 to load the resources one by one."""
+
+SONAR_APP_BUCKETS_CACHE_SIZE = 10000
+"""Number of buckets whose record PID is kept in memory, used to find the
+record of a file without querying the links between records and buckets."""
+
+SONAR_APP_DATA_INTEGRITY_WORKERS = 4
+"""Number of resources checked concurrently by the data integrity
+monitoring."""
+
+SONAR_APP_DATA_INTEGRITY_CACHE_TTL = 300
+"""Lifetime in seconds of the data integrity results, shared by all processes
+through the application cache. 0 to disable the cache."""
+
+SONAR_APP_DC_CACHE_TIMEOUT = 24 * 60 * 60
+"""Lifetime in seconds of the Dublin Core serializations of the documents
+(OAI-PMH and REST), shared by all processes through the application cache.
+Entries are rebuilt when the document or an organisation is modified. 0 to
+disable the cache."""
+
 SONAR_APP_EXPORT_SERIALIZERS = {
     "org": ("sonar.modules.organisations.serializers.schemas.export:ExportSchemaV1"),
     "user": ("sonar.modules.users.serializers.schemas.export:ExportSchemaV1"),
@@ -578,6 +636,9 @@ SONAR_APP_ARK_SCHEME = "ark:"
 """ARK scheme."""
 SONAR_APP_ARK_SHOULDER = "ffk3"
 """ARK Shoulder, can be multiple for a given organisation."""
+SONAR_APP_ARK_CACHE_TIMEOUT = 24 * 60 * 60
+"""Lifetime in seconds of the resolved ARK identifiers, shared by all
+processes through the application cache. 0 to disable the cache."""
 
 SONAR_APP_SWISSCOVERY_SEARCH_URL = "https://swisscovery.slsp.ch/view/sru/41SLSP_NETWORK"
 SONAR_APP_SWISSCOVERY_SEARCH_VERSION = "1.1"
@@ -610,6 +671,10 @@ SONAR_APP_URN_DNB_BASE_URL = ""
 SONAR_APP_URN_DNB_USERNAME = ""
 SONAR_APP_URN_DNB_PASSWORD = ""
 SONAR_APP_URN_DNB_BASE_URN = "urn:nbn:ch:rero-"
+SONAR_APP_URN_DNB_RATE_LIMIT = 10
+"""Maximum number of requests by second to the DNB REST API."""
+SONAR_APP_URN_DNB_TIMEOUT = 30
+"""Timeout in seconds of the requests to the DNB REST API."""
 
 # DOCUMENT LICENSE CC
 SONAR_APP_DOCUMENT_LICENSES = {
@@ -24,6 +24,11 @@ from flask_security import user_registered
 from flask_wiki import Wiki
 from invenio_files_rest.signals import file_deleted, file_downloaded, file_uploaded
 from invenio_indexer.signals import before_record_index
+from invenio_records.signals import (
+    after_record_delete,
+    after_record_insert,
+    after_record_update,
+)
 from werkzeug.datastructures import MIMEAccept
 
 from sonar.filters import (
@@ -36,12 +41,15 @@ from sonar.filters import (
     nl2br,
     organisation_platform_name,
 )
+from sonar.modules.api import invalidate_bucket_record
+from sonar.modules.metadata_cache import metadata_cache
 from sonar.modules.permissions import (
     has_admin_access,
     has_submitter_access,
     has_superuser_access,
 )
 from sonar.modules.receivers import file_deleted_listener, file_uploaded_listener
+from sonar.modules.refs_cache import invalidate_record
 from sonar.modules.users.api import current_user_record
 from sonar.modules.users.signals import add_full_name, user_registered_handler
 from sonar.modules.utils import (
@@ -114,6 +122,15 @@ class SonarBase:
         # Add user's full name before record index
         before_record_index.connect(add_full_name, weak=False)
 
+        # Invalidate cached linked resources when a record changes
+        after_record_update.connect(invalidate_record, weak=False)
+        after_record_delete.connect(invalidate_record, weak=False)
+        after_record_update.connect(invalidate_bucket_record, weak=False)
+        after_record_delete.connect(invalidate_bucket_record, weak=False)
+        after_record_insert.connect(metadata_cache.invalidate, weak=False)
+        after_record_update.connect(metadata_cache.invalidate, weak=False)
+        after_record_delete.connect(metadata_cache.invalidate, weak=False)
+
     def init_config(self, app):
         """Initialize configuration."""
         for k in dir(config_sonar):
@@ -17,19 +17,23 @@
 
 import os.path
 import re
+import threading
+from collections import OrderedDict
+from contextlib import nullcontext, suppress
 from copy import deepcopy
 from io import BytesIO
-from uuid import uuid4
+from uuid import UUID, uuid4
 
-import requests
-from flask import current_app
+from flask import current_app, g, has_request_context
 from invenio_db import db
 from invenio_files_rest.helpers import compute_md5_checksum
+from invenio_files_rest.models import ObjectVersion
 from invenio_indexer import current_record_to_index
 from invenio_indexer.api import RecordIndexer
 from invenio_jsonschemas import current_jsonschemas
 from invenio_pidstore.errors import PIDDoesNotExistError
 from invenio_pidstore.models import PersistentIdentifier, PIDStatus
+from invenio_records.models import RecordMetadata
 from invenio_records_files.api import FileObject as InvenioFileObjet
 from invenio_records_files.api import FilesMixin as InvenioFilesMixin
 from invenio_records_files.api import Record
@@ -37,8 +41,41 @@ from invenio_records_files.models import RecordsBuckets
 from invenio_records_rest.utils import obj_or_import_string
 from invenio_search import current_search
 from invenio_search.api import RecordsSearch
+from invenio_search.utils import build_alias_name
 from sqlalchemy.orm.exc import NoResultFound
 
+from .downloader import FileDownloader
+from .refresh import (
+    REFRESH_DEFERRED,
+    REFRESH_FLUSH,
+    REFRESH_IMMEDIATE,
+    REFRESH_WAIT_FOR,
+    get_index_alias,
+    get_refresh_policy,
+    refresh_metrics,
+    refresh_scheduler,
+)
+from .refs_cache import get_refs_cache, refs_cache
+from .utils import batched
+
+# Persistent identifiers (type, value) of the records owning the buckets,
+# keyed by bucket id, least recently used first. A bucket never changes of
+# record, only the PID is checked again when the record is loaded.
+_buckets_pids = OrderedDict()
+_buckets_pids_lock = threading.Lock()
+
+
+def invalidate_bucket_record(sender, record, *args, **kwargs):
+    """Remove an updated or deleted record from the buckets identity map.
+
+    :param record: Record.
+    """
+    if has_request_context():
+        records = g.get("records_by_bucket", {})
+        for bucket, bucket_record in list(records.items()):
+            if bucket_record is not None and bucket_record.id == record.id:
+                del records[bucket]
+
 
 class FileObject(InvenioFileObjet):
     """Wrapper for files."""
@@ -170,39 +207,115 @@ class SonarRecord(Record, FilesMixin):
         :param bucket: Bucket ID.
         :returns: Record corresponding to bucket or None.
         """
-        try:
-            # Find the record bucket object.
-            try:
-                records_buckets = RecordsBuckets.query.filter_by(bucket_id=bucket).first()
-            except Exception:
-                raise Exception("`records_buckets` object not found.")
+        return SonarRecord.get_records_by_buckets([bucket]).get(str(bucket))
+
+    @staticmethod
+    def get_records_by_buckets(buckets, memoize=False):
+        """Find the records corresponding to the given buckets.
+
+        The PIDs of the records are kept in a process cache of
+        `SONAR_APP_BUCKETS_CACHE_SIZE` buckets, records are loaded with one
+        query by type of record.
+
+        :param buckets: List of bucket IDs.
+        :param memoize: Keep the records for the current request, the same
+            instance is returned for a bucket until the record is updated.
+        :returns: Dictionary of records (None if not found), keyed by bucket ID.
+        """
+        buckets = [str(bucket) for bucket in buckets]
+        identity_map = {}
+        if memoize and has_request_context():
+            identity_map = g.setdefault("records_by_bucket", {})
+
+        records = {bucket: identity_map[bucket] for bucket in buckets if bucket in identity_map}
+        if missing := [bucket for bucket in buckets if bucket not in records]:
+            loaded = SonarRecord._load_records_by_buckets(missing)
+            for bucket in missing:
+                records[bucket] = loaded.get(bucket)
+                if memoize:
+                    identity_map[bucket] = records[bucket]
+        return records
 
-            # Find the record PID.
+    @staticmethod
+    def _get_pids_by_buckets(buckets):
+        """Get the PIDs of the records owning the buckets.
 
+        :param buckets: List of valid bucket IDs.
+        :returns: Dictionary of tuples (pid type, pid value), keyed by bucket ID.
+        """
+        pids = {}
+        with _buckets_pids_lock:
+            for bucket in buckets:
+                if bucket in _buckets_pids:
+                    _buckets_pids.move_to_end(bucket)
+                    pids[bucket] = _buckets_pids[bucket]
+
+        if missing := [bucket for bucket in buckets if bucket not in pids]:
             # Filter by the declared REST endpoints to avoid identifiers as
             # oai, urn, etc.
             pid_types = [v["pid_type"] for v in current_app.config.get("RECORDS_REST_ENDPOINTS", {}).values()]
-            pid = (
-                PersistentIdentifier.query.filter_by(object_uuid=records_buckets.record_id)
-                .filter(PersistentIdentifier.pid_type.in_(pid_types))
-                .first()
+            query = (
+                db.session.query(
+                    RecordsBuckets.bucket_id, PersistentIdentifier.pid_type, PersistentIdentifier.pid_value
+                )
+                .join(PersistentIdentifier, PersistentIdentifier.object_uuid == RecordsBuckets.record_id)
+                .filter(RecordsBuckets.bucket_id.in_(missing), PersistentIdentifier.pid_type.in_(pid_types))
             )
+            found = {str(bucket): (pid_type, pid_value) for bucket, pid_type, pid_value in query}
+            pids.update(found)
 
-            if not pid:
-                raise Exception("Persistent identifier not found.")
+            size = current_app.config.get("SONAR_APP_BUCKETS_CACHE_SIZE", 0)
+            with _buckets_pids_lock:
+                _buckets_pids.update(found)
+                while len(_buckets_pids) > size:
+                    _buckets_pids.popitem(last=False)
+        return pids
 
-            # Retrieve real record class
-            record_class = current_app.config.get("RECORDS_REST_ENDPOINTS", {}).get(pid.pid_type).get("record_class")
+    @staticmethod
+    def _load_records_by_buckets(buckets):
+        """Load the records owning the buckets.
 
+        :param buckets: List of bucket IDs.
+        :returns: Dictionary of records, keyed by bucket ID, buckets whose
+            record is not found are missing.
+        """
+        valid_buckets = []
+        for bucket in buckets:
+            with suppress(ValueError):
+                valid_buckets.append(str(UUID(bucket)))
+        if not valid_buckets:
+            return {}
+
+        buckets_by_pid = {}
+        for bucket, pid in SonarRecord._get_pids_by_buckets(valid_buckets).items():
+            buckets_by_pid.setdefault(pid, []).append(bucket)
+
+        pid_values_by_type = {}
+        for pid_type, pid_value in buckets_by_pid:
+            pid_values_by_type.setdefault(pid_type, []).append(pid_value)
+
+        records = {}
+        for pid_type, pid_values in pid_values_by_type.items():
+            # Retrieve real record class
+            record_class = SonarRecord.get_record_class_by_pid_type(pid_type)
             if not record_class:
-                raise Exception("Class for record not found.")
-
+                continue
             record_class = obj_or_import_string(record_class)
 
-            # Load record by its PID.
-            return record_class.get_record_by_pid(pid.pid_value)
-        except Exception:
-            return None
+            query = (
+                db.session.query(PersistentIdentifier.pid_value, RecordMetadata)
+                .join(RecordMetadata, RecordMetadata.id == PersistentIdentifier.object_uuid)
+                .filter(
+                    PersistentIdentifier.pid_type == pid_type,
+                    PersistentIdentifier.pid_value.in_(pid_values),
+                    RecordMetadata.json.isnot(None),
+                )
+            )
+            for pid_value, model in query:
+                record = record_class(model.json, model=model)
+                for bucket in buckets_by_pid[(pid_type, pid_value)]:
+                    records[bucket] = record
+        return records
 
     def resolve(self):
         """Resolve references data.
@@ -218,23 +331,26 @@ class SonarRecord(Record, FilesMixin):
         indexer = self.get_indexer_class()
         indexer().index(self)
 
-    def add_file_from_url(self, url, key, **kwargs):
+    def add_file_from_url(self, url, key, downloader=None, **kwargs):
         """Add file to record by getting data from given url.
 
         :param str url: External URL of the file
         :param str key: File key
+        :param downloader: FileDownloader instance, which may have already
+            downloaded the file. A new one is used if not set.
 
         for kwargs, see add_file method below.
         """
         kwargs["external_url"] = url
-        result = requests.get(url)
-        if result.status_code == 200:
-            self.add_file(result.content, key, **kwargs)
-        else:
-            # File cannot be downloaded, keep the link to the external source.
-            # And create an empty file.
-            kwargs["force_external_url"] = True
-            self.add_file(b"", key, **kwargs)
+        with nullcontext(downloader) if downloader else FileDownloader() as file_downloader:
+            if file_path := file_downloader.get(url):
+                with open(file_path, "rb") as file:
+                    self.add_file(file, key, **kwargs)
+            else:
+                # File cannot be downloaded, keep the link to the external
+                # source. And create an empty file.
+                kwargs["force_external_url"] = True
+                self.add_file(b"", key, **kwargs)
 
     def replace_refs(self):
         """Replace the ``$ref`` keys within the JSON.
@@ -249,21 +365,56 @@ class SonarRecord(Record, FilesMixin):
         kwargs may contain some additional data such as: file label, file type,
         order and url.
 
-        :param data: Binary data of file
+        :param data: Binary data of file, or binary file object
         :param str key: File key
         :returns: File object created.
         """
         if not current_app.config.get("SONAR_DOCUMENTS_IMPORT_FILES"):
             return None
 
+        stream = data if hasattr(data, "read") else BytesIO(data)
+
         # If file with the same key exists and file exists and checksum is
         # the same as the registered file, we don't do anything
-        checksum = compute_md5_checksum(BytesIO(data))
+        checksum = compute_md5_checksum(stream)
         if key in self.files and os.path.isfile(self.files[key].file.uri) and checksum == self.files[key].file.checksum:
             return None
 
         # Create the file
-        self.files[key] = BytesIO(data)
+        stream.seek(0)
+        self.files[key] = stream
+
+        for kwarg_key, kwarg_value in kwargs.items():
+            self.files[key][kwarg_key] = kwarg_value
+
+        return self.files[key]
+
+    def link_file(self, file_instance, key, **kwargs):
+        """Add an existing file to record, without copying its content.
+
+        The file instance, with its checksum, is shared with the objects
+        already pointing to it. It is made read only, so that removing one
+        of the objects never deletes the data of the others.
+
+        for kwargs, see add_file method above.
+
+        :param file_instance: FileInstance of the file.
+        :param str key: File key
+        :returns: File object created.
+        """
+        if not current_app.config.get("SONAR_DOCUMENTS_IMPORT_FILES"):
+            return None
+
+        # The same file is already linked with this key.
+        if key in self.files and self.files[key].file.id == file_instance.id:
+            return None
+
+        files = self.files
+        with db.session.begin_nested():
+            file_instance.writable = False
+            obj = ObjectVersion.create(files.bucket, key, _file_id=file_instance.id)
+            files.filesmap[key] = files.file_cls(obj, {}).dumps()
+            files.flush()
 
         for kwarg_key, kwarg_value in kwargs.items():
             self.files[key][kwarg_key] = kwarg_value
@@ -356,25 +507,91 @@ class SonarIndexer(RecordIndexer):
 
     record_cls = SonarRecord
 
-    def index(self, record):
+    def index(self, record, refresh=None):
         """Indexing a record.
 
         :param record: Record to index.
+        :param refresh: Refresh policy, the configured one is used if not set.
         :returns: Indexation result
         """
-        return_value = super().index(record)
-
-        index_name = current_record_to_index(record)
-        current_search.flush_and_refresh(index_name)
+        policy = get_refresh_policy(refresh)
+        arguments = {"refresh": "wait_for"} if policy == REFRESH_WAIT_FOR else None
+        return_value = super().index(record, arguments=arguments)
+        self.refresh_index(current_record_to_index(record), policy)
         return return_value
 
-    def delete(self, record):
+    def delete(self, record, refresh=None):
         """Delete a record.
 
         :param record: Record to remove from index.
+        :param refresh: Refresh policy, the configured one is used if not set.
         :returns: Indexation result
         """
-        return_value = super().delete(record)
-        index_name = current_record_to_index(record)
-        current_search.flush_and_refresh(index_name)
+        policy = get_refresh_policy(refresh)
+        kwargs = {"refresh": "wait_for"} if policy == REFRESH_WAIT_FOR else {}
+        return_value = super().delete(record, **kwargs)
+        self.refresh_index(current_record_to_index(record), policy)
         return return_value
+
+    def process_bulk_queue(self, search_bulk_kwargs=None, bulk_index_max_items=None):
+        """Process bulk indexing queue.
+
+        Resources linked by the records are cached during the processing.
+
+        :param dict search_bulk_kwargs: Passed to `search.helpers.bulk`.
+        :param int bulk_index_max_items: max number of records to consume.
+        """
+        with refs_cache():
+            return super().process_bulk_queue(
+                search_bulk_kwargs=search_bulk_kwargs, bulk_index_max_items=bulk_index_max_items
+            )
+
+    def _actionsiter(self, message_iterator):
+        """Iterate bulk actions.
+
+        Messages are consumed by batches, and the resources linked by the
+        records of a batch are loaded at once.
+
+        :param message_iterator: Iterator yielding messages from a queue.
+        """
+        batch_size = current_app.config.get("SONAR_APP_REFS_CACHE_PREFETCH")
+        cache = get_refs_cache()
+        if not batch_size or not cache:
+            yield from super()._actionsiter(message_iterator)
+            return
+
+        for messages in batched(message_iterator, batch_size):
+            ids = [payload["id"] for payload in (message.decode() for message in messages) if payload["op"] != "delete"]
+            if ids:
+                cache.prefetch(
+                    json for (json,) in db.session.query(RecordMetadata.json).filter(RecordMetadata.id.in_(ids))
+                )
+            yield from super()._actionsiter(messages)
+
+    @staticmethod
+    def refresh_index(index_name, policy):
+        """Make the last write on the index visible, according to the policy.
+
+        Writes and refreshes are counted by alias of the index.
+
+        :param index_name: Name of the index.
+        :param policy: Refresh policy.
+        """
+        alias_name = build_alias_name(get_index_alias(index_name))
+        refresh_metrics.add_write(alias_name)
+
+        if policy == REFRESH_FLUSH:
+            current_search.flush_and_refresh(index_name)
+        elif policy == REFRESH_IMMEDIATE:
+            current_search.client.indices.refresh(index=alias_name)
+        elif policy == REFRESH_DEFERRED:
+            refresh_scheduler.schedule(
+                current_search.client,
+                alias_name,
+                current_app.config.get("SONAR_APP_INDEXER_REFRESH_WINDOW", 1),
+            )
+            return
+        else:
+            return
+
+        refresh_metrics.add_refresh(alias_name)
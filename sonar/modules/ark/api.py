@@ -17,14 +17,22 @@
 """ARK API."""
 
 import re
+import threading
+import time
 
 from flask import current_app
+from invenio_cache import current_cache
 from invenio_pidstore.models import (
     PersistentIdentifier,
     PIDDoesNotExistError,
     PIDStatus,
 )
 
+from sonar.modules.metadata_cache import metadata_cache
+
+# Ark instances, by NAAN and configuration.
+_instances = {}
+
 
 class Ark:
     """ARK Management API."""
@@ -32,16 +40,23 @@ class Ark:
     def __new__(cls, naan="99999"):
         """Constructor.
 
+        An instance is built once by NAAN, and then reused.
+
         :returns: None if the configuration is not complete.
         :rtype: new Ark instance.
         """
-        cls.init_config()
-        if naan and cls._scheme and cls._shoulder and cls._resolver:
-            cls._naan = naan
-            cls._url_resolve = cls._resolver
-            cls._regex = re.compile(rf"{cls._scheme}/{cls._naan}/{cls._shoulder}(?P<pid>\w+)")
-            return super().__new__(cls)
-        return None
+        config = cls.init_config()
+        if not naan or not all(config):
+            return None
+        key = (naan, *config)
+        if (instance := _instances.get(key)) is None:
+            instance = super().__new__(cls)
+            instance._scheme, instance._shoulder, instance._resolver = config
+            instance._naan = naan
+            instance._url_resolve = instance._resolver
+            instance._regex = re.compile(rf"{instance._scheme}/{naan}/{instance._shoulder}(?P<pid>\w+)")
+            instance = _instances.setdefault(key, instance)
+        return instance
 
     def config(self):
         """String representation with config and urls."""
@@ -55,15 +70,16 @@ config:
 
     @classmethod
     def init_config(cls):
-        """Read the configuation from the current app."""
+        """Read the configuation from the current app.
+
+        :returns: Tuple (scheme, shoulder, resolver).
+        """
         config = current_app.config
-        for conf_key in config:
-            if conf_key.startswith("SONAR_APP_ARK_"):
-                setattr(
-                    cls,
-                    conf_key.replace("SONAR_APP_ARK", "").lower(),
-                    config.get(conf_key),
-                )
+        return (
+            config.get("SONAR_APP_ARK_SCHEME"),
+            config.get("SONAR_APP_ARK_SHOULDER"),
+            config.get("SONAR_APP_ARK_RESOLVER"),
+        )
 
     def ark_from_id(self, pid):
         """Translate an ARK from an id.
@@ -121,3 +137,88 @@ config:
             object_uuid=record_uuid,
             status=PIDStatus.REGISTERED,
         )
+
+
+class ArkResolver:
+    """Resolution of the ARK identifiers of the documents.
+
+    The organisations are found by NAAN in a map loaded once, and reloaded
+    when an organisation changes. The resolved ARK identifiers are kept in
+    the application cache.
+    """
+
+    # Minimum delay in seconds between two loads of the map for unknown NAANs.
+    reload_delay = 60
+
+    prefix = "sonar_ark"
+
+    def __init__(self):
+        """Initialize the resolver."""
+        self._lock = threading.Lock()
+        self._naans = {}
+        self._version = None
+        self._loaded_at = 0
+
+    def get_organisation_code(self, naan):
+        """Get the code of the organisation of a NAAN.
+
+        :param naan: Name Assigning Authority Number.
+        :returns: The code of the organisation or None.
+        """
+        from sonar.modules.organisations.api import OrganisationSearch
+
+        version = metadata_cache.get_version("org")
+        with self._lock:
+            if self._version == version and (
+                naan in self._naans or time.monotonic() - self._loaded_at < self.reload_delay
+            ):
+                return self._naans.get(naan)
+
+        naans = {}
+        for hit in OrganisationSearch().filter("exists", field="arkNAAN").source(["arkNAAN", "code"]).scan():
+            naans.setdefault(hit.arkNAAN, hit.code)
+        with self._lock:
+            self._naans = naans
+            self._version = version
+            self._loaded_at = time.monotonic()
+        return naans.get(naan)
+
+    def get_document_pid(self, ark, ark_id):
+        """Get the document PID of a registered or deleted ARK identifier.
+
+        :param ark: Ark instance of the NAAN.
+        :param ark_id: An ark identifier.
+        :returns: Tuple (document PID, PID status value) or None.
+        """
+        timeout = current_app.config.get("SONAR_APP_ARK_CACHE_TIMEOUT")
+        key = f"{self.prefix}:{ark_id}"
+        if timeout and (entry := current_cache.get(key)):
+            return entry
+
+        pid = ark.get(ark_id)
+        if not pid or not (pid.is_registered() or pid.is_deleted()):
+            return None
+        entry = (ark_id.split("/")[-1].replace(ark._shoulder, ""), pid.status.value)
+        # Registered and deleted identifiers are resolved the same way, the
+        # entry does not change.
+        if timeout:
+            current_cache.set(key, entry, timeout=timeout)
+        return entry
+
+    def resolve(self, naan, path):
+        """Resolve an ARK identifier to a document.
+
+        :param naan: Ark NAAN.
+        :param path: The rest of the ARK identifier.
+        :returns: Tuple (organisation code, document PID) or None.
+        """
+        # None of the organisations has the given naan.
+        if not (code := self.get_organisation_code(naan)):
+            return None
+        # The instance has an ark configuration and this ark pid exists.
+        if (ark := Ark(naan)) and (entry := self.get_document_pid(ark, f"ark:/{naan}/{path}")):
+            return code, entry[0]
+        return None
+
+
+ark_resolver = ArkResolver()
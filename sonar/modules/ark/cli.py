@@ -22,6 +22,7 @@ from invenio_db import db
 
 from sonar.modules.documents.api import DocumentRecord, DocumentSearch
 from sonar.modules.organisations.api import OrganisationRecord
+from sonar.modules.refresh import REFRESH_DEFERRED, refresh_policy
 
 from .api import Ark
 
@@ -82,7 +83,8 @@ def create_missing(organisation_pid):
 
     click.secho(f"Detected {search.count()}", fg="green")
     n = 0
-    with click.progressbar(search.scan()) as bar:
+    # Refreshes of the documents index are coalesced during the loop.
+    with refresh_policy(REFRESH_DEFERRED), click.progressbar(search.scan()) as bar:
         for res in bar:
             doc = DocumentRecord.get_record_by_pid(res.pid)
             pid = ark.create(doc["pid"], record_uuid=doc.id)
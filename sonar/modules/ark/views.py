@@ -17,29 +17,20 @@
 
 from flask import Blueprint, abort, redirect
 
-from sonar.modules.ark.api import Ark
-from sonar.modules.organisations.api import OrganisationSearch
+from sonar.modules.ark.api import ark_resolver
 
 blueprint = Blueprint("ark", __name__)
 
 
-@blueprint.route("/ark:/<naan>/<path>")  # noqa: RET503
+@blueprint.route("/ark:/<naan>/<path>")
 def resolve(naan, path):
     """Resolve a naan and redirect to the right view.
 
     :param naan: str - Ark NAAN.
     :param path: str - the rest of the ARK identifier.
     """
-    code = None
-    if org := OrganisationSearch().get_organisation_from_naan(naan):
-        code = org.code
-    # None of the organisations has the given naan.
-    if not code:
+    if not (target := ark_resolver.resolve(naan, path)):
         abort(404)
-    ark = Ark(naan)
-    # The instance has an ark configuration and this ark pid exists.
-    if ark and (pid := ark.get(f"ark:/{naan}/{path}")) and (pid.is_registered() or pid.is_deleted()):
-        doc_pid = path.replace(ark._shoulder, "")
-        # redirecto to the right view
-        return redirect(f"/{code}/documents/{doc_pid}", code=302)
-    abort(404)
+    code, doc_pid = target
+    # redirect to the right view
+    return redirect(f"/{code}/documents/{doc_pid}", code=302)
@@ -15,11 +15,8 @@
 
 """Utils commands."""
 
-import json
-import pathlib
 import shutil
 import sys
-from os.path import dirname, join
 
 import click
 from flask import current_app
@@ -35,6 +32,7 @@ from werkzeug.local import LocalProxy
 from werkzeug.security import gen_salt
 
 from sonar.modules.api import SonarRecord
+from sonar.modules.exporter import RecordsExporter
 
 _datastore = LocalProxy(lambda: current_app.extensions["security"].datastore)
 
@@ -84,12 +82,24 @@ def clear_files():
 @click.option("-p", "--pid-type", "pid_type", default="doc")
 @click.option("-s", "--serializer", "serializer_key", default="export")
 @click.option("-o", "--output-dir", "output_dir", required=True, type=click.File("w"))
+@click.option("-b", "--batch-size", "batch_size", default=500, type=int)
+@click.option("-w", "--workers", "workers", default=8, type=int)
+@click.option("--resume", is_flag=True, default=False)
+@click.option("--hardlink", is_flag=True, default=False)
 @with_appcontext
-def export(pid_type, serializer_key, output_dir):
+def export(pid_type, serializer_key, output_dir, batch_size, workers, resume, hardlink):
     """Export records for the given record type.
 
+    Records are written to `data.jsonl`, one record by line, and files are
+    copied in a folder by record.
+
     :param pid_type: record type
     :param output_dir: Output directory
+    :param batch_size: Number of records loaded at once.
+    :param workers: Number of files copied concurrently.
+    :param resume: Continue an interrupted export.
+    :param hardlink: Use hard links instead of copies for the files, the
+        exported files must then not be modified.
     """
     click.secho(f'Export "{pid_type}" records in {output_dir.name}')
 
@@ -99,41 +109,24 @@ def export(pid_type, serializer_key, output_dir):
 
         if not record_class:
             raise Exception(f'No record class found for type "{pid_type}"')
+        record_class = obj_or_import_string(record_class)
 
         # Load the serializer
         serializer_class = current_app.config.get("SONAR_APP_EXPORT_SERIALIZERS", {}).get(pid_type)
 
         serializer = obj_or_import_string(serializer_class)() if serializer_class else None
 
-        pids = record_class.get_all_pids()
-        records = []
-
-        # Create ouptut directory if not exists
-        if pids:
-            pathlib.Path(output_dir.name).mkdir(mode=0o755, parents=True, exist_ok=True)
-
-        for pid in pids:
-            record = record_class.get_record_by_pid(pid)
-
-            record = serializer.dump(record) if serializer else record.dumps()
-
-            for file in record.get("files", []):
-                if file.get("uri"):
-                    target_path = join(output_dir.name, pid, file["key"])
-                    pathlib.Path(dirname(target_path)).mkdir(mode=0o755, parents=True, exist_ok=True)
-                    shutil.copyfile(file["uri"], target_path)
-                    file.pop("uri")
-                    file["path"] = f"./{pid}/{file['key']}"
-
-            records.append(record)
-
-        if records:
-            # Write data
-            output_file = join(output_dir.name, "data.json")
-            with open(output_file, "w") as f:
-                f.write(json.dumps(records))
+        exporter = RecordsExporter(
+            record_class,
+            output_dir.name,
+            serializer=serializer,
+            batch_size=batch_size,
+            workers=workers,
+            hardlink=hardlink,
+        )
+        count = exporter.export(resume=resume)
 
-        click.secho("Finished", fg="green")
+        click.secho(f"Finished, {count} records exported", fg="green")
 
     except Exception as err:
         click.secho(f"An error occured during export: {err}", fg="red")
@@ -412,20 +412,19 @@ class DepositRecord(SonarRecord):
             metadata["masked"] = self["diffusion"]["masked"]
         document = DocumentRecord.create(metadata, dbcommit=True, with_bucket=True)
 
+        # The files are linked to the document, their content is not copied.
         for idx, file in enumerate(self.files, start=1):
-            with file.file.storage().open() as pdf_file:
-                content = pdf_file.read()
-                kwargs = {
-                    "label": file.get("label", file["key"]),
-                    "order": file.get("order", idx),
-                }
+            kwargs = {
+                "label": file.get("label", file["key"]),
+                "order": file.get("order", idx),
+            }
 
-                if file.get("embargoDate"):
-                    kwargs["access"] = "coar:c_f1cf"  # Embargoed access
-                    kwargs["embargo_date"] = file["embargoDate"]
-                    kwargs["restricted_outside_organisation"] = file.get("exceptInOrganisation", False)
+            if file.get("embargoDate"):
+                kwargs["access"] = "coar:c_f1cf"  # Embargoed access
+                kwargs["embargo_date"] = file["embargoDate"]
+                kwargs["restricted_outside_organisation"] = file.get("exceptInOrganisation", False)
 
-                document.add_file(content, file["key"], **kwargs)
+            document.link_file(file.file, file["key"], **kwargs)
 
         document.commit()
         document.reindex()
@@ -21,9 +21,15 @@ from functools import partial
 from io import BytesIO
 
 from elasticsearch.exceptions import NotFoundError
-from elasticsearch_dsl import Q
+from elasticsearch_dsl import MultiSearch, Q
 from flask import current_app, request
+from invenio_db import db
+from invenio_pidstore.models import PersistentIdentifier, PIDStatus
+from invenio_records.models import RecordMetadata
+from invenio_search import current_search_client
 from invenio_stats import current_stats
+from sqlalchemy import literal_column, or_, type_coerce
+from sqlalchemy.dialects.postgresql import JSONB
 
 from sonar.affiliations import AffiliationResolver
 from sonar.modules.documents.minters import id_minter
@@ -32,7 +38,7 @@ from sonar.modules.utils import (
     change_filename_extension,
     create_thumbnail_from_file,
     get_current_ip,
-    is_ip_in_list,
+    get_ip_matcher,
 )
 
 from ..api import SonarIndexer, SonarRecord, SonarSearch
@@ -40,6 +46,7 @@ from ..fetchers import id_fetcher
 from ..providers import Provider
 from .dumpers import ReplaceRefsDumper, document_indexer_dumper
 from .extensions import ArkDocumentExtension, UrnDocumentExtension
+from .fulltext import cache_fulltext, defer_file_derivatives, defer_fulltext_extraction
 
 # provider
 DocumentProvider = type("DocumentProvider", (Provider,), {"pid_type": "doc"})
@@ -70,15 +77,16 @@ class DocumentRecord(SonarRecord):
     _extensions = [ArkDocumentExtension(), UrnDocumentExtension()]
 
     @staticmethod
-    def get_permanent_link(host, pid, org=None, ignore_ark=False):
+    def get_permanent_link(host, pid, org=None, ignore_ark=False, document=None):
         """Return the permanent link for the document.
 
         :param host: Application server host.
         :param org: Organisation key.
         :param pid: PID of the document.
+        :param document: Document data, loaded from the PID if not given.
         :returns: Document's full URL as string.
         """
-        doc = DocumentRecord.get_record_by_pid(pid)
+        doc = document if document is not None else DocumentRecord.get_record_by_pid(pid)
         if (ark_url := doc.get_ark_resolver_url()) and not ignore_ark:
             return ark_url
         if not org:
@@ -104,65 +112,169 @@ class DocumentRecord(SonarRecord):
         return list(map(format_hit, results))
 
     @classmethod
-    def create(cls, data, id_=None, dbcommit=False, with_bucket=True, **kwargs):
-        """Create document record."""
-        cls.guess_controlled_affiliations(data)
+    def create(cls, data, id_=None, dbcommit=False, with_bucket=True, affiliations=None, **kwargs):
+        """Create document record.
+
+        :param affiliations: Affiliations already resolved, as returned by
+            `resolve_affiliations`.
+        """
+        cls.guess_controlled_affiliations(data, affiliations)
         return super().create(data, id_=id_, dbcommit=dbcommit, with_bucket=with_bucket, **kwargs)
 
     @classmethod
-    def guess_controlled_affiliations(cls, data):
+    def guess_controlled_affiliations(cls, data, affiliations=None):
         """Guess controlled affiliations.
 
         :param data: Record data.
+        :param affiliations: Affiliations already resolved, as returned by
+            `resolve_affiliations`. Affiliations not found in it are resolved
+            one by one.
         """
+        affiliations = affiliations or {}
         affiliation_resolver = AffiliationResolver()
         for contributor in data.get("contribution", []):
             # remove existing controlled affiliation
             contributor.pop("controlledAffiliation", None)
-            if contributor.get("affiliation") and (
-                controlled_affiliations := affiliation_resolver.resolve(contributor["affiliation"])
-            ):
+            if not (affiliation := contributor.get("affiliation")):
+                continue
+
+            if affiliation in affiliations:
+                controlled_affiliations = list(affiliations[affiliation])
+            else:
+                controlled_affiliations = affiliation_resolver.resolve(affiliation)
+
+            if controlled_affiliations:
                 contributor["controlledAffiliation"] = controlled_affiliations
 
+    @classmethod
+    def resolve_affiliations(cls, records_data):
+        """Resolve the affiliations of the contributors of several records.
+
+        Affiliations repeated across records are resolved only once.
+
+        :param records_data: List of records data.
+        :returns: Dictionary of controlled affiliations keyed by affiliation.
+        """
+        return AffiliationResolver().resolve_many(
+            [contributor.get("affiliation") for data in records_data for contributor in data.get("contribution", [])]
+        )
+
+    @staticmethod
+    def get_search_identifiers(identifiers):
+        """Get the identifiers used to find an existing record.
+
+        Only DOI and local identifiers are analyzed, and only the type, value
+        and source of an identifier are compared.
+
+        :param list identifiers: List of identifiers.
+        :returns: List of identifiers.
+        """
+        return [
+            {key: identifier[key] for key in ["type", "value", "source"] if identifier.get(key)}
+            for identifier in identifiers
+            if identifier["type"] in ["bf:Local", "bf:Doi"]
+        ]
+
     @classmethod
     def get_record_by_identifier(cls, identifiers):
         """Get a record by its identifier.
 
         :param list identifiers: List of identifiers
         """
-        search = DocumentSearch()
+        return cls.get_records_by_identifiers([identifiers])[0]
 
-        # Search only for DOI or local indentifiers.
-        search_identifiers = [identifier for identifier in identifiers if identifier["type"] in ["bf:Local", "bf:Doi"]]
+    @classmethod
+    def get_records_by_identifiers(cls, identifiers_list):
+        """Get the records matching several lists of identifiers at once.
 
-        # No identifiers to analyze
-        if not search_identifiers:
-            return None
+        A record matches when it has all the identifiers of a list. All the
+        lists are searched in one multi search request. If
+        `SONAR_DOCUMENTS_IDENTIFIERS_DB_LOOKUP` is enabled, the lists not
+        found in the index are searched in the database, in case the index
+        lags behind.
+
+        :param list identifiers_list: List of lists of identifiers.
+        :returns: List of records or None, in the same order.
+        """
+        search_identifiers_list = [cls.get_search_identifiers(identifiers) for identifiers in identifiers_list]
+        ids = [None] * len(identifiers_list)
 
         # Construct filters to match the whole identifier (type, value and
         # source). This is possible by configuring the property as `nested`
-        filters = []
-        for identifier in search_identifiers:
-            identifier_filters = [
-                Q("term", identifiedBy__value=identifier["value"]),
-                Q("term", identifiedBy__type=identifier["type"]),
-            ]
-            if identifier.get("source"):
-                identifier_filters.append(Q("term", identifiedBy__source=identifier["source"]))
-
-            filters.append(
+        multi_search = MultiSearch(using=current_search_client)
+        positions = []
+        for position, search_identifiers in enumerate(search_identifiers_list):
+            # No identifiers to analyze
+            if not search_identifiers:
+                continue
+            filters = [
                 Q(
                     "nested",
                     path="identifiedBy",
-                    query=Q("bool", filter=identifier_filters),
+                    query=Q(
+                        "bool",
+                        filter=[Q("term", **{f"identifiedBy__{key}": value}) for key, value in identifier.items()],
+                    ),
                 )
+                for identifier in search_identifiers
+            ]
+            multi_search = multi_search.add(DocumentSearch().query("bool", filter=filters).source(includes=["pid"])[:1])
+            positions.append(position)
+
+        if positions:
+            for position, response in zip(positions, multi_search.execute()):
+                if response.hits:
+                    ids[position] = response.hits[0].meta.id
+
+        missing = [
+            position
+            for position in positions
+            if not ids[position] and current_app.config.get("SONAR_DOCUMENTS_IDENTIFIERS_DB_LOOKUP")
+        ]
+        if missing:
+            for position, record_id in zip(
+                missing, cls._get_ids_by_identifiers_from_db([search_identifiers_list[i] for i in missing])
+            ):
+                ids[position] = record_id
+
+        records = {str(record.id): record for record in cls.get_records([record_id for record_id in ids if record_id])}
+        return [records.get(str(record_id)) if record_id else None for record_id in ids]
+
+    @staticmethod
+    def _get_ids_by_identifiers_from_db(search_identifiers_list):
+        """Get the records matching several lists of identifiers in database.
+
+        The lists are searched in one query, using the JSONB containment on
+        the identifiers of the records (indexed, see the alembic recipes).
+
+        :param list search_identifiers_list: List of lists of identifiers.
+        :returns: List of records IDs or None, in the same order.
+        """
+        # Same expression as the index, as JSONB for the containment operator.
+        identified_by = type_coerce(RecordMetadata.json.op("->")(literal_column("'identifiedBy'")), JSONB)
+        query = (
+            db.session.query(RecordMetadata.id, identified_by)
+            .join(PersistentIdentifier, PersistentIdentifier.object_uuid == RecordMetadata.id)
+            .filter(
+                PersistentIdentifier.pid_type == DocumentProvider.pid_type,
+                PersistentIdentifier.status == PIDStatus.REGISTERED,
+                RecordMetadata.json.isnot(None),
+                or_(*[identified_by.contains(identifiers) for identifiers in search_identifiers_list]),
             )
+        )
 
-        search = search.query("bool", filter=filters).source(includes=["pid"])
-        if results := list(search):
-            return cls.get_record_by_pid(results[0]["pid"])
+        def match(search_identifiers, identifiers):
+            """Check that all the searched identifiers are in identifiers."""
+            return all(
+                any(all(identifier.get(key) == value for key, value in search.items()) for identifier in identifiers)
+                for search in search_identifiers
+            )
 
-        return None
+        rows = query.all()
+        return [
+            next((record_id for record_id, identifiers in rows if match(search_identifiers, identifiers)), None)
+            for search_identifiers in search_identifiers_list
+        ]
 
     def add_file(self, data, key, **kwargs):
         """Create file and add it to record.
@@ -170,18 +282,11 @@ class DocumentRecord(SonarRecord):
         kwargs may contain some additional data such as: file label, file type,
         order and url.
 
-        :param data: Binary data of file
+        :param data: Binary data of file, or binary file object
         :param str key: File key
         :returns: File object created.
         """
-        if not kwargs.get("type"):
-            kwargs["type"] = "file"
-
-        if not kwargs.get("order"):
-            kwargs["order"] = self.get_next_file_order()
-
-        if not kwargs.get("label"):
-            kwargs["label"] = key
+        self.set_file_defaults(key, kwargs)
 
         added_file = super().add_file(data, key, **kwargs)
 
@@ -193,6 +298,51 @@ class DocumentRecord(SonarRecord):
 
         return self.files[key]
 
+    def link_file(self, file_instance, key, deferred=None, **kwargs):
+        """Add an existing file to record, without copying its content.
+
+        kwargs may contain some additional data such as: file label, file type,
+        order and url.
+
+        :param file_instance: FileInstance of the file.
+        :param str key: File key
+        :param deferred: Create the fulltext and the thumbnail in a celery
+            task, once the record is committed.
+            `SONAR_DOCUMENTS_DERIVATIVES_DEFERRED` if not set.
+        :returns: File object created.
+        """
+        self.set_file_defaults(key, kwargs)
+
+        linked_file = super().link_file(file_instance, key, **kwargs)
+
+        if not linked_file:
+            return None
+
+        if deferred is None:
+            deferred = current_app.config.get("SONAR_DOCUMENTS_DERIVATIVES_DEFERRED")
+        if deferred:
+            defer_file_derivatives(self.id, key)
+        else:
+            self.create_fulltext_file(self.files[key])
+            self.create_thumbnail(self.files[key])
+
+        return self.files[key]
+
+    def set_file_defaults(self, key, data):
+        """Set the default type, order and label of a new file.
+
+        :param str key: File key
+        :param dict data: Additional data of the file, modified in place.
+        """
+        if not data.get("type"):
+            data["type"] = "file"
+
+        if not data.get("order"):
+            data["order"] = self.get_next_file_order()
+
+        if not data.get("label"):
+            data["label"] = key
+
     def sync_files(self, file, deleted=False):
         """Sync files between bucket and records.
 
@@ -224,10 +374,13 @@ class DocumentRecord(SonarRecord):
 
         super().sync_files(file, deleted)
 
-    def create_fulltext_file(self, file):
+    def create_fulltext_file(self, file, deferred=None):
         """Create fulltext file corresponding to give file object.
 
         :param file: File object.
+        :param deferred: Extract the fulltext in a celery task, once the
+            record is committed. `SONAR_DOCUMENTS_EXTRACT_FULLTEXT_DEFERRED`
+            if not set.
         """
         # If extract fulltext is disabled or file is not a PDF
         if (
@@ -236,6 +389,12 @@ class DocumentRecord(SonarRecord):
         ):
             return
 
+        if deferred is None:
+            deferred = current_app.config.get("SONAR_DOCUMENTS_EXTRACT_FULLTEXT_DEFERRED")
+        if deferred:
+            defer_fulltext_extraction(self.id, file.key)
+            return
+
         # Try to extract full text from file data, and generate a warning if
         # it's not possible. For several cases, file is locked against fulltext
         # copy.
@@ -246,6 +405,7 @@ class DocumentRecord(SonarRecord):
             key = change_filename_extension(file.key, "txt")
             self.files[key] = BytesIO(fulltext.encode())
             self.files[key]["type"] = "fulltext"
+            cache_fulltext(self.files[key], fulltext)
         except Exception as exception:
             current_app.logger.warning(
                 f"Error during fulltext extraction of {file.key} of record {self['identifiedBy']}: {exception}"
@@ -312,13 +472,15 @@ class DocumentRecord(SonarRecord):
         files = [file for file in self.get("_files", []) if file.get("type") == "file"]
         return sorted(files, key=lambda file: file.get("order", 100))
 
-    def update(self, data):
+    def update(self, data, affiliations=None):
         """Update record.
 
         :param data: Record data.
+        :param affiliations: Affiliations already resolved, as returned by
+            `resolve_affiliations`.
         :returns: Record instance
         """
-        self.guess_controlled_affiliations(data)
+        self.guess_controlled_affiliations(data, affiliations)
         return super().update(data)
 
     def is_open_access(self):
@@ -365,7 +527,7 @@ class DocumentRecord(SonarRecord):
         return bool(
             self["masked"] == "masked_for_external_ips"
             and self.get("organisation")
-            and not is_ip_in_list(get_current_ip(), self["organisation"][0].get("allowedIps", "").split("\n"))
+            and get_current_ip() not in get_ip_matcher(self["organisation"][0].get("allowedIps", ""))
         )
 
     @property
@@ -17,6 +17,7 @@
 
 import csv
 import re
+import time
 
 import click
 from flask import current_app
@@ -24,6 +25,37 @@ from flask.cli import with_appcontext
 from invenio_db import db
 
 from sonar.modules.documents.api import DocumentIndexer, DocumentRecord
+from sonar.modules.utils import batched
+
+# Status of a file in RERODOC, restricted to the given role.
+STATUS_REGEX = re.compile(r"status:(\w+)$")
+
+# Role allowed to access a file in RERODOC, and embargo date.
+EMBARGO_REGEX = re.compile(r"allow roles \/\.\*,(\w+),\.\*\/\n\s+.+(\d{4}-\d{2}-\d{2})")
+
+
+def set_file_permission(record_file, permission):
+    """Set the access of a file from a RERODOC permission.
+
+    :param record_file: File object.
+    :param permission: RERODOC permission, containing a status or an embargo.
+    """
+    # permissions contains a status
+    matches = STATUS_REGEX.search(permission)
+    if matches:
+        # If status if RERO or INTERNAL, file must not be displayed, otherwise
+        # file is not accessible outside organisation
+        record_file["access"] = "coar:c_16ec"  # restricted access
+        record_file["restricted_outside_organisation"] = matches.group(1) not in ["RERO", "INTERNAL"]
+        return
+
+    # permissions contains a date
+    matches = EMBARGO_REGEX.search(permission)
+    if matches:
+        # file is accessible inside organisation, except if INTERNAL
+        record_file["restricted_outside_organisation"] = matches.group(1) != "INTERNAL"
+        record_file["access"] = "coar:c_f1cf"  # embargoed access
+        record_file["embargo_date"] = matches.group(2)
 
 
 @click.group()
@@ -33,25 +65,87 @@ def rerodoc():
 
 @rerodoc.command("update-file-permissions")
 @click.argument("permissions_file", type=click.File("r"))
-@click.option("-c", "--chunk-size", type=int, default=500, help="Chunk size for bulk indexing.")
+@click.option(
+    "-c",
+    "--chunk-size",
+    type=int,
+    default=500,
+    help="Number of rows resolved, saved and indexed at once.",
+)
+@click.option("--dry-run", is_flag=True, default=False, help="Apply the permissions without saving them.")
 @with_appcontext
-def update_file_permissions(permissions_file, chunk_size):
+def update_file_permissions(permissions_file, chunk_size, dry_run):
     """Update file permission with information given by input file.
 
+    The rows are processed by chunks: the records of a chunk are found in
+    one search request and loaded at once, then saved in one transaction and
+    indexed in bulk.
+
     :param permissions_file: CSV file containing files permissions.
+    :param chunk_size: Number of rows processed at once.
+    :param dry_run: Apply the permissions without saving them.
     """
     indexer = DocumentIndexer(record_cls=DocumentRecord)
+    stats = {"rows": 0, "updated": 0, "errors": 0}
 
-    def save_records(ids):
-        """Save current records set into database and re-index.
+    def process_rows(rows):
+        """Update the files permissions of a chunk of rows.
 
-        :param ids: List of records to save
+        :param rows: List of CSV rows.
         """
+        # Rows not well formatted are skipped before the records are searched.
+        valid_rows = []
+        for row in rows:
+            if len(row) == 3 and row[0]:
+                valid_rows.append(row)
+            else:
+                stats["rows"] += 1
+                stats["errors"] += 1
+                click.secho(f"Row {row} is not well formatted", fg="yellow")
+        rows = valid_rows
+
+        records = DocumentRecord.get_records_by_identifiers([[{"type": "bf:Local", "value": row[0]}] for row in rows])
+        # Records to save, a record can have several files in the chunk.
+        updated_records = {}
+
+        for row, record in zip(rows, records):
+            stats["rows"] += 1
+            try:
+                # No record found, skipping..
+                if not record:
+                    raise Exception(f"Record {row[0]} not found")
+
+                file_name = f"{row[2]}.pdf"
+
+                # File not found in record, skipping
+                if file_name not in record.files:
+                    raise Exception(f"File {file_name} not found in record {row[0]}")
+
+                set_file_permission(record.files[file_name], row[1])
+                updated_records[str(record.id)] = record
+                stats["updated"] += 1
+
+                if not dry_run:
+                    current_app.logger.warning(f"Restriction added for file {file_name} in record {record['pid']}.")
+
+            except Exception as exception:
+                stats["errors"] += 1
+                click.secho(str(exception), fg="yellow")
+
+        if dry_run:
+            db.session.rollback()
+            return
+
+        # Save current records set into database and re-index.
+        for record in updated_records.values():
+            record.commit()
         db.session.commit()
-        indexer.bulk_index(ids)
+        indexer.bulk_index(list(updated_records))
         indexer.process_bulk_queue()
 
     try:
+        start = time.perf_counter()
+
         with open(permissions_file.name) as file:
             reader = csv.reader(file, delimiter=",")
 
@@ -62,73 +156,15 @@ def update_file_permissions(permissions_file, chunk_size):
             if len(header) != 3:
                 raise Exception("CSV file seems to be not well formatted.")
 
-            # To store ids for bulk indexing
-            ids = []
-
-            for row in reader:
-                try:
-                    # try to load corresponding record
-                    record = DocumentRecord.get_record_by_identifier([{"type": "bf:Local", "value": row[0]}])
-
-                    # No record found, skipping..
-                    if not record:
-                        raise Exception(f"Record {row[0]} not found")
-
-                    file_name = f"{row[2]}.pdf"
-
-                    # File not found in record, skipping
-                    if file_name not in record.files:
-                        raise Exception(f"File {file_name} not found in record {row[0]}")
-
-                    record_file = record.files[file_name]
-
-                    # permissions contains a status
-                    matches = re.search(r"status:(\w+)$", row[1])
-                    if matches:
-                        # If status if RERO or INTERNAL, file must not be
-                        # displayed, otherwise file is not accessible outside
-                        # organisation
-                        record_file["access"] = "coar:c_16ec"  # restricted access
-                        if matches.group(1) in ["RERO", "INTERNAL"]:
-                            record_file["restricted_outside_organisation"] = False
-                        else:
-                            record_file["restricted_outside_organisation"] = True
-                    else:
-                        # permissions contains a date
-                        matches = re.search(
-                            r"allow roles \/\.\*,(\w+),\.\*\/\n\s+.+(\d{4}-"
-                            r"\d{2}-\d{2})",
-                            row[1],
-                        )
-
-                        if matches:
-                            # file is accessible inside organisation
-                            if matches.group(1) != "INTERNAL":
-                                record_file["restricted_outside_organisation"] = True
-                            # file is not accessible
-                            else:
-                                record_file["restricted_outside_organisation"] = False
-
-                            record_file["access"] = "coar:c_f1cf"  # embargoed access
-                            record_file["embargo_date"] = matches.group(2)
-
-                    record.commit()
-                    db.session.flush()
-                    ids.append(str(record.id))
-
-                    current_app.logger.warning(f"Restriction added for file {file_name} in record {record['pid']}.")
-
-                    # Bulk save and index
-                    if len(ids) % chunk_size == 0:
-                        save_records(ids)
-                        ids = []
-
-                except Exception as exception:
-                    click.secho(str(exception), fg="yellow")
-
-        # save remaining records
-        save_records(ids)
+            for rows in batched(reader, chunk_size):
+                process_rows(rows)
 
+        duration = time.perf_counter() - start
+        click.secho(
+            f"{'Dry run: ' if dry_run else ''}{stats['rows']} rows processed in {duration:.2f}s "
+            f"({stats['rows'] / duration if duration else 0:.0f} rows/s), {stats['updated']} files updated, "
+            f"{stats['errors']} errors"
+        )
         click.secho("Process finished", fg="green")
 
     except Exception as exception:
@@ -16,6 +16,8 @@
 """URN specific CLI commands."""
 
 import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 
 import click
 from flask import current_app
@@ -23,10 +25,12 @@ from flask.cli import with_appcontext
 from invenio_db import db
 from invenio_pidstore.errors import PIDDoesNotExistError
 from invenio_pidstore.models import PersistentIdentifier, PIDStatus
+from requests.exceptions import RequestException
 
-from sonar.modules.documents.api import DocumentRecord
+from sonar.modules.documents.api import DocumentIndexer, DocumentRecord
 from sonar.modules.documents.dnb import DnbServerError, DnbUrnService
 from sonar.modules.documents.urn import Urn
+from sonar.modules.utils import batched
 from sonar.snl.ftp import SNLRepository
 
 
@@ -67,19 +71,65 @@ def get(urn):
     click.echo(f"url: {url}")
 
 
+def register_urn(app, urn_code, url):
+    """Register a URN to the DNB service, from a worker thread.
+
+    :param app: Flask application.
+    :param urn_code: str - URN identifier.
+    :param url: str - URL of the document.
+    :returns: the URN identifier if it is registered, otherwise None.
+    """
+    with app.app_context():
+        try:
+            DnbUrnService.register(urn_code, url)
+            return urn_code
+        except (DnbServerError, RequestException) as error:
+            app.logger.error(f"Error during URN registration of {urn_code}: {error}")
+            return None
+
+
 @urn.command()
+@click.option("-b", "--batch-size", type=int, default=100, help="Number of documents saved and indexed at once.")
+@click.option("-w", "--workers", type=int, default=4, help="Number of concurrent registrations.")
 @with_appcontext
-def create():
-    """Create and register urns for loaded records."""
-    idx = 0
-    for idx, document in enumerate(Urn.get_documents_to_generate_urns(), 1):
-        click.secho(f"\t{idx}: generate urn code for pid: {document['pid']}", fg="green")
-        Urn.create_urn(document)
-        document.commit()
-        db.session.commit()
-        document.reindex()
-        Urn.register_urn_code_from_document(document)
-    click.secho(f"{idx} URN created.", fg="green")
+def create(batch_size, workers):
+    """Create and register urns for loaded records.
+
+    URNs are reserved, saved and indexed by batches. The URNs of a batch are
+    registered to the DNB service concurrently, while the next batch is
+    prepared.
+
+    :param batch_size: Number of documents saved and indexed at once.
+    :param workers: Number of concurrent registrations.
+    """
+    app = current_app._get_current_object()
+    indexer = DocumentIndexer()
+    created = registered = 0
+    registrations = []
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for documents in batched(Urn.get_documents_to_generate_urns(), batch_size):
+            documents = {str(document.id): document for document in documents}
+            pids = Urn.reserve_urns(documents.values())
+            for pid in pids:
+                created += 1
+                document = documents[str(pid.object_uuid)]
+                click.secho(f"\t{created}: generate urn code for pid: {document['pid']}", fg="green")
+                document.commit()
+            db.session.commit()
+            indexer.bulk_index([str(pid.object_uuid) for pid in pids])
+            indexer.process_bulk_queue()
+
+            # Registrations of the previous batch.
+            registered += Urn.set_registered([urn_code for urn_code in map(Future.result, registrations) if urn_code])
+            registrations = [
+                executor.submit(register_urn, app, pid.pid_value, url)
+                for pid in pids
+                if (url := DnbUrnService.get_url(documents[str(pid.object_uuid)]))
+            ]
+
+        registered += Urn.set_registered([urn_code for urn_code in map(Future.result, registrations) if urn_code])
+    click.secho(f"{created} URN created, {registered} URN registered.", fg="green")
 
 
 @urn.command()
@@ -94,6 +144,36 @@ def register():
     click.secho(f"{idx} URN registered.", fg="green")
 
 
+@urn.command()
+@click.option("-b", "--batch-size", type=int, default=10000, help="Number of URNs checked at once.")
+@with_appcontext
+def check(batch_size):
+    """Verify the check digit of all the URNs.
+
+    :param batch_size: Number of URNs checked at once.
+    """
+    start = time.perf_counter()
+    count = invalid = 0
+    query = (
+        db.session.query(PersistentIdentifier.pid_value)
+        .filter(PersistentIdentifier.pid_type == Urn.urn_pid_type)
+        .yield_per(batch_size)
+    )
+    for rows in batched(query, batch_size):
+        urn_codes = [pid_value for (pid_value,) in rows]
+        for urn_code, valid in zip(urn_codes, Urn.validate_urns(urn_codes)):
+            if not valid:
+                invalid += 1
+                click.secho(f"Invalid check digit: {urn_code}", fg="red")
+        count += len(urn_codes)
+
+    duration = time.perf_counter() - start
+    click.secho(
+        f"{count} URN checked in {duration:.2f}s ({count / duration if duration else 0:.0f} URN/s), {invalid} invalid.",
+        fg="red" if invalid else "green",
+    )
+
+
 @urn.command("snl-upload-file")
 @click.argument("urn_code")
 @with_appcontext
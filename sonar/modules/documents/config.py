@@ -21,9 +21,58 @@ SONAR_DOCUMENTS_IMPORT_FILES = True
 SONAR_DOCUMENTS_EXTRACT_FULLTEXT_ON_IMPORT = True
 """Automatically extract fulltext when a file is imported."""
 
+SONAR_DOCUMENTS_EXTRACT_FULLTEXT_DEFERRED = False
+"""Extract fulltext in a celery task, after the record is committed.
+
+Saving a record does not wait for the extraction, the fulltext is available
+once the task is done.
+"""
+
+SONAR_DOCUMENTS_DERIVATIVES_DEFERRED = True
+"""Create the fulltext and the thumbnail of the files linked to a document
+(published deposits) in a celery task, after the record is committed.
+
+Publishing does not wait for the derivatives, they are available once the
+task is done.
+"""
+
+SONAR_DOCUMENTS_FULLTEXT_CACHE = None
+"""Cache of the fulltext read during indexing, keyed by file checksum.
+
+Possible values are `disk` (see `SONAR_DOCUMENTS_FULLTEXT_CACHE_PATH`),
+`redis` (application cache) or None to read texts from files storage.
+"""
+
+SONAR_DOCUMENTS_FULLTEXT_CACHE_PATH = "./data/fulltext_cache"
+"""Directory of the fulltext cache, for the `disk` backend.
+
+Texts are never removed from it, the directory can be emptied at any time.
+"""
+
+SONAR_DOCUMENTS_FULLTEXT_CACHE_TIMEOUT = 0
+"""Lifetime in seconds of the texts, for the `redis` backend.
+
+0 for no expiration, None for the default timeout of the application cache
+(`CACHE_DEFAULT_TIMEOUT`).
+"""
+
 SONAR_DOCUMENTS_GENERATE_THUMBNAIL = True
 """Automatically generate a thumbnail when a file is imported."""
 
+SONAR_DOCUMENTS_HARVEST_PROCESSES = 1
+"""Number of processes used to parse the harvested records.
+
+The number of CPUs is used if None. If 1, records are parsed in the current
+process, as always in a daemonic process such as a celery worker, which
+cannot have children.
+"""
+
+SONAR_DOCUMENTS_IDENTIFIERS_DB_LOOKUP = False
+"""Search the database for the identifiers not found in the index.
+
+Used to find the records already imported, even if the index lags behind.
+"""
+
 SONAR_DOCUMENTS_ORGANISATIONS_EXTERNAL_FILES = ["csal"]
 """Display external files URL for these organisations."""
 
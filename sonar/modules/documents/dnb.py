@@ -17,18 +17,50 @@
 
 import base64
 import json
+import threading
+import time
 
-import requests
 from flask import current_app
 
+from sonar.modules.utils import requests_retry_session
+
 
 class DnbServerError(Exception):
     """The Dnb Server returns an error."""
 
 
+class RateLimiter:
+    """Space the calls to a service, across threads."""
+
+    def __init__(self, rate):
+        """Initialize limiter.
+
+        :param rate: Maximum number of calls by second, no limit if not set.
+        """
+        self.rate = rate
+        self.interval = 1 / rate if rate else 0
+        self._lock = threading.Lock()
+        self._next_call = 0
+
+    def wait(self):
+        """Wait until the next call is allowed."""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_call - now
+            self._next_call = max(now, self._next_call) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
 class DnbUrnService:
     """Dnb URN service class."""
 
+    _lock = threading.Lock()
+    _session = None
+    _limiter = None
+
     @classmethod
     def base_url(cls):
         """Base DBN URL.
@@ -54,6 +86,36 @@ class DnbUrnService:
             "Accept": "application/json",
         }
 
+    @classmethod
+    def request(cls, method, url, **kwargs):
+        """Send a request to the DNB server.
+
+        The connections are kept in a pool shared by threads, failed
+        requests are retried and the requests are spaced according to
+        `SONAR_APP_URN_DNB_RATE_LIMIT`.
+
+        :param method: HTTP method.
+        :param url: URL.
+        :returns: The response.
+        """
+        rate = current_app.config.get("SONAR_APP_URN_DNB_RATE_LIMIT")
+        with cls._lock:
+            if not cls._session:
+                cls._session = requests_retry_session(
+                    retries=3, status_forcelist=(429, 500, 502, 503, 504), pool_maxsize=20
+                )
+            if not cls._limiter or cls._limiter.rate != rate:
+                cls._limiter = RateLimiter(rate)
+            limiter = cls._limiter
+        limiter.wait()
+        return cls._session.request(
+            method,
+            url,
+            headers=cls.headers(),
+            timeout=current_app.config.get("SONAR_APP_URN_DNB_TIMEOUT"),
+            **kwargs,
+        )
+
     @classmethod
     def exists(cls, urn_code):
         """Check the existence for a URN.
@@ -64,7 +126,7 @@ class DnbUrnService:
         # Documentation: https://wiki.dnb.de/display/URNSERVDOK/URN-Service+API
         # https://wiki.dnb.de/display/URNSERVDOK/Beispiele%3A+URN-Verwaltung
         try:
-            response = requests.request("HEAD", f"{cls.base_url()}/urn/{urn_code}", headers=cls.headers())
+            response = cls.request("HEAD", f"{cls.base_url()}/urn/{urn_code}")
             if response.status_code not in [200, 404]:
                 raise DnbServerError(
                     f"Bad DNB server response status {response.status_code}, "
@@ -85,7 +147,7 @@ class DnbUrnService:
         # Documentation: https://wiki.dnb.de/display/URNSERVDOK/URN-Service+API
         # https://wiki.dnb.de/display/URNSERVDOK/Beispiele%3A+URN-Verwaltung
         try:
-            response = requests.get(f"{cls.base_url()}/urn/{urn_code}/urls", headers=cls.headers())
+            response = cls.request("GET", f"{cls.base_url()}/urn/{urn_code}/urls")
             if not response.status_code == 200:
                 raise DnbServerError(
                     f"Bad DNB server response status {response.status_code}, "
@@ -108,7 +170,7 @@ class DnbUrnService:
         # https://wiki.dnb.de/display/URNSERVDOK/Beispiele%3A+URN-Verwaltung
         answer = False
         try:
-            response = requests.get(f"{cls.base_url()}/urn/{urn_code}", headers=cls.headers())
+            response = cls.request("GET", f"{cls.base_url()}/urn/{urn_code}")
             if response.status_code != 200:
                 raise DnbServerError(
                     f"Bad DNB server response status {response.status_code}, "
@@ -127,12 +189,7 @@ class DnbUrnService:
         :param urls: list of str - list of the target URL.
 
         """
-        response = requests.request(
-            "PATCH",
-            f"{cls.base_url()}/urn/{urn_code}/my-urls",
-            headers=cls.headers(),
-            data=json.dumps(urls),
-        )
+        response = cls.request("PATCH", f"{cls.base_url()}/urn/{urn_code}/my-urls", data=json.dumps(urls))
         if response.status_code != 204:
             raise DnbServerError(
                 f"Bad DNB server response status {response.status_code}, "
@@ -147,10 +204,9 @@ class DnbUrnService:
         :param urn_code: str - the urn code.
         :param successor_urn: str - the urn code of the successor.
         """
-        response = requests.request(
+        response = cls.request(
             "PATCH",
             f"{cls.base_url()}/urn/{urn_code}",
-            headers=cls.headers(),
             data=json.dumps({"successor": f"{cls.base_url()}/urn/{successor_urn}"}),
         )
         if response.status_code != 204:
@@ -169,7 +225,7 @@ class DnbUrnService:
         :param data: dict - the request body see https://tinyurl.com/mtpfaz5z
                      for more details.
         """
-        response = requests.request("POST", cls.base_url(), headers=cls.headers(), data=json.dumps(data))
+        response = cls.request("POST", cls.base_url(), data=json.dumps(data))
         if response.status_code != 201:
             raise DnbServerError(
                 f"Bad DNB server response status {response.status_code}, "
@@ -177,6 +233,22 @@ class DnbUrnService:
                 f"urn: {data.get('urn')}"
             )
 
+    @classmethod
+    def register(cls, urn_code, url):
+        """Register a URN code with its URL, or update its URL.
+
+        Only the DNB server is called, it can be done outside of the
+        request or the database transaction.
+
+        :param urn_code: str - the urn code.
+        :param url: str - the target URL.
+        """
+        urls = [{"url": url, "priority": 1}]
+        if cls.exists(urn_code):
+            cls.update(urn_code, urls)
+        else:
+            cls.create({"urn": urn_code, "urls": urls})
+
     @classmethod
     def register_document(cls, document):
         """Register a new URN code.
@@ -189,12 +261,7 @@ class DnbUrnService:
         if not isinstance(document, DocumentRecord):
             document = DocumentRecord(document)
         if url := cls.get_url(document):
-            urn = document.get_rero_urn_code(document)
-            data = {"urn": urn, "urls": [{"url": url, "priority": 1}]}
-            if cls.exists(urn):
-                cls.update(urn, data["urls"])
-            else:
-                cls.create(data)
+            cls.register(document.get_rero_urn_code(document), url)
             return True
         return False
 
@@ -206,10 +273,14 @@ class DnbUrnService:
         :rtype: str.
         :returns: the target URL.
         """
+        from sonar.modules.documents.urn import Urn
+        from sonar.modules.metadata_cache import metadata_cache
+        from sonar.modules.organisations.api import OrganisationRecord
+
         base_url = f"https://{current_app.config.get('SONAR_APP_SERVER_NAME')}"
-        if orgs := document.resolve().get("organisation", []):
+        if document.get("organisation", []):
             org_code = current_app.config.get("SONAR_APP_DEFAULT_ORGANISATION")
-            if org := orgs[0]:
+            if org := metadata_cache.get_record(OrganisationRecord, Urn.get_organisation_pid(document)):
                 if org.get("isDedicated") or org.get("isShared"):
                     org_code = org.get("code")
                 if org.get("isDedicated") and (server_name := org.get("serverName")):
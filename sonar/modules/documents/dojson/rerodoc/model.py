@@ -20,13 +20,12 @@ import re
 
 from dojson import utils
 from flask import current_app
-from invenio_db import db
 
 from sonar.modules.collections.api import Record as CollectionRecord
 from sonar.modules.documents.dojson.rerodoc.overdo import Overdo
+from sonar.modules.documents.dojson.rerodoc.registry import collection_registry, subdivision_registry
 from sonar.modules.organisations.api import OrganisationRecord
 from sonar.modules.subdivisions.api import Record as SubdivisionRecord
-from sonar.modules.subdivisions.api import RecordSearch
 from sonar.modules.utils import remove_trailing_punctuation
 
 overdo = Overdo()
@@ -99,14 +98,7 @@ def marc21_to_type_and_organisation(self, key, value):
             # Store subdivision
             # TODO: avoid possible clashes between subdivision
             # names in different languages
-            result = (
-                RecordSearch()
-                .filter("term", organisation__pid=organisation)
-                .filter("term", name__value__raw=subdivision_name)
-                .source(includes="pid")
-                .scan()
-            )
-            subdivision_pid = next(result).pid
+            subdivision_pid = subdivision_registry.get_pid_by_name(organisation, subdivision_name)
             # If the subdivision exists, assign it to the record
             if subdivision_pid:
                 self["subdivisions"] = [{"$ref": SubdivisionRecord.get_ref_link("subdivisions", subdivision_pid)}]
@@ -129,21 +121,13 @@ def marc21_to_type_and_organisation(self, key, value):
             # Store subdivision
             hash_key = hashlib.md5((subdivision_name + organisation).encode()).hexdigest()
 
-            subdivision_pid = SubdivisionRecord.get_pid_by_hash_key(hash_key)
-
-            # No subdivision found
-            if not subdivision_pid:
-                subdivision = SubdivisionRecord.create(
-                    {
-                        "name": [{"language": "eng", "value": subdivision_name}],
-                        "organisation": {"$ref": OrganisationRecord.get_ref_link("organisations", organisation)},
-                        "hashKey": hash_key,
-                    }
-                )
-                subdivision.commit()
-                subdivision.reindex()
-                db.session.commit()
-                subdivision_pid = subdivision["pid"]
+            subdivision_pid = subdivision_registry.get_or_create(
+                hash_key,
+                {
+                    "name": [{"language": "eng", "value": subdivision_name}],
+                    "organisation": {"$ref": OrganisationRecord.get_ref_link("organisations", organisation)},
+                },
+            )
 
             self["subdivisions"] = [{"$ref": SubdivisionRecord.get_ref_link("subdivisions", subdivision_pid)}]
 
@@ -621,21 +605,13 @@ def marc21_to_specific_collection(self, key, value):
 
     hash_key = hashlib.md5((value.get("a") + organisation_pid).encode()).hexdigest()
 
-    collection_pid = CollectionRecord.get_pid_by_hash_key(hash_key)
-
-    # No collection found
-    if not collection_pid:
-        collection = CollectionRecord.create(
-            {
-                "name": [{"language": "eng", "value": value.get("a")}],
-                "organisation": {"$ref": self["organisation"][0]["$ref"]},
-                "hashKey": hash_key,
-            }
-        )
-        collection.commit()
-        collection.reindex()
-        db.session.commit()
-        collection_pid = collection["pid"]
+    collection_pid = collection_registry.get_or_create(
+        hash_key,
+        {
+            "name": [{"language": "eng", "value": value.get("a")}],
+            "organisation": {"$ref": self["organisation"][0]["$ref"]},
+        },
+    )
 
     return {"$ref": CollectionRecord.get_ref_link("collections", collection_pid)}
 
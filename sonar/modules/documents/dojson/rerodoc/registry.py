@@ -0,0 +1,267 @@
+# Swiss Open Access Repository
+# Copyright (C) 2021 RERO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Registry of the subdivisions and collections used by RERODOC conversion."""
+
+import threading
+import zlib
+from contextlib import contextmanager
+
+from invenio_db import db
+from invenio_pidstore.models import PersistentIdentifier, PIDStatus, RecordIdentifier
+from invenio_records.models import RecordMetadata
+from sqlalchemy import func, select, type_coerce
+from sqlalchemy.dialects.postgresql import JSONB
+
+from sonar.modules.collections.api import Record as CollectionRecord
+from sonar.modules.collections.api import RecordIndexer as CollectionIndexer
+from sonar.modules.collections.api import RecordSearch as CollectionSearch
+from sonar.modules.refresh import get_refresh_policy
+from sonar.modules.subdivisions.api import Record as SubdivisionRecord
+from sonar.modules.subdivisions.api import RecordIndexer as SubdivisionIndexer
+from sonar.modules.subdivisions.api import RecordSearch as SubdivisionSearch
+
+
+class HashKeyRegistry:
+    """PIDs of the records identified by a hash key.
+
+    Outside of a conversion run, the records are searched and created one by
+    one. During a run, the PIDs of all the records are loaded once, the
+    missing records get a reserved PID and are created at once by `flush`.
+
+    The registry is shared by the threads of a process. The creations of
+    the processes are serialized by a database lock and deduplicated on the
+    hash key, see `create`.
+    """
+
+    def __init__(self, record_class, search_class, indexer_class, endpoint):
+        """Initialize the registry.
+
+        :param record_class: Class of the records.
+        :param search_class: Search class of the records.
+        :param indexer_class: Indexer class of the records.
+        :param endpoint: Endpoint of the records, also the property
+            referencing them in the documents.
+        """
+        self.record_class = record_class
+        self.search_class = search_class
+        self.indexer_class = indexer_class
+        self.endpoint = endpoint
+        self._lock = threading.RLock()
+        self._runs = 0
+        self._pids = None
+        self._names = None
+        self._pending = {}
+
+    @staticmethod
+    def get_name_key(organisation_pid, name):
+        """Get the key of a record by its name.
+
+        The name is matched exactly, as by the search outside of a run.
+
+        :param organisation_pid: PID of the organisation of the record.
+        :param name: Name of the record.
+        :returns: Tuple (organisation PID, name).
+        """
+        return (organisation_pid, name)
+
+    def load(self):
+        """Load the PIDs of all the records, with one scan."""
+        pids = {}
+        names = {}
+        search = self.search_class().source(includes=["pid", "hashKey", "organisation.pid", "name.value"])
+        for hit in search.scan():
+            hit = hit.to_dict()
+            if hit.get("hashKey"):
+                pids[hit["hashKey"]] = hit["pid"]
+            for name in hit.get("name", []):
+                names.setdefault(self.get_name_key(hit.get("organisation", {}).get("pid"), name["value"]), hit["pid"])
+        with self._lock:
+            self._pids = pids
+            self._names = names
+
+    def clear(self):
+        """Forget the loaded PIDs and the records to create."""
+        with self._lock:
+            self._pids = None
+            self._names = None
+            self._pending = {}
+
+    @contextmanager
+    def run(self):
+        """Conversion run, the records are loaded at the beginning.
+
+        The records still to create are created at the end of the run. Runs
+        can be nested, the records are loaded by the outermost one.
+        """
+        with self._lock:
+            if not self._runs:
+                self.load()
+            self._runs += 1
+        try:
+            yield self
+            self.flush()
+        finally:
+            with self._lock:
+                self._runs -= 1
+                if not self._runs:
+                    self.clear()
+
+    def get_pid_by_name(self, organisation_pid, name):
+        """Get the PID of a record by its name in an organisation.
+
+        :param organisation_pid: PID of the organisation.
+        :param name: Name of the record.
+        :returns: The PID of the record or None.
+        """
+        with self._lock:
+            if self._names is not None:
+                return self._names.get(self.get_name_key(organisation_pid, name))
+
+        result = (
+            self.search_class()
+            .filter("term", organisation__pid=organisation_pid)
+            .filter("term", name__value__raw=name)
+            .source(includes="pid")
+            .scan()
+        )
+        try:
+            return next(result).pid
+        except StopIteration:
+            return None
+
+    def get_or_create(self, hash_key, data):
+        """Get the PID of a record by its hash key, create it if not found.
+
+        During a run, the record is created by the next `flush`.
+
+        :param hash_key: Hash key of the record.
+        :param data: Data of the record to create.
+        :returns: The PID of the record.
+        """
+        with self._lock:
+            if self._pids is None:
+                pid = self.record_class.get_pid_by_hash_key(hash_key)
+                if not pid:
+                    pid = self.create([{**data, "hashKey": hash_key}])[0]
+                return pid
+
+            if hash_key not in self._pids:
+                pid = str(RecordIdentifier.next())
+                self._pending[hash_key] = {**data, "hashKey": hash_key, "pid": pid}
+                self._pids[hash_key] = pid
+            return self._pids[hash_key]
+
+    def get_pids_from_db(self, hash_keys):
+        """Get the PIDs of the records having the given hash keys, in database.
+
+        :param hash_keys: List of hash keys.
+        :returns: Dictionary of PIDs keyed by hash key.
+        """
+        json = type_coerce(RecordMetadata.json, JSONB)
+        hash_key = json["hashKey"].astext
+        query = (
+            db.session.query(hash_key, json["pid"].astext)
+            .select_from(RecordMetadata)
+            .join(PersistentIdentifier, PersistentIdentifier.object_uuid == RecordMetadata.id)
+            .filter(
+                PersistentIdentifier.pid_type == self.record_class.provider.pid_type,
+                PersistentIdentifier.status == PIDStatus.REGISTERED,
+                hash_key.in_(hash_keys),
+            )
+        )
+        return dict(query.all())
+
+    def create(self, records):
+        """Create, commit and index the records not yet in database.
+
+        The creations are serialized by a database lock, held until the
+        commit, and the records whose hash key is already in database are
+        not created again. This way, the records created by concurrent
+        harvests are not duplicated.
+
+        The index is refreshed according to the refresh policy, so that the
+        records can be found by the next conversions.
+
+        :param records: List of the data of the records.
+        :returns: List of the PIDs of the records, the PIDs of the records
+            already in database for the existing hash keys.
+        """
+        lock_id = zlib.crc32(f"sonar_hash_key_{self.record_class.provider.pid_type}".encode())
+        db.session.execute(select(func.pg_advisory_xact_lock(lock_id)))
+        pids = self.get_pids_from_db([data["hashKey"] for data in records])
+        created = [self.record_class.create(data) for data in records if data["hashKey"] not in pids]
+        db.session.commit()
+        if created:
+            indexer = self.indexer_class()
+            indexer.bulk_index([str(record.id) for record in created])
+            indexer.process_bulk_queue()
+            indexer.refresh_index(self.search_class.Meta.index, get_refresh_policy())
+        pids.update({record["hashKey"]: record["pid"] for record in created})
+        return [pids[data["hashKey"]] for data in records]
+
+    def flush(self, records=()):
+        """Create the records with a reserved PID.
+
+        If a record has been created by another process in the meantime,
+        its PID is kept and replaces the reserved one in the references of
+        the converted records.
+
+        :param records: List of the converted records.
+        :returns: List of the PIDs of the created records.
+        """
+        with self._lock:
+            pending = list(self._pending.values())
+            if not pending:
+                return []
+            self._pending = {}
+            pids = self.create(pending)
+
+            replaced = {}
+            for data, pid in zip(pending, pids):
+                if pid != data["pid"]:
+                    replaced[data["pid"]] = pid
+                    if self._pids is not None:
+                        self._pids[data["hashKey"]] = pid
+
+        for record in records:
+            for ref in record.get(self.endpoint, []):
+                pid = self.record_class.get_pid_by_ref_link(ref["$ref"])
+                if pid in replaced:
+                    ref["$ref"] = self.record_class.get_ref_link(self.endpoint, replaced[pid])
+        return pids
+
+
+subdivision_registry = HashKeyRegistry(SubdivisionRecord, SubdivisionSearch, SubdivisionIndexer, "subdivisions")
+collection_registry = HashKeyRegistry(CollectionRecord, CollectionSearch, CollectionIndexer, "collections")
+
+
+@contextmanager
+def conversion_run():
+    """Conversion run of RERODOC records, for the subdivisions and collections.
+
+    `flush` must be called before the converted records are saved.
+    """
+    with subdivision_registry.run(), collection_registry.run():
+        yield
+
+
+def flush(records=()):
+    """Create the subdivisions and collections with a reserved PID.
+
+    :param records: List of the converted records referencing them.
+    """
+    subdivision_registry.flush(records)
+    collection_registry.flush(records)
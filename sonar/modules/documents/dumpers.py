@@ -15,13 +15,12 @@
 
 """Document dumpers."""
 
-from copy import deepcopy
-
 import pytz
-from invenio_records.api import _records_state
 from invenio_records.dumpers import Dumper
 
-from sonar.modules.utils import get_ips_list
+from sonar.modules.utils import get_ip_matcher, resolve_refs
+
+from .fulltext import read_fulltext
 
 
 class ReplaceRefsDumper(Dumper):
@@ -35,9 +34,8 @@ class ReplaceRefsDumper(Dumper):
         """
         from .api import DocumentRecord
 
-        # do a fresh copy
-        data = deepcopy(record)
-        return deepcopy(DocumentRecord(_records_state.replace_refs(data)))
+        # resolve references in a fresh copy
+        return DocumentRecord(resolve_refs(record))
 
 
 class IndexerDumper(Dumper):
@@ -51,8 +49,8 @@ class IndexerDumper(Dumper):
 
     @staticmethod
     def _replace_refs(data):
-        """Adds isOpenAccess field."""
-        return deepcopy(_records_state.replace_refs(data))
+        """Get a fresh copy of the data with references resolved."""
+        return resolve_refs(data)
 
     @staticmethod
     def _process_open_access(record, data):
@@ -66,7 +64,7 @@ class IndexerDumper(Dumper):
         # Compile allowed IPs in document
         if data.get("organisation"):
             if data["organisation"][0].get("allowedIps"):
-                data["organisation"][0]["ips"] = get_ips_list(data["organisation"][0]["allowedIps"].split("\n"))
+                data["organisation"][0]["ips"] = list(get_ip_matcher(data["organisation"][0]["allowedIps"]).cidrs)
             else:
                 data["organisation"][0]["ips"] = []
 
@@ -81,8 +79,7 @@ class IndexerDumper(Dumper):
         data["fulltext"] = []
         for file in record.files:
             if file.get("type") == "fulltext":
-                with file.file.storage().open() as pdf_file:
-                    data["fulltext"].append(pdf_file.read().decode("utf-8"))
+                data["fulltext"].append(read_fulltext(file))
 
     @staticmethod
     def _process_identifiers(record, data):
@@ -99,8 +96,7 @@ class IndexerDumper(Dumper):
         :param record: The record to dump.
         :param data: The initial dump data passed in by ``record.dumps()``.
         """
-        data = deepcopy(record)
-        data = self._replace_refs(data)
+        data = self._replace_refs(record)
         self._add_dates(record, data)
         self._process_open_access(record, data)
         self._process_organisation_ips(record, data)
@@ -110,4 +106,27 @@ class IndexerDumper(Dumper):
         return data
 
 
+class OAIDumper(IndexerDumper):
+    """Document dumper for OAI-PMH.
+
+    Same data as the indexed document, without the fulltext, read from the
+    storage, and the compiled IPs of the organisation, which are not exposed
+    by the metadata formats.
+    """
+
+    def dump(self, record, data):
+        """Dump a document instance for the OAI-PMH metadata formats.
+
+        :param record: The record to dump.
+        :param data: The initial dump data passed in by ``record.dumps()``.
+        """
+        data = self._replace_refs(record)
+        self._add_dates(record, data)
+        self._process_open_access(record, data)
+        self._process_identifiers(record, data)
+
+        return data
+
+
 document_indexer_dumper = IndexerDumper()
+document_oai_dumper = OAIDumper()
@@ -16,7 +16,10 @@
 """Document extension."""
 
 from invenio_base.signals import app_loaded
+from invenio_db import db
 from invenio_oaiharvester.signals import oaiharvest_finished
+from invenio_records.signals import after_record_delete, after_record_update
+from sqlalchemy import event
 
 from sonar.modules.documents.receivers import (
     export_json,
@@ -25,6 +28,8 @@ from sonar.modules.documents.receivers import (
 )
 
 from . import config
+from .fulltext import discard_deferred_extractions, send_deferred_extractions
+from .permissions import clear_memo
 
 
 class Documents:
@@ -47,6 +52,15 @@ class Documents:
         # Expand configuration.
         app_loaded.connect(set_boosting_query_fields)
 
+        # Forget the documents memoized for permissions when they change.
+        after_record_update.connect(clear_memo, weak=False)
+        after_record_delete.connect(clear_memo, weak=False)
+
+        # Send the fulltext extractions deferred in committed transactions.
+        if not event.contains(db.session, "after_commit", send_deferred_extractions):
+            event.listen(db.session, "after_commit", send_deferred_extractions)
+            event.listen(db.session, "after_rollback", discard_deferred_extractions)
+
     def init_config(self, app):
         """Initialize configuration."""
         for k in dir(app.config):
@@ -0,0 +1,214 @@
+# Swiss Open Access Repository
+# Copyright (C) 2021 RERO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Content-addressed cache of the documents fulltext."""
+
+import os
+import tempfile
+
+from flask import current_app
+from invenio_cache import current_cache
+from invenio_db import db
+
+# Key of the database session info storing the deferred extractions.
+DEFERRED_EXTRACTIONS_KEY = "sonar_deferred_fulltext_extractions"
+
+
+class DiskFulltextCache:
+    """Fulltext cache stored in a local directory.
+
+    Texts are never evicted, they are keyed by checksum so they never become
+    stale, but the directory grows with the files storage.
+    """
+
+    def __init__(self, path):
+        """Initialize cache.
+
+        :param path: Directory where texts are stored.
+        """
+        self.path = path
+
+    def _file_path(self, key):
+        """Get the path of the file for the given key.
+
+        Files are distributed in sub-directories to avoid huge directories.
+
+        :param key: Cache key.
+        :returns: Path of the file.
+        """
+        return os.path.join(self.path, key[:2], key[2:4], f"{key}.txt")
+
+    def get(self, key):
+        """Get a text from cache.
+
+        :param key: Cache key.
+        :returns: Text or None if not in cache.
+        """
+        try:
+            with open(self._file_path(key), encoding="utf-8") as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def set(self, key, text):
+        """Store a text in cache.
+
+        The file is written in a temporary file and moved to its final path,
+        so that concurrent readers never get a partial text.
+
+        :param key: Cache key.
+        :param text: Text to store.
+        """
+        file_path = self._file_path(key)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", dir=os.path.dirname(file_path), delete=False
+        ) as temporary_file:
+            temporary_file.write(text)
+        os.replace(temporary_file.name, file_path)
+
+
+class RedisFulltextCache:
+    """Fulltext cache stored in the application cache."""
+
+    prefix = "fulltext"
+
+    def __init__(self, timeout=0):
+        """Initialize cache.
+
+        :param timeout: Lifetime of texts in seconds, no expiration if 0,
+            the default timeout of the application cache if None.
+        """
+        self.timeout = timeout
+
+    def get(self, key):
+        """Get a text from cache.
+
+        :param key: Cache key.
+        :returns: Text or None if not in cache.
+        """
+        return current_cache.get(f"{self.prefix}:{key}")
+
+    def set(self, key, text):
+        """Store a text in cache.
+
+        :param key: Cache key.
+        :param text: Text to store.
+        """
+        current_cache.set(f"{self.prefix}:{key}", text, timeout=self.timeout)
+
+
+def get_fulltext_cache():
+    """Get the configured fulltext cache.
+
+    :returns: Cache instance or None if cache is disabled.
+    """
+    backend = current_app.config.get("SONAR_DOCUMENTS_FULLTEXT_CACHE")
+    if backend == "disk":
+        return DiskFulltextCache(current_app.config["SONAR_DOCUMENTS_FULLTEXT_CACHE_PATH"])
+    if backend == "redis":
+        return RedisFulltextCache(current_app.config.get("SONAR_DOCUMENTS_FULLTEXT_CACHE_TIMEOUT", 0))
+    return None
+
+
+def get_cache_key(file):
+    """Get the cache key of a file.
+
+    :param file: File object.
+    :returns: Cache key, based on the checksum of the file, or None if the
+        checksum is not known.
+    """
+    checksum = file.file.checksum
+    if not checksum:
+        return None
+    # Checksums are stored as `algorithm:value`.
+    return checksum.replace(":", "-")
+
+
+def read_fulltext(file):
+    """Read the text of a fulltext file.
+
+    The text is read from the cache if possible, and stored in it otherwise.
+
+    :param file: File object of type `fulltext`.
+    :returns: Text of the file.
+    """
+    cache = get_fulltext_cache()
+    key = get_cache_key(file) if cache else None
+
+    if key and (text := cache.get(key)) is not None:
+        return text
+
+    with file.file.storage().open() as text_file:
+        text = text_file.read().decode("utf-8")
+
+    if key:
+        cache.set(key, text)
+    return text
+
+
+def cache_fulltext(file, text):
+    """Store the text of a new fulltext file in the cache.
+
+    :param file: File object of type `fulltext`.
+    :param text: Text of the file.
+    """
+    cache = get_fulltext_cache()
+    if cache and (key := get_cache_key(file)):
+        cache.set(key, text)
+
+
+def defer_fulltext_extraction(record_id, key, thumbnail=False):
+    """Extract the fulltext of a file in a celery task.
+
+    The task is sent once the current transaction is committed, so that
+    it finds the record and the file in database.
+
+    :param record_id: Record UUID.
+    :param key: Key of the file.
+    :param thumbnail: Create the thumbnail of the file in the same task.
+    """
+    db.session.info.setdefault(DEFERRED_EXTRACTIONS_KEY, []).append((str(record_id), key, thumbnail))
+
+
+def defer_file_derivatives(record_id, key):
+    """Create the fulltext and the thumbnail of a file in a celery task.
+
+    :param record_id: Record UUID.
+    :param key: Key of the file.
+    """
+    defer_fulltext_extraction(record_id, key, thumbnail=True)
+
+
+def send_deferred_extractions(session):
+    """Send the fulltext extractions deferred in a committed transaction.
+
+    :param session: Database session.
+    """
+    from .tasks import create_file_derivatives, extract_fulltext
+
+    for record_id, key, thumbnail in dict.fromkeys(session.info.pop(DEFERRED_EXTRACTIONS_KEY, [])):
+        if thumbnail:
+            create_file_derivatives.delay(record_id, key)
+        else:
+            extract_fulltext.delay(record_id, key)
+
+
+def discard_deferred_extractions(session):
+    """Discard the fulltext extractions deferred in a rolled back transaction.
+
+    :param session: Database session.
+    """
+    session.info.pop(DEFERRED_EXTRACTIONS_KEY, None)
@@ -22,11 +22,23 @@ from marshmallow import Schema, pre_dump
 class Marc21Schema(Schema):
     """Marc21 marshmallow schema."""
 
-    @pre_dump
-    def parse_xml(self, data, **kwargs):
+    @staticmethod
+    def parse(data):
         """Parse xml data and convert into dictionary.
 
+        Parsing does not need the application, it can be done in another
+        process before dumping.
+
         :param data: XML string.
         :returns: DictDict.
         """
         return create_record(data)
+
+    @pre_dump
+    def parse_xml(self, data, **kwargs):
+        """Parse xml data, if not already parsed.
+
+        :param data: XML string or parsed data.
+        :returns: DictDict.
+        """
+        return self.parse(data) if isinstance(data, str) else data
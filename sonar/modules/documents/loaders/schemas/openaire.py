@@ -26,10 +26,13 @@ class OpenaireSchema(Schema):
     identifiedBy = fields.Method("get_identifiers")
     title = fields.Method("get_title")
 
-    @pre_dump
-    def parse_xml(self, data, **kwargs):
+    @staticmethod
+    def parse(data):
         """Parse xml data and convert into OrderedDict.
 
+        Parsing does not need the application, it can be done in another
+        process before dumping.
+
         :param data: XML string.
         :returns: OrderedDict.
         """
@@ -40,6 +43,15 @@ class OpenaireSchema(Schema):
 
         return result["record"]["metadata"]["resource"]
 
+    @pre_dump
+    def parse_xml(self, data, **kwargs):
+        """Parse xml data, if not already parsed.
+
+        :param data: XML string or parsed data.
+        :returns: OrderedDict.
+        """
+        return self.parse(data) if isinstance(data, str) else data
+
     def get_identifiers(self, obj):
         """Create identifiers."""
         identifiers = []
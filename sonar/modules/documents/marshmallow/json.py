@@ -96,7 +96,9 @@ class FileSchemaV1(ThumbnailSchemaV1):
         """
         if not item.get("bucket"):
             return item
-        doc = DocumentRecord.get_record_by_bucket(item.get("bucket"))
+        # All the files of a document share its bucket, the document is
+        # loaded once for the request.
+        doc = DocumentRecord.get_records_by_buckets([item["bucket"]], memoize=True)[str(item["bucket"])]
         item["permissions"] = {
             "read": DocumentFilesPermission.read(current_user_record, item, doc["pid"], doc),
             "update": DocumentFilesPermission.update(current_user_record, item, doc["pid"], doc),
@@ -212,7 +214,9 @@ class DocumentListMetadataSchemaV1(StrictKeysMixin):
     @pre_dump
     def add_permalink(self, item, **kwargs):
         """Add permanent link to document."""
-        item["permalink"] = DocumentRecord.get_permanent_link(host=request.host_url, pid=item["pid"])
+        item["permalink"] = DocumentRecord.get_permanent_link(
+            host=request.host_url, pid=item["pid"], document=DocumentRecord(item)
+        )
         return item
 
     @pre_dump
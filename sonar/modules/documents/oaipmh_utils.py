@@ -17,14 +17,65 @@
 
 """Invenio OAIPMH server utils."""
 
+from flask import current_app, g, has_request_context
 from invenio_oaiserver import current_oaiserver
 
-from .dumpers import IndexerDumper
+from sonar.modules.refs_cache import RefsCache, refs_cache
+
+from .dumpers import document_oai_dumper
+
+# Resources linked by the documents, kept between the OAI-PMH requests.
+_refs_cache = None
+
+
+def get_oai_refs_cache():
+    """Get the cache of the resources linked by the documents.
+
+    The cache is shared by the OAI-PMH requests of the process, entries expire
+    after `SONAR_APP_REFS_CACHE_TTL` seconds.
+
+    :returns: RefsCache instance.
+    """
+    global _refs_cache
+    if _refs_cache is None:
+        _refs_cache = RefsCache(current_app.config.get("SONAR_APP_REFS_CACHE_TTL"))
+    return _refs_cache
+
+
+def dump_record(record):
+    """Dump a record for serialization.
+
+    :param record: Record.
+    :returns: Record data.
+    """
+    record_dict = record.dumps(document_oai_dumper)
+    record_dict["updated"] = record.updated
+    return record_dict
+
+
+def getrecords_fetcher(record_uuids):
+    """Fetch the data of several records for serialization.
+
+    The records are loaded in one query and the resources they link are
+    prefetched, e.g. for a whole ListRecords page. In a request, the data is
+    kept for `getrecord_fetcher`.
+
+    :param record_uuids: List of records UUIDs.
+    :returns: Dictionary of records data, keyed by UUID.
+    """
+    records = current_oaiserver.record_cls.get_records(record_uuids)
+    with refs_cache(cache=get_oai_refs_cache()) as cache:
+        cache.prefetch(records)
+        records_data = {str(record.id): dump_record(record) for record in records}
+    if has_request_context():
+        g.setdefault("oai_records", {}).update(records_data)
+    return records_data
 
 
 def getrecord_fetcher(record_uuid):
     """Fetch record data as dict for serialization."""
+    if has_request_context() and (record_dict := g.get("oai_records", {}).get(str(record_uuid))):
+        return record_dict
     record = current_oaiserver.record_cls.get_record(record_uuid)
-    record_dict = record.dumps(IndexerDumper())
-    record_dict["updated"] = record.updated
-    return record_dict
+    with refs_cache(cache=get_oai_refs_cache()):
+        return dump_record(record)
@@ -15,7 +15,8 @@
 
 """Permissions for documents."""
 
-from flask import request
+from flask import g, has_request_context, request
+from invenio_db import db
 from invenio_files_rest.models import Bucket, ObjectVersion
 from invenio_pidstore.errors import PIDDoesNotExistError
 from invenio_pidstore.models import PersistentIdentifier
@@ -27,8 +28,90 @@ from sonar.modules.permissions import FilesPermission, RecordPermission
 from .utils import get_file_restriction, get_organisations
 
 
+def get_memo(name):
+    """Get a dictionary memoized for the current request.
+
+    :param name: Name of the memo.
+    :returns: Dictionary, or None outside of a request.
+    """
+    if not has_request_context():
+        return None
+    return g.setdefault("document_permissions_memo", {}).setdefault(name, {})
+
+
+def clear_memo(sender, record, *args, **kwargs):
+    """Remove an updated or deleted document from the memos of the request.
+
+    :param record: Record.
+    """
+    if has_request_context():
+        for memo in g.get("document_permissions_memo", {}).values():
+            memo.pop(record.get("pid"), None)
+
+
 class DocumentPermission(RecordPermission):
-    """Documents permissions."""
+    """Documents permissions.
+
+    Documents and URNs are memoized for the request, and can be prepared
+    for a whole page of search results with `prefetch`.
+    """
+
+    @classmethod
+    def prefetch(cls, hits):
+        """Prepare the permissions checks of a page of search results.
+
+        Documents are built from the indexed data, and the URNs of all the
+        documents are loaded in one query. Documents for which the indexed
+        data is not sufficient are loaded from the database when needed.
+
+        :param hits: List of search hits.
+        """
+        documents = get_memo("documents")
+        urns = get_memo("urns")
+        if documents is None:
+            return
+
+        pids = {}
+        for hit in hits:
+            source = hit["_source"]
+            if not source.get("pid"):
+                continue
+            pids[hit["_id"]] = source["pid"]
+
+            organisations = source.get("organisation", [])
+            resolved = all("pid" in item for item in organisations + source.get("subdivisions", []))
+            # IPs are needed to know if the document is masked.
+            if source.get("masked") == "masked_for_external_ips":
+                resolved = resolved and bool(organisations) and "allowedIps" in organisations[0]
+            if resolved:
+                documents.setdefault(source["pid"], DocumentRecord(source))
+
+        if not pids:
+            return
+        query = db.session.query(PersistentIdentifier.object_uuid).filter(
+            PersistentIdentifier.pid_type == "urn",
+            PersistentIdentifier.object_type == "rec",
+            PersistentIdentifier.object_uuid.in_(list(pids)),
+        )
+        with_urn = {str(object_uuid) for (object_uuid,) in query}
+        for record_id, pid in pids.items():
+            urns.setdefault(pid, record_id in with_urn)
+
+    @classmethod
+    def get_document(cls, record):
+        """Get the resolved document corresponding to the record.
+
+        :param record: Record to check.
+        :returns: Resolved document.
+        """
+        documents = get_memo("documents")
+        if documents is not None and record["pid"] in documents:
+            return documents[record["pid"]]
+
+        document = DocumentRecord.get_record_by_pid(record["pid"]).resolve()
+        if documents is not None:
+            documents[record["pid"]] = document
+        return document
 
     @classmethod
     def list(cls, user, record=None):
@@ -70,8 +153,7 @@ class DocumentPermission(RecordPermission):
         if user and user.is_superuser:
             return True
 
-        document = DocumentRecord.get_record_by_pid(record["pid"])
-        document = document.resolve()
+        document = cls.get_document(record)
         # Moderator can read their own documents.
         if user and user.is_moderator and document.has_organisation(current_organisation["pid"]):
             return True
@@ -91,8 +173,7 @@ class DocumentPermission(RecordPermission):
         if user.is_superuser:
             return True
 
-        document = DocumentRecord.get_record_by_pid(record["pid"])
-        document = document.resolve()
+        document = cls.get_document(record)
 
         # Moderator can update their own documents.
         if not document.has_organisation(current_organisation["pid"]):
@@ -126,17 +207,24 @@ class DocumentPermission(RecordPermission):
         :param record: Record to check.
         :returns: True if action can be done.
         """
+        urns = get_memo("urns")
+        if urns is not None and record["pid"] in urns:
+            return urns[record["pid"]]
+
         # Delete only documents with no URN or no registred URN
+        has_urn = False
         document = DocumentRecord.get_record_by_pid(record["pid"])
         if document:
             # check if document has urn
             try:
-                urn_identifier = PersistentIdentifier.get_by_object("urn", "rec", document.id)
+                PersistentIdentifier.get_by_object("urn", "rec", document.id)
+                has_urn = True
             except PIDDoesNotExistError:
-                return False
+                has_urn = False
 
-            return True
-        return False
+        if urns is not None:
+            urns[record["pid"]] = has_urn
+        return has_urn
 
 
 class DocumentFilesPermission(FilesPermission):
@@ -148,8 +236,26 @@ class DocumentFilesPermission(FilesPermission):
 
     @classmethod
     def get_document(cls, parent_record):
-        """Get the parent document."""
-        return DocumentRecord.get_record_by_pid(parent_record.get("pid"))
+        """Get the parent document.
+
+        The document is loaded once for the request, a parent record already
+        loaded from the database is used as is.
+
+        :param parent_record: the record related to the bucket.
+        :returns: Document record.
+        """
+        documents = get_memo("files_documents")
+        pid = parent_record.get("pid")
+        if documents is not None and pid in documents:
+            return documents[pid]
+
+        if isinstance(parent_record, DocumentRecord) and parent_record.model is not None:
+            document = parent_record
+        else:
+            document = DocumentRecord.get_record_by_pid(pid)
+        if documents is not None:
+            documents[pid] = document
+        return document
 
     @classmethod
     def read(cls, user, record, pid, parent_record):
@@ -202,7 +308,7 @@ class DocumentFilesPermission(FilesPermission):
             file_type = record["type"]
             if file_type == "file" and record["mimetype"] == "application/pdf":
                 return not DocumentPermission.has_urn(parent_record) and DocumentPermission.update(user, parent_record)
-        if document := cls.get_document(parent_record):
+        if document:
             return DocumentPermission.update(user, document)
         return False
 
@@ -16,9 +16,16 @@
 """Signals connections for documents."""
 
 import json
+import multiprocessing
+import os
 import re
 import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
 from datetime import datetime
+from functools import partial
+from itertools import islice
 from os import makedirs
 from os.path import exists, join
 
@@ -26,8 +33,9 @@ import click
 from flask import current_app
 from invenio_search import current_search
 
+from sonar.modules.documents.dojson.rerodoc.registry import conversion_run
+from sonar.modules.documents.dojson.rerodoc.registry import flush as flush_registries
 from sonar.modules.documents.loaders.schemas.factory import LoaderSchemaFactory
-from sonar.modules.utils import chunks
 from sonar.webdav import HegClient
 
 from .api import DocumentSearch
@@ -36,11 +44,115 @@ from .tasks import import_records
 CHUNK_SIZE = 20
 
 
+class HarvestMetrics:
+    """Records processed and time spent by each stage of a harvest."""
+
+    def __init__(self):
+        """Initialize counters."""
+        self.stages = {}
+
+    def add(self, stage, duration, count=1):
+        """Count records processed by a stage.
+
+        :param stage: Name of the stage.
+        :param duration: Time spent in seconds.
+        :param count: Number of records.
+        """
+        total_count, total_duration = self.stages.get(stage, (0, 0))
+        self.stages[stage] = (total_count + count, total_duration + duration)
+
+    def report(self):
+        """Get the throughput of each stage.
+
+        :returns: List of lines.
+        """
+        return [
+            f"{stage}: {count} records in {duration:.2f} seconds ({count / duration if duration else 0:.1f} records/s)"
+            for stage, (count, duration) in self.stages.items()
+        ]
+
+
+def _read_records(records, metrics):
+    """Consume the harvested records lazily.
+
+    :param records: Iterable of harvested records.
+    :param metrics: HarvestMetrics instance.
+    """
+    records = iter(records)
+    while True:
+        start = time.perf_counter()
+        try:
+            record = str(next(records))
+        except StopIteration:
+            return
+        metrics.add("harvest", time.perf_counter() - start)
+        yield record
+
+
+def _parse_record(schema_key, data):
+    """Parse a harvested record, in a worker process.
+
+    :param schema_key: Key of the loader schema.
+    :param data: XML string.
+    :returns: Tuple (parsed data, time spent).
+    """
+    start = time.perf_counter()
+    data = LoaderSchemaFactory.create(schema_key).parse(data)
+    return data, time.perf_counter() - start
+
+
+def _parallel_map(function, iterable, processes):
+    """Apply a function on the items of an iterable in a pool of processes.
+
+    Contrary to `Executor.map`, the iterable is consumed lazily: only a few
+    items per process are pending at any time. Results are yielded in order.
+
+    :param function: Function to apply, must be picklable.
+    :param iterable: Iterable of items.
+    :param processes: Number of processes, the number of CPUs if None, no
+        pool is used if 1 or in a daemonic process, which cannot have
+        children.
+    """
+    processes = processes or os.cpu_count() or 1
+    if processes == 1 or multiprocessing.current_process().daemon:
+        yield from map(function, iterable)
+        return
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        window = processes * 2
+        pending = deque()
+        for item in iterable:
+            pending.append(executor.submit(function, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _dispatch(records, metrics):
+    """Send a chunk of records to the import queue.
+
+    :param records: List of records.
+    :param metrics: HarvestMetrics instance.
+    """
+    start = time.perf_counter()
+    import_records.delay(records)
+    metrics.add("dispatch", time.perf_counter() - start, len(records))
+
+
 def transform_harvested_records(sender=None, records=None, **kwargs):
     """Harvest records and transform them and send to the import queue.
 
     This function is called when the oaiharvester command is finished.
 
+    Records are consumed lazily and parsed in a pool of processes (see
+    `SONAR_DOCUMENTS_HARVEST_PROCESSES`). Each chunk is sent to the import
+    queue as soon as it is full, so that the import starts during the
+    transformation. The conversion stays in the current process, as it can
+    create organisations, subdivisions and collections. For RERODOC, the
+    subdivisions and collections are loaded once, the missing ones are
+    created at once before a chunk is sent.
+
     :param sender: Sender of the signal.
     :param list records: Liste of records to harvest.
     """
@@ -57,28 +169,47 @@ def transform_harvested_records(sender=None, records=None, **kwargs):
     if kwargs.get("name"):
         click.echo(f'Harvesting records from "{kwargs.get("name")}"')
 
-    harvested_records = list(records)
+    metrics = HarvestMetrics()
+    harvested_records = _read_records(records, metrics)
 
-    # Reduce array to max records
+    # Reduce to max records
     if max_records:
-        harvested_records = harvested_records[: int(max_records)]
-
-    records = []
+        harvested_records = islice(harvested_records, int(max_records))
 
     loader_schema = LoaderSchemaFactory.create(kwargs["name"])
 
-    for harvested_record in harvested_records:
-        # Convert from Marc XML to JSON
-        data = loader_schema.dump(str(harvested_record))
-
-        # Add transformed data to list
-        records.append(data)
-
-    # Chunk record list and send celery task
-    for chunk in list(chunks(records, CHUNK_SIZE)):
-        import_records.delay(chunk)
-
-    click.echo(f"{len(records)} records harvested in {time.time() - start_time} seconds")
+    parsed_records = _parallel_map(
+        partial(_parse_record, kwargs["name"]),
+        harvested_records,
+        current_app.config.get("SONAR_DOCUMENTS_HARVEST_PROCESSES"),
+    )
+
+    count = 0
+    chunk = []
+    run = conversion_run() if kwargs["name"] == "rerodoc" else nullcontext()
+    with run:
+        for data, duration in parsed_records:
+            metrics.add("parse", duration)
+
+            # Convert parsed data to JSON
+            start = time.perf_counter()
+            chunk.append(loader_schema.dump(data))
+            metrics.add("convert", time.perf_counter() - start)
+            count += 1
+
+            # Send celery task as soon as the chunk is full
+            if len(chunk) == CHUNK_SIZE:
+                flush_registries(chunk)
+                _dispatch(chunk, metrics)
+                chunk = []
+
+        if chunk:
+            flush_registries(chunk)
+            _dispatch(chunk, metrics)
+
+    click.echo(f"{count} records harvested in {time.time() - start_time} seconds")
+    for line in metrics.report():
+        click.echo(line)
 
 
 def export_json(sender=None, records=None, **kwargs):
@@ -20,6 +20,7 @@ from invenio_records_rest.serializers.dc import (
 )
 from lxml import etree
 
+from .dc_cache import dc_cache
 from .oai_dc import SonarDublinCoreXMLSerializer
 
 
@@ -48,12 +49,15 @@ class DublinCoreSerializer(BaseDublinCoreSerializer, SonarDublinCoreXMLSerialize
         """
         root = etree.Element("collection", total=str(search_result["hits"]["total"]["value"]))
         for hit in search_result["hits"]["hits"]:
-            child = self.serialize_dict_to_etree(
-                self.transform_search_hit(
-                    pid_fetcher(hit["_id"], hit["_source"]),
-                    hit,
-                    links_factory=item_links_factory,
-                )
+            child = dc_cache.load(
+                hit["_source"],
+                lambda hit=hit: self.serialize_dict_to_etree(
+                    self.transform_search_hit(
+                        pid_fetcher(hit["_id"], hit["_source"]),
+                        hit,
+                        links_factory=item_links_factory,
+                    )
+                ),
             )
             root.append(child)
         return etree.tostring(root, pretty_print=True, encoding="UTF-8")
@@ -0,0 +1,123 @@
+# Swiss Open Access Repository
+# Copyright (C) 2021 RERO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Cache of the Dublin Core serialization of indexed documents."""
+
+import hashlib
+from datetime import date, datetime
+
+from flask import current_app, request
+from invenio_cache import current_cache
+from lxml import etree
+
+from sonar.modules.metadata_cache import metadata_cache
+
+
+def get_context_key():
+    """Get the key of the request context the serialization depends on.
+
+    The links use the host, and the restrictions of the files depend on the
+    view and on the OAI-PMH endpoint.
+
+    :returns: Key of the context.
+    """
+    view = request.args.get("view") or (request.view_args or {}).get("view")
+    is_oai = bool(request.url_rule) and request.url_rule.rule == "/oai2d"
+    return hashlib.sha1(f"{request.host_url}|{view}|{is_oai}".encode()).hexdigest()[:16]
+
+
+def get_expiration(data):
+    """Get the date until which the serialization of a document is valid.
+
+    The serialization changes when the embargo of a file ends. Files
+    restricted outside of their organisation depend on the client, the
+    serialization is then not cached.
+
+    :param data: Indexed document.
+    :returns: Tuple (True if the serialization can be cached, expiration
+        date in ISO format or None).
+    """
+    today = date.today().isoformat()
+    expiration = None
+    for file in data.get("_files", []):
+        if file.get("type") != "file":
+            continue
+        embargo_date = None
+        if file.get("access") == "coar:c_f1cf" and file.get("embargo_date"):
+            try:
+                embargo_date = datetime.strptime(file["embargo_date"], "%Y-%m-%d").date().isoformat()
+            except ValueError:
+                embargo_date = None
+        embargoed = embargo_date is not None and embargo_date > today
+        if file.get("restricted_outside_organisation") and (file.get("access") == "coar:c_16ec" or embargoed):
+            return False, None
+        if embargoed:
+            expiration = min(expiration or embargo_date, embargo_date)
+    return True, expiration
+
+
+class DublinCoreCache:
+    """Serialized Dublin Core of indexed documents, in the application cache.
+
+    An entry is kept by document and request context, it is valid as long
+    as the document and the organisations are not modified.
+    """
+
+    prefix = "sonar_dc"
+
+    @staticmethod
+    def get_version(data):
+        """Get the version of the data a serialization is built from.
+
+        :param data: Indexed document.
+        :returns: Tuple (update date of the document, version of the
+            organisations).
+        """
+        return (data.get("_updated"), metadata_cache.get_version("org")[0])
+
+    def load(self, data, build):
+        """Get the serialization of a document, from the cache or built.
+
+        :param data: Indexed document, with its update date.
+        :param build: Callable building the etree element of the document.
+        :returns: An etree element.
+        """
+        timeout = current_app.config.get("SONAR_APP_DC_CACHE_TIMEOUT")
+        if not timeout or not data.get("pid") or not data.get("_updated"):
+            return build()
+
+        key = f"{self.prefix}:{get_context_key()}:{data['pid']}"
+        version = self.get_version(data)
+        entry = current_cache.get(key)
+        if (
+            entry
+            and entry["version"] == version
+            and (not entry["expiration"] or date.today().isoformat() < entry["expiration"])
+        ):
+            return etree.fromstring(entry["xml"])
+
+        # Computed before the serialization, which modifies the data.
+        cacheable, expiration = get_expiration(data)
+        root = build()
+        if cacheable:
+            current_cache.set(
+                key,
+                {"version": version, "expiration": expiration, "xml": etree.tostring(root)},
+                timeout=timeout,
+            )
+        return root
+
+
+dc_cache = DublinCoreCache()
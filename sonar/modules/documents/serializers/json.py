@@ -20,6 +20,8 @@ from datetime import datetime
 from flask import request
 
 from sonar.modules.collections.api import Record as CollectionRecord
+from sonar.modules.documents.permissions import DocumentPermission
+from sonar.modules.metadata_cache import metadata_cache
 from sonar.modules.organisations.api import OrganisationRecord
 from sonar.modules.serializers import JSONSerializer as BasedJSONSerializer
 from sonar.modules.utils import get_language_value
@@ -28,6 +30,23 @@ from sonar.modules.utils import get_language_value
 class JSONSerializer(BasedJSONSerializer):
     """JSON serializer for documents."""
 
+    def serialize_search(self, pid_fetcher, search_result, links=None, item_links_factory=None, **kwargs):
+        """Serialize a search result.
+
+        The permissions of all the hits are prepared at once.
+
+        :param pid_fetcher: Persistent identifier fetcher.
+        :param search_result: Elasticsearch search result.
+        :param links: Dictionary of links to add to response.
+        """
+        # For public views, no check for permissions
+        if not request.args.get("view"):
+            DocumentPermission.prefetch(search_result["hits"]["hits"])
+
+        return super().serialize_search(
+            pid_fetcher, search_result, links=links, item_links_factory=item_links_factory, **kwargs
+        )
+
     def post_process_serialize_search(self, results, pid_fetcher):
         """Post process the search results."""
         view = request.args.get("view")
@@ -42,11 +61,11 @@ class JSONSerializer(BasedJSONSerializer):
 
         # Add organisation name
         for org_term in results.get("aggregations", {}).get("organisation", {}).get("buckets", []):
-            if organisation := OrganisationRecord.get_record_by_pid(org_term["key"]):
+            if organisation := metadata_cache.get_record(OrganisationRecord, org_term["key"]):
                 org_term["name"] = organisation["name"]
 
         # Add collection name
         for org_term in results.get("aggregations", {}).get("collection", {}).get("buckets", []):
-            if collection := CollectionRecord.get_record_by_pid(org_term["key"]):
+            if collection := metadata_cache.get_record(CollectionRecord, org_term["key"]):
                 org_term["name"] = get_language_value(collection["name"])
         return super().post_process_serialize_search(results, pid_fetcher)
@@ -19,6 +19,7 @@ from flask_resources.serializers import BaseSerializer
 from invenio_oaiserver.utils import sanitize_unicode
 from lxml import etree
 
+from sonar.modules.documents.serializers.dc_cache import dc_cache
 from sonar.modules.documents.serializers.schemas.dc import DublinCoreSchema
 
 
@@ -43,8 +44,9 @@ class SonarDublinCoreXMLSerializer(BaseSerializer):
         :param obj: Record instance.
         :returns: an etree element.
         """
-        data = self.transform_record(obj["_source"])
-        return self.serialize_dict_to_etree(data)
+        return dc_cache.load(
+            obj["_source"], lambda: self.serialize_dict_to_etree(self.transform_record(obj["_source"]))
+        )
 
     def serialize_dict_to_etree(self, data):
         """Serialize json to etree.
@@ -18,6 +18,9 @@
 from celery import shared_task
 from flask import current_app
 from invenio_db import db
+from sqlalchemy.orm.exc import NoResultFound
+
+from sonar.modules.downloader import FileDownloader
 
 
 @shared_task(ignore_result=True)
@@ -36,55 +39,135 @@ def import_records(records_to_import):
 
     ids = []
 
+    # Resolve all affiliations of the chunk at once, as the same affiliations
+    # are often repeated across the records. On error, they are resolved
+    # record by record, so that only the faulty record is not imported.
+    try:
+        affiliations = DocumentRecord.resolve_affiliations(records_to_import)
+    except Exception as exception:
+        current_app.logger.warning(f"Error during resolution of the affiliations of the chunk: {exception}")
+        affiliations = None
+
+    # Records with invalid identifiers are not imported, the others are
+    # searched at once.
+    records_data = []
     for data in records_to_import:
         try:
-            files_data = data.pop("files", [])
+            DocumentRecord.get_search_identifiers(data.get("identifiedBy", []))
+            records_data.append(data)
+        except Exception as exception:
+            current_app.logger.error(f"Error during importation of record {data}: {exception}")
 
-            record = DocumentRecord.get_record_by_identifier(data.get("identifiedBy", []))
+    # Find the records already imported, for the whole chunk at once.
+    existing_records = DocumentRecord.get_records_by_identifiers(
+        [data.get("identifiedBy", []) for data in records_data]
+    )
+
+    # Download the files of the whole chunk concurrently.
+    with FileDownloader() as downloader:
+        downloader.download(
+            [
+                file_data["url"]
+                for data in records_data
+                for file_data in data.get("files", [])
+                if file_data.get("url", "").startswith("http")
+            ]
+        )
+
+        for data, record in zip(records_data, existing_records):
+            try:
+                files_data = data.pop("files", [])
+
+                # Set record as harvested
+                data["harvested"] = True
+
+                if not record:
+                    record = DocumentRecord.create(data, dbcommit=False, with_bucket=True, affiliations=affiliations)
+                else:
+                    current_app.logger.warning(f"Record already imported with PID {record['pid']}: {data}")
+                    record.update(data, affiliations=affiliations)
+
+                for file_data in files_data:
+                    # Store url and key and remove it from dict to pass dict to
+                    # kwargs in add_file_from_url method
+                    url = file_data.pop("url")
+                    key = file_data.pop("key")
+
+                    try:
+                        if url.startswith("http"):
+                            record.add_file_from_url(url, key, downloader=downloader, **file_data)
+                        else:
+                            with open(url, "rb") as pdf_file:
+                                record.add_file(pdf_file, key, **file_data)
+                    except Exception as exception:
+                        current_app.logger.warning(
+                            f"Error during import of file {key} of record {record['identifiedBy']}: {exception}"
+                        )
+
+                # Merge record in database, at this time it's not saved into DB.
+                record.commit()
+
+                # Pushing record to database, not yet persisted into DB
+                db.session.flush()
+
+                # Add ID for bulk index in elasticsearch
+                ids.append(str(record.id))
+
+                current_app.logger.info(f'Record with reference "{record["identifiedBy"]}" imported successfully')
+
+            except Exception as exception:
+                current_app.logger.error(f"Error during importation of record {data}: {exception}")
 
-            # Set record as harvested
-            data["harvested"] = True
+    # Commit and index records
+    db.session.commit()
+    indexer.bulk_index(ids)
+    indexer.process_bulk_queue()
 
-            if not record:
-                record = DocumentRecord.create(data, dbcommit=False, with_bucket=True)
-            else:
-                current_app.logger.warning(f"Record already imported with PID {record['pid']}: {data}")
-                record.update(data)
+    return ids
 
-            for file_data in files_data:
-                # Store url and key and remove it from dict to pass dict to
-                # kwargs in add_file_from_url method
-                url = file_data.pop("url")
-                key = file_data.pop("key")
 
-                try:
-                    if url.startswith("http"):
-                        record.add_file_from_url(url, key, **file_data)
-                    else:
-                        with open(url, "rb") as pdf_file:
-                            record.add_file(pdf_file.read(), key, **file_data)
-                except Exception as exception:
-                    current_app.logger.warning(
-                        f"Error during import of file {key} of record {record['identifiedBy']}: {exception}"
-                    )
+def _create_derivatives(task, record_id, key, thumbnail=False):
+    """Create the derivatives of a file and store them in the record.
 
-            # Merge record in database, at this time it's not saved into DB.
-            record.commit()
+    :param task: Bound celery task, retried if the record is not found.
+    :param str record_id: Record UUID.
+    :param str key: Key of the file.
+    :param thumbnail: Create the thumbnail of the file too.
+    """
+    from sonar.modules.documents.api import DocumentRecord
 
-            # Pushing record to database, not yet persisted into DB
-            db.session.flush()
+    try:
+        record = DocumentRecord.get_record(record_id)
+    except NoResultFound as exception:
+        # Record not yet visible, or deleted.
+        raise task.retry(exc=exception) from exception
 
-            # Add ID for bulk index in elasticsearch
-            ids.append(str(record.id))
+    if key not in record.files:
+        return
 
-            current_app.logger.info(f'Record with reference "{record["identifiedBy"]}" imported successfully')
+    record.create_fulltext_file(record.files[key], deferred=False)
+    if thumbnail:
+        record.create_thumbnail(record.files[key])
+    record.commit()
+    db.session.commit()
+    record.reindex()
 
-        except Exception as exception:
-            current_app.logger.error(f"Error during importation of record {data}: {exception}")
 
-    # Commit and index records
-    db.session.commit()
-    indexer.bulk_index(ids)
-    indexer.process_bulk_queue()
+@shared_task(bind=True, ignore_result=True, max_retries=5, default_retry_delay=30)
+def extract_fulltext(self, record_id, key):
+    """Extract the fulltext of a file and store it in the record.
 
-    return ids
+    :param str record_id: Record UUID.
+    :param str key: Key of the file.
+    """
+    _create_derivatives(self, record_id, key)
+
+
+@shared_task(bind=True, ignore_result=True, max_retries=5, default_retry_delay=30)
+def create_file_derivatives(self, record_id, key):
+    """Create the fulltext and the thumbnail of a file and store them in the record.
+
+    :param str record_id: Record UUID.
+    :param str key: Key of the file.
+    """
+    _create_derivatives(self, record_id, key, thumbnail=True)
@@ -19,10 +19,80 @@ from datetime import datetime, timedelta, timezone
 
 from flask import current_app
 from invenio_db import db
-from invenio_pidstore.errors import PIDAlreadyExists
 from invenio_pidstore.models import PersistentIdentifier, PIDStatus
 
+from sonar.modules.api import SonarRecord
 from sonar.modules.documents.models import UrnIdentifier
+from sonar.modules.utils import batched
+
+# Conversion of the characters of a URN to digits, to calculate the check
+# digit. For details on the algorithm, see: https://d-nb.info/1045320641/34
+URN_CONVERSION_TABLE = {
+    "0": "1",
+    "1": "2",
+    "2": "3",
+    "3": "4",
+    "4": "5",
+    "5": "6",
+    "6": "7",
+    "7": "8",
+    "8": "9",
+    "9": "41",
+    "A": "18",
+    "B": "14",
+    "C": "19",
+    "D": "15",
+    "E": "16",
+    "F": "21",
+    "G": "22",
+    "H": "23",
+    "I": "24",
+    "J": "25",
+    "K": "42",
+    "L": "26",
+    "M": "27",
+    "N": "13",
+    "O": "28",
+    "P": "29",
+    "Q": "31",
+    "R": "12",
+    "S": "32",
+    "T": "33",
+    "U": "11",
+    "V": "34",
+    "W": "35",
+    "X": "36",
+    "Y": "37",
+    "Z": "38",
+    "-": "39",
+    ":": "17",
+    "_": "43",
+    ".": "47",
+    "/": "45",
+    "+": "49",
+}
+
+# Digits of each character, upper and lower case.
+URN_DIGITS = {
+    char: tuple(int(digit) for digit in digits)
+    for key, digits in URN_CONVERSION_TABLE.items()
+    for char in {key, key.lower()}
+}
+
+
+def _add_digits(text, state=(0, 0, 0)):
+    """Add the digits of a text to the state of a check digit calculation.
+
+    :param text: part of the urn identifier.
+    :param state: tuple (number of digits, product sum, last digit).
+    :returns: the new state.
+    """
+    position, product_sum, last_digit = state
+    for char in text:
+        for last_digit in URN_DIGITS[char]:
+            position += 1
+            product_sum += position * last_digit
+    return position, product_sum, last_digit
 
 
 class URNAlreadyRegisteredError(Exception):
@@ -40,69 +110,58 @@ class Urn:
 
         :param urn: the urn identifier.
         """
-        # For details on the algorithm, see:
-        # https://d-nb.info/1045320641/34
-        # set up conversion table
-        conversion_table = {
-            "0": "1",
-            "1": "2",
-            "2": "3",
-            "3": "4",
-            "4": "5",
-            "5": "6",
-            "6": "7",
-            "7": "8",
-            "8": "9",
-            "9": "41",
-            "A": "18",
-            "B": "14",
-            "C": "19",
-            "D": "15",
-            "E": "16",
-            "F": "21",
-            "G": "22",
-            "H": "23",
-            "I": "24",
-            "J": "25",
-            "K": "42",
-            "L": "26",
-            "M": "27",
-            "N": "13",
-            "O": "28",
-            "P": "29",
-            "Q": "31",
-            "R": "12",
-            "S": "32",
-            "T": "33",
-            "U": "11",
-            "V": "34",
-            "W": "35",
-            "X": "36",
-            "Y": "37",
-            "Z": "38",
-            "-": "39",
-            ":": "17",
-            "_": "43",
-            ".": "47",
-            "/": "45",
-            "+": "49",
-        }
-        # obtain digit sequence using the conversion table by concatenating
-        # chars
-        digit_sequence = ""
-        for idx, element in enumerate(urn, 0):
-            digits = conversion_table[urn[idx].upper()]
-            digit_sequence = digit_sequence + digits
-        # calculate product sum
-        product_sum = 0
-        for idx, element in enumerate(digit_sequence, 0):
-            product_sum = product_sum + ((idx + 1) * int(digit_sequence[idx]))
-        # read the last number of the digit sequence and calculate the quotient
-        last_number = int(digit_sequence[-1])
-        quotient = int(product_sum / last_number)
-        quotient_string = str(quotient)
-        # read the check-digit from the quotient value string
-        return quotient_string[-1]
+        return cls.calculate_check_digits([urn])[0]
+
+    @classmethod
+    def calculate_check_digits(cls, urns):
+        """Return the check digits of several URNs.
+
+        The URNs generally share the same prefix, until the last hyphen: its
+        digits are summed once.
+
+        :param urns: list of urn identifiers, without check digit.
+        :returns: list of check digits, in the same order.
+        """
+        prefixes = {}
+        check_digits = []
+        for urn in urns:
+            prefix, separator, suffix = urn.rpartition("-")
+            prefix += separator
+            if prefix not in prefixes:
+                prefixes[prefix] = _add_digits(prefix)
+            _, product_sum, last_digit = _add_digits(suffix, prefixes[prefix])
+            # the check digit is the last digit of the quotient of the product
+            # sum by the last digit
+            check_digits.append(str(product_sum // last_digit % 10))
+        return check_digits
+
+    @classmethod
+    def validate_urns(cls, urns):
+        """Check the check digits of several URNs.
+
+        :param urns: list of urn identifiers.
+        :returns: list of booleans, in the same order.
+        """
+        valid = [False] * len(urns)
+        positions = [position for position, urn in enumerate(urns) if len(urn) > 1 and set(urn) <= URN_DIGITS.keys()]
+        check_digits = cls.calculate_check_digits([urns[position][:-1] for position in positions])
+        for position, check_digit in zip(positions, check_digits):
+            valid[position] = urns[position][-1] == check_digit
+        return valid
+
+    @classmethod
+    def generate_urns(cls, pids, config):
+        """Generate the URN codes of several identifiers of a namespace.
+
+        :param pids: list of pids of the urn identifiers.
+        :param config: organisation related configuration.
+        :returns: list of urn codes, in the same order.
+        """
+        base_urn = current_app.config.get("SONAR_APP_URN_DNB_BASE_URN")
+        new_urns = [f"{base_urn}{config.get('code'):03}-{pid}" for pid in pids]
+        return [
+            f"{new_urn}{check_digit}" for new_urn, check_digit in zip(new_urns, cls.calculate_check_digits(new_urns))
+        ]
 
     @classmethod
     def _generate_urn(cls, pid, config):
@@ -111,9 +170,21 @@ class Urn:
         :param pid: the pid of the urn identifier.
         :param config: organisation related configuration.
         """
-        base_urn = current_app.config.get("SONAR_APP_URN_DNB_BASE_URN")
-        new_urn = f"{base_urn}{config.get('code'):03}-{pid}"
-        return f"{new_urn}{cls._calculate_check_digit(new_urn)}"
+        return cls.generate_urns([pid], config)[0]
+
+    @classmethod
+    def get_organisation_pid(cls, record):
+        """Get the PID of the first organisation of a document.
+
+        The reference is read, the organisation is not loaded.
+
+        :param record: the document.
+        :returns: the organisation PID or None.
+        """
+        organisation = (record.get("organisation") or [{}])[0]
+        if organisation.get("$ref"):
+            return SonarRecord.get_pid_by_ref_link(organisation["$ref"])
+        return organisation.get("pid")
 
     @classmethod
     def create_urn(cls, record):
@@ -121,34 +192,58 @@ class Urn:
 
         :param record: the invenio record instance to be processed.
         """
+        pids = cls.reserve_urns([record])
+        return pids[0] if pids else None
+
+    @classmethod
+    def reserve_urns(cls, records):
+        """Reserve the URN identifiers of several documents at once.
+
+        The URNs are added to the identifiers of the documents, which are
+        not committed.
+
+        :param records: list of the invenio record instances to be processed.
+        :returns: list of the reserved persistent identifiers.
+        """
         from sonar.modules.documents.api import DocumentRecord
 
         urn_config = current_app.config.get("SONAR_APP_DOCUMENT_URN")
-        org_pid = record.resolve().get("organisation", [{}])[0].get("pid")
-        if DocumentRecord.get_rero_urn_code(record):
-            current_app.logger.warning(f"generated urn already exist for document: {record['pid']}")
-            return None
-        if (config := urn_config.get("organisations", {}).get(org_pid)) and record.get("documentType") in config.get(
-            "types"
-        ):
-            urn_next_pid = str(UrnIdentifier.next())
-            try:
-                urn_code = cls._generate_urn(int(urn_next_pid), config)
-                pid = PersistentIdentifier.create(
-                    cls.urn_pid_type,
-                    urn_code,
+        urn_codes = []
+        for record in records:
+            if DocumentRecord.get_rero_urn_code(record):
+                current_app.logger.warning(f"generated urn already exist for document: {record['pid']}")
+                continue
+            config = urn_config.get("organisations", {}).get(cls.get_organisation_pid(record))
+            if config and record.get("documentType") in config.get("types"):
+                urn_codes.append((record, cls._generate_urn(int(UrnIdentifier.next()), config)))
+        if not urn_codes:
+            return []
+
+        existing = {
+            pid_value
+            for (pid_value,) in db.session.query(PersistentIdentifier.pid_value).filter(
+                PersistentIdentifier.pid_type == cls.urn_pid_type,
+                PersistentIdentifier.pid_value.in_([urn_code for _, urn_code in urn_codes]),
+            )
+        }
+        pids = []
+        for record, urn_code in urn_codes:
+            if urn_code in existing:
+                current_app.logger.error(f"generated urn already exist for document: {record['pid']}")
+                continue
+            pids.append(
+                PersistentIdentifier(
+                    pid_type=cls.urn_pid_type,
+                    pid_value=urn_code,
                     object_type="rec",
                     object_uuid=record.id,
                     status=PIDStatus.RESERVED,
                 )
-                if "identifiedBy" in record:
-                    record["identifiedBy"].append({"type": "bf:Urn", "value": urn_code})
-                else:
-                    record["identifiedBy"] = [{"type": "bf:Urn", "value": urn_code}]
-                return pid
-            except PIDAlreadyExists:
-                current_app.logger.error(f"generated urn already exist for document: {record['pid']}")
-        return None
+            )
+            record.setdefault("identifiedBy", []).append({"type": "bf:Urn", "value": urn_code})
+        with db.session.begin_nested():
+            db.session.add_all(pids)
+        return pids
 
     @classmethod
     def _urn_query(cls, status=None):
@@ -214,6 +309,23 @@ class Urn:
             return True
         return False
 
+    @classmethod
+    def set_registered(cls, urn_codes):
+        """Mark reserved URN identifiers as registered, in one query.
+
+        :param urn_codes: list of URN codes registered to the DNB service.
+        :returns: number of updated identifiers.
+        """
+        if not urn_codes:
+            return 0
+        count = PersistentIdentifier.query.filter(
+            PersistentIdentifier.pid_type == cls.urn_pid_type,
+            PersistentIdentifier.pid_value.in_(urn_codes),
+            PersistentIdentifier.status == PIDStatus.RESERVED,
+        ).update({PersistentIdentifier.status: PIDStatus.REGISTERED}, synchronize_session="fetch")
+        db.session.commit()
+        return count
+
     @classmethod
     def get_documents_to_generate_urns(cls):
         """Get documents that need a URN code.
@@ -226,7 +338,7 @@ class Urn:
 
         urn_config = current_app.config.get("SONAR_APP_DOCUMENT_URN")
         configs = urn_config.get("organisations", {})
-        pids = []
+        ids = set()
         for org_pid in configs:
             config = configs.get(org_pid)
             doc_types = config.get("types")
@@ -246,7 +358,8 @@ class Urn:
                 )
                 .source(["pid"])
             )
-            pids.extend(hit.pid for hit in query.scan())
+            ids.update(hit.meta.id for hit in query.scan())
 
-        for pid in set(pids):
-            yield DocumentRecord.get_record_by_pid(pid)
+        # Documents are loaded by batches.
+        for batch in batched(sorted(ids), 500):
+            yield from DocumentRecord.get_records(batch)
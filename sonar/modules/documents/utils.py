@@ -21,11 +21,12 @@ from datetime import datetime
 from flask import current_app, request
 
 from sonar.modules.api import SonarRecord
+from sonar.modules.metadata_cache import metadata_cache
 from sonar.modules.organisations.api import OrganisationRecord, current_organisation
 from sonar.modules.utils import (
     change_filename_extension,
     format_date,
-    is_ip_in_list,
+    get_ip_matcher,
     remove_trailing_punctuation,
 )
 
@@ -133,11 +134,7 @@ def get_file_restriction(file, organisations, for_permission=True):
         # Take only the first IP, as X-Forwarded for gives the real IP + the
         # proxy IP.
         ip_address = ip_address.split(", ")[0]
-        for organisation in organisations:
-            if is_ip_in_list(ip_address, organisation.get("allowedIps", "").split("\n")):
-                return True
-
-        return False
+        return any(ip_address in get_ip_matcher(organisation.get("allowedIps", "")) for organisation in organisations)
 
     not_restricted = {"restricted": False, "date": None}
 
@@ -243,6 +240,6 @@ def get_organisations(record):
             if organisation.get("$ref")
             else organisation["pid"]
         )
-        organisations.append(OrganisationRecord.get_record_by_pid(organisation_pid))
+        organisations.append(metadata_cache.get_record(OrganisationRecord, organisation_pid))
 
     return organisations
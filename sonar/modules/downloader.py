@@ -0,0 +1,136 @@
+# Swiss Open Access Repository
+# Copyright (C) 2021 RERO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Concurrent download of external files."""
+
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from flask import current_app
+
+from .utils import requests_retry_session
+
+# Size of the chunks written to disk.
+CHUNK_SIZE = 1024 * 1024
+
+
+class FileDownloader:
+    """Download files concurrently, with a shared pool of connections.
+
+    Files are streamed to a temporary directory, which is removed when the
+    downloader is closed. To be used as a context manager.
+    """
+
+    def __init__(self, workers=None, workers_per_host=None, timeout=None, retries=None):
+        """Initialize downloader.
+
+        Parameters not given are taken from the `SONAR_APP_DOWNLOAD_*`
+        configuration.
+
+        :param workers: Number of concurrent downloads.
+        :param workers_per_host: Number of concurrent downloads on a host.
+        :param timeout: Connect and read timeout in seconds.
+        :param retries: Number of retries, with an exponential backoff.
+        """
+        config = current_app.config
+        self.workers = workers or config.get("SONAR_APP_DOWNLOAD_WORKERS")
+        self.workers_per_host = workers_per_host or config.get("SONAR_APP_DOWNLOAD_WORKERS_PER_HOST")
+        self.timeout = timeout or config.get("SONAR_APP_DOWNLOAD_TIMEOUT")
+        self.session = requests_retry_session(
+            retries=retries if retries is not None else config.get("SONAR_APP_DOWNLOAD_RETRIES"),
+            status_forcelist=(429, 500, 502, 503, 504),
+            pool_maxsize=self.workers,
+        )
+        # Downloads are done in threads, without application context.
+        self.logger = current_app.logger
+        self.directory = None
+        self.files = {}
+        self._lock = threading.Lock()
+        self._semaphores = {}
+
+    def __enter__(self):
+        """Create the temporary directory."""
+        self.directory = tempfile.mkdtemp(prefix="sonar-download-")
+        return self
+
+    def __exit__(self, *args):
+        """Remove the downloaded files and close connections."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.session.close()
+        self.files.clear()
+
+    def _get_semaphore(self, url):
+        """Get the semaphore limiting the concurrent downloads on a host.
+
+        :param url: URL of the file.
+        :returns: Semaphore.
+        """
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.workers_per_host)
+            return self._semaphores[host]
+
+    def _download(self, url):
+        """Download a file.
+
+        :param url: URL of the file.
+        :returns: Path of the downloaded file, or None if the file cannot be
+            downloaded.
+        """
+        path = None
+        try:
+            with self._get_semaphore(url), self.session.get(url, stream=True, timeout=self.timeout) as response:
+                if response.status_code != 200:
+                    raise requests.HTTPError(f"Status code {response.status_code}")
+                file_descriptor, path = tempfile.mkstemp(dir=self.directory)
+                with os.fdopen(file_descriptor, "wb") as file:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        file.write(chunk)
+            return path
+        except (OSError, requests.RequestException) as exception:
+            self.logger.warning(f"Error during download of {url}: {exception}")
+            if path:
+                os.remove(path)
+            return None
+
+    def download(self, urls):
+        """Download several files concurrently.
+
+        Files already downloaded are not downloaded again.
+
+        :param urls: List of URLs.
+        :returns: Dictionary of paths (None if the file cannot be
+            downloaded), keyed by URL.
+        """
+        urls = [url for url in dict.fromkeys(urls) if url not in self.files]
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            self.files.update(zip(urls, executor.map(self._download, urls)))
+        return self.files
+
+    def get(self, url):
+        """Get a downloaded file, the file is downloaded if needed.
+
+        :param url: URL of the file.
+        :returns: Path of the file, or None if the file cannot be downloaded.
+        """
+        if url not in self.files:
+            self.files[url] = self._download(url)
+        return self.files[url]
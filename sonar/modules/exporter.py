@@ -0,0 +1,202 @@
+# Swiss Open Access Repository
+# Copyright (C) 2021 RERO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Streaming export of records."""
+
+import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+
+from invenio_db import db
+from invenio_pidstore.models import PersistentIdentifier, PIDStatus
+from invenio_records.models import RecordMetadata
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+# File containing the exported records, one JSON document by line.
+DATA_FILE = "data.jsonl"
+
+# File containing the state of an export in progress.
+CHECKPOINT_FILE = "export.checkpoint"
+
+# `ioctl` request cloning a file on copy-on-write file systems (Linux).
+FICLONE = 0x40049409
+
+
+def copy_file(source, target, hardlink=False):
+    """Copy a file, sharing its data when possible.
+
+    The data is shared with a reflink on copy-on-write file systems, or with
+    a hard link if allowed, otherwise the file is copied.
+
+    :param source: Path of the file.
+    :param target: Path of the copy, replaced if it exists.
+    :param hardlink: Allow hard links: both paths are then the same file.
+    """
+    if os.path.lexists(target):
+        os.remove(target)
+    if hardlink:
+        try:
+            os.link(source, target)
+            return
+        except OSError:
+            pass
+    if fcntl:
+        try:
+            with open(source, "rb") as source_file, open(target, "wb") as target_file:
+                fcntl.ioctl(target_file.fileno(), FICLONE, source_file.fileno())
+            return
+        except OSError:
+            pass
+    shutil.copyfile(source, target)
+
+
+class RecordsExporter:
+    """Export records to JSON lines, with their files.
+
+    Records are loaded by batches, in the order of their persistent
+    identifiers, and written as soon as their files are copied. A checkpoint
+    is saved after each batch, an interrupted export can be resumed.
+    """
+
+    def __init__(self, record_class, output_dir, serializer=None, batch_size=500, workers=8, hardlink=False):
+        """Initialize exporter.
+
+        :param record_class: Record class.
+        :param output_dir: Output directory.
+        :param serializer: Serializer, `dumps` of the record if not set.
+        :param batch_size: Number of records loaded at once.
+        :param workers: Number of files copied concurrently.
+        :param hardlink: Use hard links for the files, when possible.
+        """
+        self.record_class = record_class
+        self.output_dir = output_dir
+        self.serializer = serializer
+        self.batch_size = batch_size
+        self.workers = workers
+        self.hardlink = hardlink
+        self.checkpoint_file = os.path.join(output_dir, CHECKPOINT_FILE)
+        self.data_file = os.path.join(output_dir, DATA_FILE)
+
+    def read_checkpoint(self):
+        """Read the checkpoint of an interrupted export.
+
+        :returns: Dictionary with the last exported identifier, the size of
+            the data file and the number of exported records, or None.
+        """
+        try:
+            with open(self.checkpoint_file) as file:
+                checkpoint = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if checkpoint.get("pid_type") != self.record_class.provider.pid_type:
+            return None
+        return checkpoint
+
+    def write_checkpoint(self, checkpoint):
+        """Save the checkpoint atomically.
+
+        :param checkpoint: Checkpoint data.
+        """
+        temporary_file = f"{self.checkpoint_file}.tmp"
+        with open(temporary_file, "w") as file:
+            json.dump(checkpoint, file)
+        os.replace(temporary_file, self.checkpoint_file)
+
+    def get_batches(self, last_id=0):
+        """Get the records by batches.
+
+        :param last_id: Identifier of the last exported PID.
+        :returns: Generator of lists of tuples (PID identifier, pid, record).
+        """
+        # Objects loaded before the export stay in the session.
+        known = set(db.session.identity_map.keys())
+        while True:
+            query = (
+                db.session.query(PersistentIdentifier.id, PersistentIdentifier.pid_value, RecordMetadata)
+                .join(RecordMetadata, RecordMetadata.id == PersistentIdentifier.object_uuid)
+                .filter(
+                    PersistentIdentifier.pid_type == self.record_class.provider.pid_type,
+                    PersistentIdentifier.status == PIDStatus.REGISTERED,
+                    PersistentIdentifier.id > last_id,
+                    RecordMetadata.json.isnot(None),
+                )
+                .order_by(PersistentIdentifier.id)
+                .limit(self.batch_size)
+            )
+            batch = [(id_, pid, self.record_class(model.json, model=model)) for id_, pid, model in query]
+            if not batch:
+                return
+            yield batch
+            last_id = batch[-1][0]
+            # Objects loaded with the batch are not kept by the session.
+            for key, instance in list(db.session.identity_map.items()):
+                if key not in known:
+                    db.session.expunge(instance)
+
+    def serialize(self, pid, record, executor):
+        """Serialize a record and copy its files.
+
+        :param pid: PID of the record.
+        :param record: Record.
+        :param executor: Executor copying the files.
+        :returns: Tuple (serialized record, list of futures of the copies).
+        """
+        data = self.serializer.dump(record) if self.serializer else record.dumps()
+        copies = []
+        for file in data.get("files", []):
+            if file.get("uri"):
+                target_path = os.path.join(self.output_dir, pid, file["key"])
+                os.makedirs(os.path.dirname(target_path), mode=0o755, exist_ok=True)
+                copies.append(executor.submit(copy_file, file.pop("uri"), target_path, self.hardlink))
+                file["path"] = f"./{pid}/{file['key']}"
+        return data, copies
+
+    def export(self, resume=False):
+        """Export the records.
+
+        :param resume: Continue an interrupted export.
+        :returns: Number of exported records.
+        """
+        os.makedirs(self.output_dir, mode=0o755, exist_ok=True)
+        checkpoint = (resume and self.read_checkpoint()) or {
+            "pid_type": self.record_class.provider.pid_type,
+            "last_id": 0,
+            "size": 0,
+            "count": 0,
+        }
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor, open(self.data_file, "a") as output:
+            # Remove what was written after the checkpoint.
+            output.truncate(checkpoint["size"])
+            output.seek(checkpoint["size"])
+            for batch in self.get_batches(checkpoint["last_id"]):
+                results = [self.serialize(pid, record, executor) for _, pid, record in batch]
+                for data, copies in results:
+                    for copy in copies:
+                        copy.result()
+                    output.write(json.dumps(data) + "\n")
+                output.flush()
+                checkpoint.update(last_id=batch[-1][0], size=output.tell(), count=checkpoint["count"] + len(batch))
+                self.write_checkpoint(checkpoint)
+
+        with suppress(FileNotFoundError):
+            os.remove(self.checkpoint_file)
+        return checkpoint["count"]
@@ -0,0 +1,134 @@
+# Swiss Open Access Repository
+# Copyright (C) 2021 RERO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Cache of the metadata of organisations, collections and subdivisions."""
+
+import threading
+from collections import defaultdict
+from copy import deepcopy
+
+from flask import g, has_request_context
+from invenio_cache import current_cache
+
+# PID types of the cached records.
+CACHED_PID_TYPES = ("org", "coll", "subd")
+
+
+class MetadataCache:
+    """Process cache of small records, read on almost every request.
+
+    Entries are versioned by PID type. The version is shared by all the
+    processes through the application cache and increased each time a
+    record of the type is created, updated or deleted, it is read once per
+    request.
+    """
+
+    def __init__(self):
+        """Initialize cache."""
+        self._lock = threading.Lock()
+        self._store = {}
+        # Generations of the current process, in case the shared version
+        # cannot be increased.
+        self._generations = defaultdict(int)
+        self.hits = defaultdict(int)
+        self.misses = defaultdict(int)
+
+    @staticmethod
+    def get_version_key(pid_type):
+        """Get the key of the shared version of a PID type.
+
+        :param pid_type: PID type.
+        :returns: Key in the application cache.
+        """
+        return f"sonar_metadata_cache_{pid_type}"
+
+    def get_version(self, pid_type):
+        """Get the current version of a PID type.
+
+        :param pid_type: PID type.
+        :returns: Tuple (shared version, process generation).
+        """
+        versions = g.setdefault("metadata_cache_versions", {}) if has_request_context() else {}
+        if pid_type not in versions:
+            versions[pid_type] = current_cache.get(self.get_version_key(pid_type)) or 0
+        return (versions[pid_type], self._generations[pid_type])
+
+    def get_record(self, record_class, pid):
+        """Get a record from the cache, or from the database.
+
+        A new record is returned for each call, it can be modified.
+
+        :param record_class: Record class, with a provider.
+        :param pid: PID of the record.
+        :returns: Record built from the cached data, without model, or None.
+        """
+        pid_type = record_class.provider.pid_type
+        version = self.get_version(pid_type)
+        with self._lock:
+            entry = self._store.get((pid_type, pid))
+            if entry and entry[1] == version:
+                self.hits[pid_type] += 1
+                return record_class(deepcopy(entry[0]))
+            self.misses[pid_type] += 1
+
+        # Missing records are not stored, the PIDs can come from any URL.
+        if not (record := record_class.get_record_by_pid(pid)):
+            return None
+        data = record.dumps()
+        with self._lock:
+            self._store[(pid_type, pid)] = (data, version)
+        return record_class(deepcopy(data))
+
+    def invalidate(self, sender, record, *args, **kwargs):
+        """Increase the version of the PID type of a changed record.
+
+        :param record: Record.
+        """
+        pid_type = getattr(getattr(record, "provider", None), "pid_type", None)
+        if pid_type not in CACHED_PID_TYPES:
+            return
+        with self._lock:
+            self._generations[pid_type] += 1
+        version = current_cache.inc(self.get_version_key(pid_type))
+        if has_request_context() and version is not None:
+            g.setdefault("metadata_cache_versions", {})[pid_type] = version
+
+    def clear(self):
+        """Remove all entries and reset the counters."""
+        with self._lock:
+            self._store.clear()
+            self.hits.clear()
+            self.misses.clear()
+
+    def info(self):
+        """Get the counters.
+
+        :returns: Dictionary of counters, keyed by PID type.
+        """
+        with self._lock:
+            entries = defaultdict(int)
+            for pid_type, _ in self._store:
+                entries[pid_type] += 1
+            return {
+                pid_type: {
+                    "hits": self.hits[pid_type],
+                    "misses": self.misses[pid_type],
+                    "entries": entries[pid_type],
+                }
+                for pid_type in CACHED_PID_TYPES
+            }
+
+
+metadata_cache = MetadataCache()
@@ -15,7 +15,6 @@
 
 """Documents CLI commands."""
 
-import json
 import os.path
 from io import BytesIO
 
@@ -25,6 +24,7 @@ from flask.cli import with_appcontext
 from invenio_db import db
 
 from sonar.modules.organisations.api import OrganisationIndexer, OrganisationRecord
+from sonar.modules.utils import read_json_records
 
 
 @click.group()
@@ -43,7 +43,7 @@ def import_organisations(file):
 
     indexer = OrganisationIndexer()
 
-    for record in json.load(file):
+    for record in read_json_records(file):
         try:
             # Check existence in DB
             db_record = OrganisationRecord.get_record_by_pid(record["code"])
@@ -20,3 +20,21 @@ PDF_EXTRACTOR_GROBID_SERVER = "localhost"
 
 PDF_EXTRACTOR_GROBID_PORT = 8070
 """Grobid port."""
+
+PDF_EXTRACTOR_FULLTEXT_BACKEND = "auto"
+"""Backend used to extract the full-text of PDF files.
+
+`pdfium` extracts the text with `pypdfium2` (`pdfium` extra), in
+long-lived worker processes, and `pdftotext` with the command of poppler,
+in a process by extraction. `auto` uses `pdfium` if `pypdfium2` is
+installed and `pdftotext` otherwise.
+"""
+
+PDF_EXTRACTOR_FULLTEXT_WORKERS = 4
+"""Number of full-text extractions running at the same time in a process."""
+
+PDF_EXTRACTOR_FULLTEXT_TIMEOUT = 120
+"""Time limit in seconds for the full-text extraction of a file."""
+
+PDF_EXTRACTOR_FULLTEXT_MAX_PAGES = 2000
+"""Number of pages extracted from a file, None for all pages."""
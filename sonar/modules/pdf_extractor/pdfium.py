@@ -0,0 +1,77 @@
+# Swiss Open Access Repository
+# Copyright (C) 2021 RERO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Full-text extraction of PDF files with PDFium, in a worker process.
+
+PDFium is not thread-safe, so this script is run as a long-lived worker
+process by `PdfiumWorker`, which sends it one PDF at a time and kills it
+on timeout. It is run as a file and not as a module, to not import the
+application.
+
+Each request is a `REQUEST` header (number of pages to extract, 0 for
+all, and length of the PDF) followed by the PDF. Each response is a
+`RESPONSE` header (status, 0 on success, and length of the data) followed
+by the text of the pages, separated by form feeds, or by the error.
+"""
+
+import struct
+import sys
+
+REQUEST = struct.Struct("!IQ")
+RESPONSE = struct.Struct("!BQ")
+
+
+def extract_text(content, max_pages=None):
+    """Extract the text of the pages of a PDF.
+
+    :param content: Binary content of the PDF.
+    :param max_pages: Number of pages to extract.
+    :returns: Extracted text, pages separated by form feeds.
+    """
+    import pypdfium2
+
+    pages = []
+    pdf = pypdfium2.PdfDocument(content)
+    try:
+        for index in range(min(len(pdf), max_pages or len(pdf))):
+            page = pdf[index]
+            text_page = page.get_textpage()
+            pages.append(text_page.get_text_range())
+            text_page.close()
+            page.close()
+    finally:
+        pdf.close()
+    return "\f".join(pages)
+
+
+def serve(stdin, stdout):
+    """Answer the requests until the end of the input.
+
+    :param stdin: Binary input stream.
+    :param stdout: Binary output stream.
+    """
+    while len(header := stdin.read(REQUEST.size)) == REQUEST.size:
+        max_pages, length = REQUEST.unpack(header)
+        content = stdin.read(length)
+        try:
+            status, data = 0, extract_text(content, max_pages).encode()
+        except Exception as exception:
+            status, data = 1, str(exception).encode()
+        stdout.write(RESPONSE.pack(status, len(data)) + data)
+        stdout.flush()
+
+
+if __name__ == "__main__":
+    serve(sys.stdin.buffer, sys.stdout.buffer)
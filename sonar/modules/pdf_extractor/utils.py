@@ -15,32 +15,218 @@
 
 """Utils for PDF extraction."""
 
+import os
 import re
+import select
 import subprocess
+import sys
 import tempfile
+import threading
+import time
+from importlib.util import find_spec
 
 import pycountry
 from dojson.utils import force_list
+from flask import current_app
+
+from .pdfium import REQUEST, RESPONSE
+
+# Script extracting the full-text with PDFium, see `pdfium.py`.
+PDFIUM_SCRIPT = os.path.join(os.path.dirname(__file__), "pdfium.py")
+
+# Idle PDFium workers of the process, see `_extract_text_with_pdfium`.
+_pdfium_workers = []
+_pdfium_workers_lock = threading.Lock()
+
+# Limit of concurrent extractions in the process, see `get_extraction_slots`.
+_extraction_slots = None
+_extraction_slots_lock = threading.Lock()
+
+
+def get_extraction_slots():
+    """Get the semaphore bounding the concurrent extractions.
+
+    :returns: Semaphore of `PDF_EXTRACTOR_FULLTEXT_WORKERS` slots.
+    """
+    global _extraction_slots
+    with _extraction_slots_lock:
+        if _extraction_slots is None:
+            _extraction_slots = threading.BoundedSemaphore(current_app.config.get("PDF_EXTRACTOR_FULLTEXT_WORKERS"))
+        return _extraction_slots
+
+
+def get_fulltext_backend():
+    """Get the backend used to extract the full-text.
+
+    :returns: `pdfium` or `pdftotext`.
+    """
+    backend = current_app.config.get("PDF_EXTRACTOR_FULLTEXT_BACKEND")
+    installed = find_spec("pypdfium2") is not None
+    if backend == "pdfium" and not installed:
+        raise ImportError("pypdfium2 is not installed")
+    if backend == "auto":
+        return "pdfium" if installed else "pdftotext"
+    return backend
 
 
 def extract_text_from_content(content):
     """Extract full-text from content which will be stored in a temporary file.
 
     content is the binary representation of text.
+
+    The extraction is done by a long-lived worker process with PDFium if
+    possible, otherwise by a `pdftotext` process, and is limited in time and in pages (see
+    `PDF_EXTRACTOR_FULLTEXT_*` configuration).
     """
-    with tempfile.NamedTemporaryFile(mode="w+b", suffix=".pdf") as temp:
-        temp.write(content)
-        return extract_text_from_file(temp.name)
+    timeout = current_app.config.get("PDF_EXTRACTOR_FULLTEXT_TIMEOUT")
+    max_pages = current_app.config.get("PDF_EXTRACTOR_FULLTEXT_MAX_PAGES")
+
+    with get_extraction_slots():
+        if get_fulltext_backend() == "pdfium":
+            text = _extract_text_with_pdfium(content, timeout, max_pages)
+        else:
+            with tempfile.NamedTemporaryFile(mode="w+b", suffix=".pdf") as temp:
+                temp.write(content)
+                temp.flush()
+                text = _extract_text_with_pdftotext(temp.name, timeout, max_pages)
+
+    # Remove carriage returns
+    return re.sub(r"[\r\n\f]+", " ", text)
 
 
 def extract_text_from_file(file):
     """Extract full-text from file."""
-    # Process pdf text extraction
-    text = subprocess.check_output(f"pdftotext -enc UTF-8 {file} - 2> /dev/null", shell=True)
-    text = text.decode()
+    with open(file, "rb") as pdf_file:
+        return extract_text_from_content(pdf_file.read())
 
-    # Remove carriage returns
-    return re.sub(r"[\r\n\f]+", " ", text)
+
+def _extract_text_with_pdftotext(file, timeout=None, max_pages=None):
+    """Extract full-text from file with `pdftotext`.
+
+    :param file: Path of the PDF file.
+    :param timeout: Time limit in seconds, the process is killed after.
+    :param max_pages: Number of pages to extract.
+    :returns: Extracted text.
+    """
+    command = ["pdftotext", "-enc", "UTF-8"]
+    if max_pages:
+        command += ["-l", str(max_pages)]
+    result = subprocess.run(
+        [*command, file, "-"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        timeout=timeout,
+        check=True,
+    )
+    return result.stdout.decode()
+
+
+class PdfiumWorker:
+    """Long-lived process extracting the full-text with PDFium.
+
+    The process runs `pdfium.py` and extracts one PDF at a time. It is
+    broken if a request does not complete, on timeout for example, and must
+    be closed.
+    """
+
+    def __init__(self):
+        """Start the process."""
+        self.process = subprocess.Popen(
+            [sys.executable, PDFIUM_SCRIPT],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            bufsize=0,
+        )
+        self.parent_pid = os.getpid()
+        self.broken = False
+
+    def is_alive(self):
+        """Check if the process can take a request.
+
+        :returns: False if the process is broken, has exited, or belongs to
+            a parent process.
+        """
+        return not self.broken and self.parent_pid == os.getpid() and self.process.poll() is None
+
+    def extract(self, content, timeout=None, max_pages=None):
+        """Extract the full-text of a PDF.
+
+        :param content: Binary content of the PDF.
+        :param timeout: Time limit in seconds.
+        :param max_pages: Number of pages to extract.
+        :returns: Extracted text.
+        """
+        self.broken = True
+        deadline = time.monotonic() + timeout if timeout else None
+        self.process.stdin.write(REQUEST.pack(max_pages or 0, len(content)))
+        self.process.stdin.write(content)
+        status, length = RESPONSE.unpack(self._read(RESPONSE.size, deadline, timeout))
+        data = self._read(length, deadline, timeout)
+        self.broken = False
+        if status:
+            raise subprocess.CalledProcessError(status, PDFIUM_SCRIPT, stderr=data)
+        return data.decode()
+
+    def _read(self, size, deadline, timeout):
+        """Read the response of the process.
+
+        :param size: Number of bytes to read.
+        :param deadline: Time limit, as given by `time.monotonic`.
+        :param timeout: Time limit in seconds, for the error.
+        :returns: Bytes read.
+        """
+        output = self.process.stdout.fileno()
+        chunks = []
+        while size:
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not select.select([output], [], [], remaining)[0]:
+                    raise subprocess.TimeoutExpired(PDFIUM_SCRIPT, timeout)
+            chunk = os.read(output, min(size, 1024 * 1024))
+            if not chunk:
+                raise subprocess.CalledProcessError(self.process.wait(), PDFIUM_SCRIPT)
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
+
+    def close(self):
+        """Stop the process."""
+        self.process.kill()
+        self.process.wait()
+
+
+def _extract_text_with_pdfium(content, timeout=None, max_pages=None):
+    """Extract full-text from content with PDFium, in a worker process.
+
+    Workers are kept for the next extractions, a worker is killed on
+    timeout and a new one is started by the next extraction. The number of
+    workers is bounded by the concurrent extractions.
+
+    :param content: Binary content of the PDF.
+    :param timeout: Time limit in seconds, the worker is killed after.
+    :param max_pages: Number of pages to extract.
+    :returns: Extracted text.
+    """
+    worker = None
+    with _pdfium_workers_lock:
+        while _pdfium_workers and not worker:
+            worker = _pdfium_workers.pop()
+            if not worker.is_alive():
+                # Workers inherited from a parent process are left to it.
+                if worker.parent_pid == os.getpid():
+                    worker.close()
+                worker = None
+    worker = worker or PdfiumWorker()
+
+    try:
+        return worker.extract(content, timeout, max_pages)
+    finally:
+        if worker.is_alive():
+            with _pdfium_workers_lock:
+                _pdfium_workers.append(worker)
+        else:
+            worker.close()
 
 
 def format_extracted_data(data):
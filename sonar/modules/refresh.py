@@ -0,0 +1,196 @@
+# Swiss Open Access Repository
+# Copyright (C) 2021 RERO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Refresh policies of the indices after single record writes."""
+
+import re
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from flask import current_app
+
+# Flush and refresh the index after each write.
+REFRESH_FLUSH = "flush"
+# Refresh the index after each write, without forcing a Lucene flush.
+REFRESH_IMMEDIATE = "refresh"
+# Let the write request wait for the next periodic refresh of the index.
+REFRESH_WAIT_FOR = "wait_for"
+# Collapse all the writes done in a short window into one refresh per index.
+REFRESH_DEFERRED = "deferred"
+# Never refresh, for bulk contexts.
+REFRESH_NONE = "none"
+
+REFRESH_POLICIES = [
+    REFRESH_FLUSH,
+    REFRESH_IMMEDIATE,
+    REFRESH_WAIT_FOR,
+    REFRESH_DEFERRED,
+    REFRESH_NONE,
+]
+
+# Policy forced for the current context, see `refresh_policy`.
+_current_policy = ContextVar("refresh_policy", default=None)
+
+# Suffix of the versioned index names, e.g. `-document-v1.0.0`.
+INDEX_VERSION_SUFFIX = re.compile(r"-[^-]+-v\d+\.\d+\.\d+$")
+
+
+def get_index_alias(index_name):
+    """Get the alias of a versioned index.
+
+    :param index_name: Name of the index, e.g. `documents-document-v1.0.0`.
+    :returns: The alias, e.g. `documents`. The name if it is not versioned.
+    """
+    return INDEX_VERSION_SUFFIX.sub("", index_name)
+
+
+def get_refresh_policy(policy=None):
+    """Get the refresh policy to apply.
+
+    :param policy: Policy explicitly requested for a write.
+    :returns: The given policy, the one of the current context or the one
+        configured, in that order.
+    """
+    policy = policy or _current_policy.get() or current_app.config.get("SONAR_APP_INDEXER_REFRESH", REFRESH_IMMEDIATE)
+    if policy not in REFRESH_POLICIES:
+        raise ValueError(f'Unknown refresh policy "{policy}"')
+    return policy
+
+
+@contextmanager
+def refresh_policy(policy):
+    """Force a refresh policy for all the writes done within the context.
+
+    Pending deferred refreshes are executed at the end of the context.
+
+    :param policy: Refresh policy.
+    """
+    if policy not in REFRESH_POLICIES:
+        raise ValueError(f'Unknown refresh policy "{policy}"')
+    token = _current_policy.set(policy)
+    try:
+        yield
+    finally:
+        _current_policy.reset(token)
+        if policy == REFRESH_DEFERRED:
+            refresh_scheduler.run_pending()
+
+
+class RefreshMetrics:
+    """Counters of writes and refreshes, per index and per process."""
+
+    def __init__(self):
+        """Initialize counters."""
+        self._lock = threading.Lock()
+        self.writes = defaultdict(int)
+        self.refreshes = defaultdict(int)
+
+    def add_write(self, index_name):
+        """Count a write.
+
+        :param index_name: Name of the index.
+        """
+        with self._lock:
+            self.writes[index_name] += 1
+
+    def add_refresh(self, index_name):
+        """Count a refresh.
+
+        :param index_name: Name of the index.
+        """
+        with self._lock:
+            self.refreshes[index_name] += 1
+
+    def reset(self):
+        """Reset all counters."""
+        with self._lock:
+            self.writes.clear()
+            self.refreshes.clear()
+
+    def info(self):
+        """Get the counters.
+
+        :returns: Dictionary of counters, keyed by index name.
+        """
+        with self._lock:
+            return {
+                index_name: {
+                    "writes": writes,
+                    "refreshes": self.refreshes[index_name],
+                    "saved": max(writes - self.refreshes[index_name], 0),
+                }
+                for index_name, writes in self.writes.items()
+            }
+
+
+class RefreshScheduler:
+    """Coalesce the refreshes of an index requested in a short window."""
+
+    def __init__(self):
+        """Initialize scheduler."""
+        self._lock = threading.Lock()
+        self._timers = {}
+
+    def schedule(self, client, index_name, window):
+        """Schedule a refresh of the index.
+
+        If a refresh is already scheduled for the index, nothing is done.
+
+        :param client: Elasticsearch client.
+        :param index_name: Full name of the index.
+        :param window: Delay before the refresh, in seconds.
+        :returns: True if a new refresh has been scheduled.
+        """
+        with self._lock:
+            if index_name in self._timers:
+                return False
+            timer = threading.Timer(window, self._refresh, (client, index_name))
+            timer.daemon = True
+            self._timers[index_name] = (timer, client)
+            timer.start()
+            return True
+
+    def _refresh(self, client, index_name):
+        """Refresh the index.
+
+        :param client: Elasticsearch client.
+        :param index_name: Full name of the index.
+        """
+        with self._lock:
+            self._timers.pop(index_name, None)
+        client.indices.refresh(index=index_name)
+        refresh_metrics.add_refresh(index_name)
+
+    def run_pending(self):
+        """Execute all the scheduled refreshes immediately."""
+        with self._lock:
+            pending = list(self._timers.items())
+            self._timers.clear()
+        for index_name, (timer, client) in pending:
+            timer.cancel()
+            client.indices.refresh(index=index_name)
+            refresh_metrics.add_refresh(index_name)
+
+    @property
+    def pending(self):
+        """List of indices waiting for a refresh."""
+        with self._lock:
+            return list(self._timers)
+
+
+refresh_metrics = RefreshMetrics()
+refresh_scheduler = RefreshScheduler()
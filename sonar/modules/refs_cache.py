@@ -0,0 +1,232 @@
+# Swiss Open Access Repository
+# Copyright (C) 2021 RERO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Cache of the resources linked by `$ref`, for bulk operations."""
+
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from urllib.parse import urlparse
+
+from flask import current_app
+from invenio_db import db
+from invenio_pidstore.models import PersistentIdentifier, PIDStatus
+from invenio_records.models import RecordMetadata
+
+# Cache active in the current context, see `refs_cache`.
+_current_cache = ContextVar("refs_cache", default=None)
+
+# Generation of each resource, increased each time the resource is updated
+# in the current process, keyed by (resource name, pid).
+_generations = defaultdict(int)
+
+
+def get_ref_key(uri):
+    """Get the resource name and the PID from a `$ref` URI.
+
+    :param uri: URI, e.g. `https://sonar.ch/api/organisations/1`.
+    :returns: Tuple (resource name, pid).
+    """
+    path = urlparse(uri).path.rstrip("/").split("/")
+    return (path[-2], path[-1]) if len(path) > 1 else (None, path[-1])
+
+
+def get_record_key(record):
+    """Get the resource name and the PID of a record.
+
+    The resource name is taken from the JSON schema of the record.
+
+    :param record: Record.
+    :returns: Tuple (resource name, pid) or None if it cannot be determined.
+    """
+    schema = record.get("$schema")
+    if not schema or not record.get("pid"):
+        return None
+    path = urlparse(schema).path.split("/")
+    return (path[-2], record["pid"])
+
+
+def get_refs(data):
+    """Get all the `$ref` URIs contained in the data.
+
+    :param data: Record data.
+    :returns: Set of URIs.
+    """
+    refs = set()
+    if isinstance(data, dict):
+        if isinstance(data.get("$ref"), str):
+            refs.add(data["$ref"])
+        else:
+            for value in data.values():
+                refs |= get_refs(value)
+    elif isinstance(data, list):
+        for value in data:
+            refs |= get_refs(value)
+    return refs
+
+
+def get_pid_types():
+    """Get the PID types of the resources which can be linked by `$ref`.
+
+    :returns: Dictionary of PID types, keyed by resource name.
+    """
+    from .collections.config import Configuration as CollectionsConfiguration
+    from .subdivisions.config import Configuration as SubdivisionsConfiguration
+
+    pid_types = {
+        endpoint.get("list_route", "").strip("/"): endpoint.get("pid_type")
+        for endpoint in current_app.config.get("RECORDS_REST_ENDPOINTS", {}).values()
+    }
+    # Resources managed by `invenio-records-resources`.
+    for configuration in [CollectionsConfiguration, SubdivisionsConfiguration]:
+        pid_types[configuration.resolver_url.split("/")[2]] = configuration.pid_type
+    return pid_types
+
+
+def invalidate_record(sender, record, *args, **kwargs):
+    """Invalidate the cached data of an updated or deleted record.
+
+    :param record: Record.
+    """
+    if key := get_record_key(record):
+        _generations[key] += 1
+
+
+class RefsCache:
+    """Cache of the resources linked by `$ref`.
+
+    Entries expire after `ttl` seconds, or as soon as the record is updated
+    in the current process.
+    """
+
+    def __init__(self, ttl=None):
+        """Initialize cache.
+
+        :param ttl: Lifetime of entries in seconds, no expiration if None.
+        """
+        self.ttl = ttl
+        self._store = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, uri):
+        """Get the data of a resource from the cache.
+
+        :param uri: URI of the resource.
+        :returns: Data or None if not in cache or expired.
+        """
+        if not (entry := self._store.get(uri)):
+            return None
+        data, loaded_at, generation = entry
+        if (self.ttl is not None and time.monotonic() - loaded_at > self.ttl) or generation != _generations[
+            get_ref_key(uri)
+        ]:
+            self._store.pop(uri, None)
+            return None
+        return data
+
+    def set(self, uri, data):
+        """Store the data of a resource.
+
+        The data is shared by all the records linking the resource, it must
+        not be modified.
+
+        :param uri: URI of the resource.
+        :param data: Data.
+        """
+        self._store[uri] = (data, time.monotonic(), _generations[get_ref_key(uri)])
+
+    def load(self, uri, loader):
+        """Get the data of a resource, from the cache or from the loader.
+
+        :param uri: URI of the resource.
+        :param loader: Callable loading a resource by its URI.
+        :returns: Data.
+        """
+        if (data := self.get(uri)) is not None:
+            self.hits += 1
+            return data
+        self.misses += 1
+        data = loader(uri)
+        self.set(uri, data)
+        return data
+
+    def prefetch(self, records_data):
+        """Load all resources linked by the records, with one query by type.
+
+        Resources which are not found are left to the loader, which raises
+        the same errors as without prefetch.
+
+        :param records_data: List of records data.
+        """
+        pids_by_resource = defaultdict(dict)
+        for data in records_data:
+            for uri in get_refs(data):
+                if self.get(uri) is None:
+                    resource, pid = get_ref_key(uri)
+                    pids_by_resource[resource][pid] = uri
+
+        pid_types = get_pid_types()
+        for resource, uris in pids_by_resource.items():
+            if not (pid_type := pid_types.get(resource)):
+                continue
+            query = (
+                db.session.query(PersistentIdentifier.pid_value, RecordMetadata.json)
+                .join(RecordMetadata, RecordMetadata.id == PersistentIdentifier.object_uuid)
+                .filter(
+                    PersistentIdentifier.pid_type == pid_type,
+                    PersistentIdentifier.object_type == "rec",
+                    PersistentIdentifier.status == PIDStatus.REGISTERED,
+                    PersistentIdentifier.pid_value.in_(list(uris)),
+                    RecordMetadata.json.isnot(None),
+                )
+            )
+            for pid, json in query:
+                # Same data as returned by the JSON resolvers.
+                self.set(uris[pid], {key: value for key, value in json.items() if key != "$schema"})
+
+
+def get_refs_cache():
+    """Get the cache active in the current context.
+
+    :returns: RefsCache instance or None.
+    """
+    return _current_cache.get()
+
+
+@contextmanager
+def refs_cache(ttl=None, cache=None):
+    """Cache the resources linked by `$ref` within the context.
+
+    If a cache is already active, it is reused.
+
+    :param ttl: Lifetime of entries in seconds, `SONAR_APP_REFS_CACHE_TTL`
+        if not set.
+    :param cache: RefsCache instance to activate, kept by the caller
+        between contexts, a new one if not set.
+    :returns: RefsCache instance.
+    """
+    if active_cache := _current_cache.get():
+        yield active_cache
+        return
+
+    if cache is None:
+        cache = RefsCache(ttl if ttl is not None else current_app.config.get("SONAR_APP_REFS_CACHE_TTL"))
+    token = _current_cache.set(cache)
+    try:
+        yield cache
+    finally:
+        _current_cache.reset(token)
@@ -21,6 +21,7 @@ from flask import request
 from invenio_jsonschemas import current_jsonschemas
 from invenio_records_rest.serializers.json import JSONSerializer as _JSONSerializer
 
+from sonar.modules.metadata_cache import metadata_cache
 from sonar.modules.subdivisions.api import Record as SubdivisionRecord
 from sonar.modules.utils import get_language_value
 
@@ -52,7 +53,7 @@ class JSONSerializer(_JSONSerializer):
         """Post process the search results."""
         # Add subdivision name
         for org_term in results.get("aggregations", {}).get("subdivision", {}).get("buckets", []):
-            subdivision = SubdivisionRecord.get_record_by_pid(org_term["key"])
+            subdivision = metadata_cache.get_record(SubdivisionRecord, org_term["key"])
             if subdivision:
                 org_term["name"] = get_language_value(subdivision["name"])
 
@@ -29,11 +29,13 @@ def sitemap():
 
 @sitemap.command()
 @click.option("-s", "--server-name", "server_name", required=True, default=None)
+@click.option("--incremental", is_flag=True, default=False)
 @with_appcontext
-def generate(server_name):
+def generate(server_name, incremental):
     """Generate a sitemap.
 
     :param: server_name: organisation server name.
+    :param: incremental: Only write files containing updated documents.
     """
-    sitemap_generate(server_name, current_app.config.get("SONAR_APP_SITEMAP_ENTRY_SIZE", 10000))
+    sitemap_generate(server_name, current_app.config.get("SONAR_APP_SITEMAP_ENTRY_SIZE", 10000), incremental)
     click.secho(f"Generate sitemap for {server_name}", fg="green")
@@ -15,22 +15,46 @@
 
 """Sitemap."""
 
-import glob
-import math
+import hashlib
+import json
 import os
+import shutil
+import tempfile
+from collections import deque
 from datetime import datetime
+from urllib.parse import quote
 
 from flask import current_app, url_for
 
 from sonar.modules.documents.api import DocumentSearch
 from sonar.modules.organisations.api import OrganisationSearch
 
+# File storing the fingerprints of the generated files, for the incremental
+# mode.
+MANIFEST_FILE = "sitemap.json"
 
-def sitemap_generate(server_name, size=10000):
+# Placeholder of the PID in the URL of documents.
+PID_PLACEHOLDER = "__pid__"
+
+# Maximum number of URLs of a sitemap file, see https://www.sitemaps.org.
+MAX_URLS = 50000
+
+
+def sitemap_generate(server_name, size=10000, incremental=False):
     """Generate a sitemap.
 
+    Documents are scanned in order of PID and split in files of `size`
+    documents, each file being written as soon as it is complete. In
+    incremental mode, the files keep the ranges of PIDs of the last
+    generation, new documents are added to the last file: a file changes
+    only if one of its documents is added, updated or deleted, and only
+    these files are written. Files are written in a temporary folder, then
+    moved one by one to the sitemap folder, the index last: the sitemap
+    folder always contains complete files.
+
     :param: server_name: organisation server name.
-    :param: size: size of the set of sitemarp urls.
+    :param: size: Number of documents by file.
+    :param: incremental: Only write files containing updated documents.
     """
     # Find Organisation by server name and set view and server name
     search = DocumentSearch()
@@ -41,66 +65,181 @@ def sitemap_generate(server_name, size=10000):
         org_pid = current_app.config.get("SONAR_APP_DEFAULT_ORGANISATION")
 
     with current_app.test_request_context(f"https://{server_name}"):
-        files_splitted = 0
-        file_name = "sitemap.xml"
         folder = []
         if org_pid != current_app.config.get("SONAR_APP_DEFAULT_ORGANISATION"):
             folder.append(org_pid)
         sitemap_folder = os.path.join(current_app.config.get("SONAR_APP_SITEMAP_FOLDER_PATH"), *folder)
-        sitemap_file = os.path.join(sitemap_folder, file_name)
-        # Create a destination directory
-        _create_folder_or_remove_files(sitemap_folder)
+        os.makedirs(sitemap_folder, exist_ok=True)
 
-        if count := search.count():
-            # Elasticsearch query for current organisation
-            hits = search.sort({"_updated": "asc"}).params(preserve_order=True).source(["pid", "_updated"]).scan()
+        last_manifest = _read_manifest(sitemap_folder) if incremental else {}
+        if last_manifest.get("size") != size:
+            last_manifest = {}
+        manifest = {"size": size, "starts": [], "files": {}}
+        temporary_folder = tempfile.mkdtemp(prefix=".sitemap-", dir=sitemap_folder)
+        try:
+            url = _get_document_url(org_pid)
 
-            if count > size:
-                # In multiple files mode, generate the index
-                files_splitted = math.ceil(count / size)
-                _generate_index_sitemap(sitemap_file, org_pid, files_splitted)
-
-            _generate_sitemap(
-                sitemap_folder,
-                sitemap_file,
-                file_name,
-                org_pid,
-                files_splitted,
-                hits,
-                size,
+            def write(file_name, entries):
+                """Write a sitemap file, if its documents changed."""
+                fingerprint = _fingerprint(url, entries)
+                manifest["files"][file_name] = fingerprint
+                if last_manifest.get("files", {}).get(file_name) != fingerprint or not os.path.isfile(
+                    os.path.join(sitemap_folder, file_name)
+                ):
+                    _generate_sitemap(os.path.join(temporary_folder, file_name), url, entries)
+
+            # Elasticsearch query for current organisation, PIDs being sorted
+            # as numbers.
+            hits = (
+                search.sort(
+                    {"_script": {"type": "number", "script": "doc['pid'].value.length()", "order": "asc"}},
+                    {"pid": "asc"},
+                )
+                .params(preserve_order=True)
+                .source(["pid", "_updated"])
+                .scan()
             )
+            # A file is written once the next one is started, to know if
+            # there is a single file.
+            files_splitted = 0
+            previous = None
+            for entries in _split_entries(
+                ((hit.pid, hit._updated) for hit in hits), size, last_manifest.get("starts", [])
+            ):
+                if previous:
+                    write(f"sitemap_{files_splitted}.xml", previous)
+                files_splitted += 1
+                manifest["starts"].append(entries[0][0])
+                previous = entries
+
+            if files_splitted == 1:
+                write("sitemap.xml", previous)
+            elif files_splitted > 1:
+                write(f"sitemap_{files_splitted}.xml", previous)
+                # In multiple files mode, generate the index
+                _generate_index_sitemap(os.path.join(temporary_folder, "sitemap.xml"), org_pid, files_splitted)
+            _swap_files(temporary_folder, sitemap_folder, manifest)
+        finally:
+            shutil.rmtree(temporary_folder, ignore_errors=True)
+
+
+def _get_pid_key(pid):
+    """Get the key sorting the PIDs as numbers.
+
+    :param: pid: PID of a document.
+    :returns: Tuple (length, PID).
+    """
+    return (len(pid), pid)
+
+
+def _split_entries(entries, size, starts):
+    """Split the documents in files.
+
+    The files of the last generation keep their range of PIDs, up to
+    `MAX_URLS` documents. After the last one, files are split every `size`
+    documents.
+
+    :param: entries: Iterable of tuples (pid, update date), in order of PID.
+    :param: size: Number of documents by file.
+    :param: starts: First PIDs of the files of the last generation.
+    :returns: Generator of lists of tuples (pid, update date).
+    """
+    boundaries = deque(_get_pid_key(pid) for pid in starts[1:])
+    file_entries = []
+    for pid, updated in entries:
+        key = _get_pid_key(pid)
+        passed = False
+        while boundaries and key >= boundaries[0]:
+            boundaries.popleft()
+            passed = True
+        if file_entries and (passed or len(file_entries) >= (MAX_URLS if boundaries else size)):
+            yield file_entries
+            file_entries = []
+        file_entries.append((pid, updated))
+    if file_entries:
+        yield file_entries
+
+
+def _get_document_url(org_pid):
+    """Get the URL of the documents, with a placeholder for the PID.
+
+    :param: org_pid: Organisation pid.
+    :returns: URL.
+    """
+    return url_for("invenio_records_ui.doc", view=org_pid, pid_value=PID_PLACEHOLDER, _external=True)
+
+
+def _fingerprint(url, entries):
+    """Get the fingerprint of the documents of a sitemap file.
+
+    :param: url: URL of the documents, changing with the server name.
+    :param: entries: List of tuples (pid, update date).
+    :returns: Hexadecimal digest.
+    """
+    digest = hashlib.sha1(usedforsecurity=False)
+    digest.update(f"{url}\n".encode())
+    for pid, updated in entries:
+        digest.update(f"{pid}:{updated}\n".encode())
+    return digest.hexdigest()
 
 
-def _create_folder_or_remove_files(sitemap_folder):
-    """Create a folder or remove all files.
+def _read_manifest(sitemap_folder):
+    """Read the manifest of the last generation.
 
     :param: sitemap_folder: folder path.
+    :returns: Dictionary with the size of the files, the first PID of each
+        file and the fingerprints of the files, keyed by file name.
+    """
+    try:
+        with open(os.path.join(sitemap_folder, MANIFEST_FILE)) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def _swap_files(temporary_folder, sitemap_folder, manifest):
+    """Move the generated files to the sitemap folder.
+
+    Each file is replaced atomically, the index is moved after the files it
+    references. Files of the last generation which are not part of the new
+    one are removed at the end.
+
+    :param: temporary_folder: folder containing the generated files.
+    :param: sitemap_folder: destination folder.
+    :param: manifest: Manifest of the generation, see `_read_manifest`.
     """
-    # Create a destination directory
-    if not os.path.isdir(sitemap_folder):
-        # Recursive
-        os.makedirs(sitemap_folder)
+    generated = sorted(name for name in os.listdir(temporary_folder) if name != "sitemap.xml")
+    if os.path.isfile(os.path.join(temporary_folder, "sitemap.xml")):
+        generated.append("sitemap.xml")
+    for file_name in generated:
+        os.replace(os.path.join(temporary_folder, file_name), os.path.join(sitemap_folder, file_name))
 
-    # remove all xml files from the sitemap folder
-    for file in glob.glob(f"{sitemap_folder}/*.xml"):
-        os.remove(file)
+    manifest_file = os.path.join(temporary_folder, MANIFEST_FILE)
+    with open(manifest_file, "w") as file:
+        json.dump(manifest, file)
+    os.replace(manifest_file, os.path.join(sitemap_folder, MANIFEST_FILE))
 
+    # Remove the files which are not in the sitemap anymore
+    files = manifest["files"]
+    kept = set(files) | ({"sitemap.xml"} if files else set())
+    for file_name in os.listdir(sitemap_folder):
+        if file_name.startswith("sitemap") and file_name.endswith(".xml") and file_name not in kept:
+            os.remove(os.path.join(sitemap_folder, file_name))
 
-def _get_url_sets(hits, maximum, org_pid, last=True):
-    """Get url sets."""
-    for n, hit in enumerate(hits):
+
+def _get_url_sets(url, entries):
+    """Get url sets.
+
+    The URL of documents is built once, only the PID changes.
+
+    :param: url: URL of the documents, see `_get_document_url`.
+    :param: entries: List of tuples (pid, update date).
+    """
+    for pid, updated in entries:
         yield {
-            "loc": url_for(
-                "invenio_records_ui.doc",
-                view=org_pid,
-                pid_value=hit.pid,
-                _external=True,
-            ),
-            "lastmod": datetime.fromisoformat(hit._updated).strftime("%Y-%m-%d"),
+            "loc": url.replace(PID_PLACEHOLDER, quote(pid, safe="")),
+            "lastmod": datetime.fromisoformat(updated).strftime("%Y-%m-%d"),
         }
-        n += 1
-        if not last and n == maximum:
-            break
 
 
 def _generate_index_sitemap(sitemap_file, org_pid, files_splitted):
@@ -121,30 +260,15 @@ def _generate_index_sitemap(sitemap_file, org_pid, files_splitted):
     rv.dump(sitemap_file)
 
 
-def _generate_sitemap(sitemap_folder, sitemap_file, file_name, org_pid, files_splitted, hits, size):
-    """Generate the sitemap file(s).
+def _generate_sitemap(sitemap_file, url, entries):
+    """Generate a sitemap file.
 
-    :param: sitemap_folder: destination folder.
     :param: sitemap_file: file path.
-    :param: file_name: file name.
-    :param: org_pid: Organisation pid.
-    :param: files_splitted: Number of sitemap file to generate.
-    :param: hits: search ES query scan.
-    :param: size: Size of the set.
+    :param: url: URL of the documents, see `_get_document_url`.
+    :param: entries: List of tuples (pid, update date).
     """
     # Get the template
     template = current_app.jinja_env.get_template("sonar/sitemap.xml")
-
-    if files_splitted > 1:
-        # Multiple files
-        file = file_name.split(".")
-        for i in range(1, files_splitted + 1):
-            file_path = os.path.join(sitemap_folder, f"{file[0]}_{i}.xml")
-            rv = template.stream(urlsets=_get_url_sets(hits, size, org_pid, files_splitted == i))
-            rv.enable_buffering(100)
-            rv.dump(file_path)
-    else:
-        # Single file
-        rv = template.stream(urlsets=_get_url_sets(hits, size, org_pid))
-        rv.enable_buffering(100)
-        rv.dump(sitemap_file)
+    rv = template.stream(urlsets=_get_url_sets(url, entries))
+    rv.enable_buffering(100)
+    rv.dump(sitemap_file)
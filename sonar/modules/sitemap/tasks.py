@@ -28,17 +28,32 @@ def sitemap_generate_task():
 
     Used as celery task. "ignore_result" flag means that we don't want to
     get the status and/or the result of the task, execution is faster.
+    Sitemaps of the organisations are generated in parallel by the workers.
     """
     # Generate sitemap only on production state
     if not current_app.config.get("SONAR_APP_PRODUCTION_STATE", False):
         return
 
     size = current_app.config.get("SONAR_APP_SITEMAP_ENTRY_SIZE", 10000)
+    incremental = current_app.config.get("SONAR_APP_SITEMAP_INCREMENTAL", False)
     # Generate dedicated organisations sitemaps
     orgs = OrganisationSearch().get_dedicated_list()
     for org in orgs:
         if server_name := org.serverName:
-            sitemap_generate(server_name, size)
+            sitemap_generate_organisation_task.delay(server_name, size, incremental)
 
     # Generate global sitemap
-    sitemap_generate(current_app.config.get("SONAR_APP_DEFAULT_ORGANISATION"), size)
+    sitemap_generate_organisation_task.delay(
+        current_app.config.get("SONAR_APP_DEFAULT_ORGANISATION"), size, incremental
+    )
+
+
+@shared_task(ignore_result=True)
+def sitemap_generate_organisation_task(server_name, size, incremental=False):
+    """Generate the sitemap of an organisation.
+
+    :param: server_name: organisation server name.
+    :param: size: size of the set of sitemap urls.
+    :param: incremental: Only write files containing updated documents.
+    """
+    sitemap_generate(server_name, size, incremental)
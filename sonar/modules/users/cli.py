@@ -15,8 +15,6 @@
 
 """Click command-line interface for user management."""
 
-import json
-
 import click
 from click.exceptions import ClickException
 from flask import current_app
@@ -25,6 +23,7 @@ from flask_security.confirmable import confirm_user
 from werkzeug.local import LocalProxy
 
 from ..users.api import UserRecord
+from ..utils import read_json_records
 
 datastore = LocalProxy(lambda: current_app.extensions["security"].datastore)
 
@@ -41,8 +40,7 @@ def import_users(infile):
     """Import users."""
     click.secho(f"Importing users from {infile.name}")
 
-    data = json.load(infile)
-    for user_data in data:
+    for user_data in read_json_records(infile):
         try:
             email = user_data.get("email")
 
@@ -16,14 +16,17 @@
 """Utils functions for application."""
 
 import datetime
+import json
 import os
 import re
+from bisect import bisect_right
+from functools import lru_cache, partial
 
 import requests
 from flask import abort, current_app, g, request
 from invenio_i18n.selectors import get_locale
 from invenio_mail.api import TemplatedMessage
-from netaddr import IPAddress, IPGlob, IPNetwork, IPSet
+from netaddr import AddrFormatError, IPAddress, IPGlob, IPNetwork, IPSet
 from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.util.retry import Retry
 from wand.color import Color
@@ -168,19 +171,17 @@ def get_specific_theme():
     return "global-theme.css"
 
 
-def is_ip_in_list(ip_address, addresses_list):
-    """Check if address IP is in list.
+def parse_ip_ranges(ranges):
+    """Parse a list of IP ranges.
 
-    :param ip_address: Address IP to check
-    :param addresses_list: Range of IP, network or simple IP.
-    :returns: True if given IP is in list.
-    """
-    if not isinstance(addresses_list, list):
-        raise Exception("Given parameter is not a list.")
+    Invalid ranges are ignored.
 
+    :param ranges: Range of IP, network or simple IP.
+    :returns: IPSet instance.
+    """
     ip_set = IPSet()
 
-    for ip_range in addresses_list:
+    for ip_range in ranges:
         try:
             # It's a glob
             if "*" in ip_range or "-" in ip_range:
@@ -194,10 +195,69 @@ def is_ip_in_list(ip_address, addresses_list):
         except Exception:
             pass
 
-    try:
-        return ip_address in ip_set
-    except Exception:
-        return False
+    return ip_set
+
+
+class IPMatcher:
+    """Compiled list of IP ranges.
+
+    Ranges are merged and sorted by IP version, an address is checked with a
+    binary search on the start of the ranges.
+    """
+
+    def __init__(self, ranges):
+        """Initialize matcher.
+
+        :param ranges: Range of IP, network or simple IP.
+        """
+        ip_set = parse_ip_ranges(ranges)
+        self.cidrs = [str(cidr) for cidr in ip_set.iter_cidrs()]
+        self._starts = {4: [], 6: []}
+        self._ends = {4: [], 6: []}
+        for ip_range in ip_set.iter_ipranges():
+            self._starts[ip_range.version].append(ip_range.first)
+            self._ends[ip_range.version].append(ip_range.last)
+
+    def __contains__(self, ip_address):
+        """Check if an IP address is in the ranges.
+
+        :param ip_address: IP address.
+        :returns: True if the address is in the ranges, False if not or if
+            the address is not valid.
+        """
+        try:
+            address = IPAddress(ip_address)
+        except (AddrFormatError, TypeError, ValueError):
+            return False
+        starts = self._starts[address.version]
+        index = bisect_right(starts, int(address)) - 1
+        return index >= 0 and int(address) <= self._ends[address.version][index]
+
+
+@lru_cache(maxsize=1024)
+def get_ip_matcher(allowed_ips):
+    """Get the compiled matcher of a list of IP ranges.
+
+    Matchers are cached by content, an organisation whose list of IPs
+    changes gets a new matcher.
+
+    :param allowed_ips: IP ranges, one by line, as stored in organisations.
+    :returns: IPMatcher instance.
+    """
+    return IPMatcher((allowed_ips or "").split("\n"))
+
+
+def is_ip_in_list(ip_address, addresses_list):
+    """Check if address IP is in list.
+
+    :param ip_address: Address IP to check
+    :param addresses_list: Range of IP, network or simple IP.
+    :returns: True if given IP is in list.
+    """
+    if not isinstance(addresses_list, list):
+        raise Exception("Given parameter is not a list.")
+
+    return ip_address in get_ip_matcher("\n".join(addresses_list))
 
 
 def chunks(records, size):
@@ -210,6 +270,82 @@ def chunks(records, size):
         yield records[i : i + size]
 
 
+def resolve_refs(data, loader=None, _store=None):
+    """Get a copy of the data with the ``$ref`` replaced by the linked data.
+
+    The result is the same as ``deepcopy(_records_state.replace_refs(data))``,
+    but the structure is copied only once, while it is walked, and each
+    referenced resource is loaded only once.
+
+    :param data: Data containing references.
+    :param loader: Callable loading a resource by its URI, the loader of
+        invenio-records is used if not set, through the cache of linked
+        resources if one is active (see `refs_cache`).
+    :returns: A fresh structure without references.
+    """
+    if loader is None:
+        from invenio_records.api import _records_state
+
+        from .refs_cache import get_refs_cache
+
+        loader = _records_state.loader_cls()
+        if cache := get_refs_cache():
+            loader = partial(cache.load, loader=loader)
+    if _store is None:
+        _store = {}
+
+    if isinstance(data, dict):
+        ref = data.get("$ref")
+        if isinstance(ref, str):
+            if ref not in _store:
+                _store[ref] = loader(ref)
+            return resolve_refs(_store[ref], loader, _store)
+        return {key: resolve_refs(value, loader, _store) for key, value in data.items()}
+    if isinstance(data, list):
+        return [resolve_refs(value, loader, _store) for value in data]
+    return data
+
+
+def batched(iterable, size):
+    """Yield lists of items from any iterable.
+
+    :param iterable: Iterable, consumed lazily.
+    :param int size: Size of the lists, the last one can be shorter.
+    """
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def read_json_records(file):
+    """Yield the records of a JSON file.
+
+    The file contains either a list of records, or a record by line (JSON
+    lines), as written by the export command.
+
+    :param file: File object.
+    :returns: Generator of records.
+    """
+    first = ""
+    while not first.strip():
+        first = file.read(1)
+        if not first:
+            return
+    if first.strip() == "[":
+        yield from json.loads(first + file.read())
+        return
+    line = first + file.readline()
+    while line:
+        if line.strip():
+            yield json.loads(line)
+        line = file.readline()
+
+
 def remove_html(content):
     """Remove html tags from content."""
     return re.sub(re.compile("<.*?>"), "", content)
@@ -291,23 +427,7 @@ def get_ips_list(ranges):
     :rtype: list of cidr ips
             (https://en.wikipedia.org/wiki/Classless_Inter-Domain_Routing)
     """
-    ip_set = IPSet()
-
-    for ip_range in ranges:
-        try:
-            # It's a glob
-            if "*" in ip_range or "-" in ip_range:
-                ip_set.add(IPGlob(ip_range))
-            # It's a network
-            elif "/" in ip_range:
-                ip_set.add(IPNetwork(ip_range))
-            # Simple IP
-            else:
-                ip_set.add(IPAddress(ip_range))
-        except Exception:
-            pass
-
-    return [str(ip.cidr) for ip in ip_set.iter_cidrs()]
+    return list(get_ip_matcher("\n".join(ranges)).cidrs)
 
 
 def file_download_ui(pid, record, _record_file_factory=None, **kwargs):
@@ -372,7 +492,13 @@ def file_download_ui(pid, record, _record_file_factory=None, **kwargs):
     )
 
 
-def requests_retry_session(retries=5, backoff_factor=0.5, status_forcelist=(500, 502, 504), session=None):
+def requests_retry_session(
+    retries=5,
+    backoff_factor=0.5,
+    status_forcelist=(500, 502, 504),
+    session=None,
+    pool_maxsize=10,
+):
     """Request retry session.
 
     :params retries: The total number of retry attempts to make.
@@ -380,6 +506,7 @@ def requests_retry_session(retries=5, backoff_factor=0.5, status_forcelist=(500,
         {backoff factor} * (2 ** ({number of total retries} - 1))
     :params status_forcelist: The HTTP response codes to retry on..
     :params session: Session to use.
+    :params pool_maxsize: Number of connections kept by host.
 
     """
     session = session or requests.Session()
@@ -390,7 +517,7 @@ def requests_retry_session(retries=5, backoff_factor=0.5, status_forcelist=(500,
         backoff_factor=backoff_factor,
         status_forcelist=status_forcelist,
     )
-    adapter = HTTPAdapter(max_retries=retry)
+    adapter = HTTPAdapter(max_retries=retry, pool_maxsize=pool_maxsize)
     session.mount("http://", adapter)
     session.mount("https://", adapter)
     return session
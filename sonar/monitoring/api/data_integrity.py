@@ -15,7 +15,13 @@
 
 """Data integrity monitoring."""
 
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
 from elasticsearch.exceptions import NotFoundError
+from flask import current_app
+from invenio_cache import current_cache
+from invenio_db import db
 from invenio_pidstore.models import PersistentIdentifier, PIDStatus
 from invenio_search import RecordsSearch
 
@@ -56,9 +62,45 @@ class DataIntegrityMonitoring:
         except NotFoundError:
             raise Exception(f'No index found for "{index}"')
 
+    def get_es_pids(self, rec_type, index):
+        """Get the PIDs of the index, in ascending order.
+
+        :param rec_type: Record type.
+        :param index: Elasticsearch index.
+        :returns: Generator of PIDs.
+        """
+        # for resources pid is a dict
+        field = "id" if sonar.service(rec_type) else "pid"
+        search = RecordsSearch(index=index).source([field]).sort({field: "asc"}).params(preserve_order=True)
+        for hit in search.scan():
+            if pid_value := hit.to_dict().get(field):
+                yield pid_value
+
+    def get_db_pids(self, rec_type, with_deleted=False):
+        """Get the PIDs of the database, in ascending order.
+
+        PIDs are sorted by bytes, like keywords in Elasticsearch.
+
+        :param rec_type: Record type.
+        :param with_deleted: Include deleted items.
+        :returns: Generator of PIDs.
+        """
+        if service := sonar.service(rec_type):
+            rec_type = service.record_cls.pid_type
+        query = db.session.query(PersistentIdentifier.pid_value).filter(PersistentIdentifier.pid_type == rec_type)
+        if not with_deleted:
+            query = query.filter(PersistentIdentifier.status == PIDStatus.REGISTERED)
+
+        for (pid_value,) in query.order_by(PersistentIdentifier.pid_value.collate("C")).yield_per(1000):
+            yield pid_value
+
     def missing_pids(self, rec_type, with_deleted=False):
         """Get ES and DB counts.
 
+        PIDs of the index and of the database are read as two sorted
+        streams and merged, the memory used does not depend on the number of
+        records.
+
         :param rec_type: Record type.
         :param with_deleted: Check also delete items in database.
         """
@@ -69,64 +111,106 @@ class DataIntegrityMonitoring:
 
         result = {"es": [], "es_double": [], "db": []}
 
-        # Elastic search PIDs
-        es_pids = {}
-        for hit in RecordsSearch(index=index).source(["pid", "id"]).scan():
-            pid_value = hit.pid
-            # for resources pid is a dict
-            if not isinstance(pid_value, str):
-                pid_value = hit.id
-            if es_pids.get(pid_value):
-                result["es_double"].append(hit.pid)
-            es_pids[pid_value] = 1
-
-        # Database PIDs
-        if service := sonar.service(rec_type):
-            rec_type = service.record_cls.pid_type
-        query = PersistentIdentifier.query.filter_by(pid_type=rec_type)
-        if not with_deleted:
-            query = query.filter_by(status=PIDStatus.REGISTERED)
-
-        for identifier in query:
-            if es_pids.get(identifier.pid_value):
-                es_pids.pop(identifier.pid_value)
+        es_pids = self.get_es_pids(rec_type, index)
+        db_pids = self.get_db_pids(rec_type, with_deleted)
+        es_pid = next(es_pids, None)
+        db_pid = next(db_pids, None)
+        previous_es_pid = None
+        while es_pid is not None or db_pid is not None:
+            if es_pid is not None and es_pid == previous_es_pid:
+                result["es_double"].append(es_pid)
+                es_pid = next(es_pids, None)
+            elif db_pid is None or (es_pid is not None and es_pid < db_pid):
+                result["es"].append(es_pid)
+                previous_es_pid, es_pid = es_pid, next(es_pids, None)
+            elif es_pid is None or db_pid < es_pid:
+                result["db"].append(db_pid)
+                db_pid = next(db_pids, None)
             else:
-                result["db"].append(identifier.pid_value)
-
-        # Transform dictionary to list
-        result["es"] = list(es_pids)
+                previous_es_pid, es_pid = es_pid, next(es_pids, None)
+                db_pid = next(db_pids, None)
 
         return result
 
+    def check(self, rec_type, index, with_deleted=False, with_detail=False):
+        """Get count details for a resource.
+
+        :param rec_type: Record type.
+        :param index: Elasticsearch index.
+        :param with_deleted: Count also deleted items in database.
+        :param with_detail: Show the detail of the differences.
+        :returns: Dictionary with differences.
+        """
+        es_count = self.get_es_count(index)
+        db_count = self.get_db_count(rec_type)
+
+        info = {
+            "db": db_count,
+            "es": es_count,
+            "db-es": db_count - es_count,
+            "index": index,
+        }
+
+        if with_detail:
+            info["detail"] = self.missing_pids(rec_type, with_deleted)
+
+        return info
+
     def info(self, with_deleted=False, with_detail=False):
         """Get count details for all resources.
 
+        Resources are checked concurrently by `SONAR_APP_DATA_INTEGRITY_WORKERS`
+        threads.
+
         :param with_deleted: Count also deleted items in database.
         :param with_detail: Show the detail of the differences.
         :returns: Dictionary with differences for each resource.
         """
-        info = {}
+        endpoints = sonar.endpoints.items()
+        workers = current_app.config.get("SONAR_APP_DATA_INTEGRITY_WORKERS", 1)
+        if workers <= 1:
+            return {rec_type: self.check(rec_type, index, with_deleted, with_detail) for rec_type, index in endpoints}
 
-        for rec_type, index in sonar.endpoints.items():
-            es_count = self.get_es_count(index)
-            db_count = self.get_db_count(rec_type)
+        app = current_app._get_current_object()
 
-            info[rec_type] = {
-                "db": db_count,
-                "es": es_count,
-                "db-es": db_count - es_count,
-                "index": index,
-            }
+        def check(rec_type, index):
+            # Each thread has its own application context and database session.
+            with app.app_context():
+                return self.check(rec_type, index, with_deleted, with_detail)
 
-            if with_detail:
-                info[rec_type]["detail"] = self.missing_pids(rec_type, with_deleted)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {rec_type: executor.submit(check, rec_type, index) for rec_type, index in endpoints}
+            return {rec_type: future.result() for rec_type, future in futures.items()}
 
-        return info
+    def cached_info(self, with_deleted=False, with_detail=False, refresh=False):
+        """Get count details for all resources, from the cache if possible.
+
+        Results are kept `SONAR_APP_DATA_INTEGRITY_CACHE_TTL` seconds in the
+        application cache, shared by all processes.
 
-    def has_error(self, with_deleted=False):
+        :param with_deleted: Count also deleted items in database.
+        :param with_detail: Show the detail of the differences.
+        :param refresh: Compute the details even if they are cached.
+        :returns: Tuple (dictionary with differences for each resource, date
+            of the check in ISO format).
+        """
+        ttl = current_app.config.get("SONAR_APP_DATA_INTEGRITY_CACHE_TTL", 0)
+        key = f"sonar_data_integrity_{int(with_deleted)}_{int(with_detail)}"
+        if ttl and not refresh and (cached := current_cache.get(key)):
+            return cached["data"], cached["timestamp"]
+
+        info = self.info(with_deleted, with_detail)
+        timestamp = datetime.now(timezone.utc).isoformat()
+        if ttl:
+            current_cache.set(key, {"data": info, "timestamp": timestamp}, timeout=ttl)
+        return info, timestamp
+
+    def has_error(self, with_deleted=False, refresh=False):
         """Check if any endpoint has an integrity error.
 
         :param with_deleted: Count also deleted items in database.
+        :param refresh: Compute the counts even if they are cached.
         :returns: True if an error is found
         """
-        return any(item["db-es"] != 0 for rec_type, item in self.info(with_deleted).items())
+        info, _ = self.cached_info(with_deleted, refresh=refresh)
+        return any(item["db-es"] != 0 for rec_type, item in info.items())
@@ -24,7 +24,9 @@ from invenio_search import current_search_client
 from redis import Redis
 
 from sonar.modules.documents.urn import Urn
+from sonar.modules.metadata_cache import metadata_cache
 from sonar.modules.permissions import monitoring_access_permission
+from sonar.modules.refresh import refresh_metrics, refresh_scheduler
 from sonar.monitoring.api.data_integrity import DataIntegrityMonitoring
 from sonar.monitoring.api.database import DatabaseMonitoring
 
@@ -73,24 +75,62 @@ def db_activity():
 
 @api_blueprint.route("/es_db_status")
 def data_status():
-    """Status of data integrity."""
+    """Status of data integrity.
+
+    Results are cached, `refresh` forces a new check.
+    """
     try:
         data_monitoring = DataIntegrityMonitoring()
-        return jsonify({"data": {"status": "red" if data_monitoring.has_error() else "green"}})
+        has_error = data_monitoring.has_error(refresh=("refresh" in request.args))
+        return jsonify({"data": {"status": "red" if has_error else "green"}})
     except Exception as exception:
         return jsonify({"error": str(exception)}), 500
 
 
 @api_blueprint.route("/es_db_counts")
 def data_info():
-    """Info of data integrity."""
+    """Info of data integrity.
+
+    Results are cached, `refresh` forces a new check.
+    """
     try:
         data_monitoring = DataIntegrityMonitoring()
-        return jsonify({"data": data_monitoring.info(with_detail=("detail" in request.args))})
+        info, timestamp = data_monitoring.cached_info(
+            with_detail=("detail" in request.args), refresh=("refresh" in request.args)
+        )
+        return jsonify({"data": info, "timestamp": timestamp})
     except Exception as exception:
         return jsonify({"error": str(exception)}), 500
 
 
+@api_blueprint.route("/indexer_refresh")
+def indexer_refresh():
+    """Refreshes of the indices done and saved by the current process.
+
+    :return: jsonified refresh counters.
+    """
+    return jsonify(
+        {
+            "data": {
+                "policy": current_app.config.get("SONAR_APP_INDEXER_REFRESH"),
+                "indices": refresh_metrics.info(),
+                "pending": refresh_scheduler.pending,
+            }
+        }
+    )
+
+
+@api_blueprint.route("/metadata_cache")
+def metadata_cache_info():
+    """Hits and misses of the organisations, collections and subdivisions cache.
+
+    Counters are those of the current process.
+
+    :return: jsonified cache counters.
+    """
+    return jsonify({"data": metadata_cache.info()})
+
+
 @api_blueprint.route("/redis")
 def redis():
     """Displays redis info.
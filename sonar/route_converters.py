@@ -18,6 +18,7 @@
 from flask import current_app, g
 from werkzeug.routing import BaseConverter, ValidationError
 
+from .modules.metadata_cache import metadata_cache
 from .modules.organisations.api import OrganisationRecord
 
 
@@ -37,7 +38,7 @@ class OrganisationCodeConverter(BaseConverter):
             g.pop("organisation")
         if value == current_app.config.get("SONAR_APP_DEFAULT_ORGANISATION"):
             return value
-        organisation = OrganisationRecord.get_record_by_pid(value)
+        organisation = metadata_cache.get_record(OrganisationRecord, value)
         if not organisation or not organisation.get("isShared"):
             raise ValidationError
         g.organisation = organisation.dumps()
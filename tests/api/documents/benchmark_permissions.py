@@ -0,0 +1,108 @@
+# Swiss Open Access Repository
+# Copyright (C) 2021 RERO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmark of the documents listing, with and without prefetched permissions.
+
+Usage: `python -m tests.api.documents.benchmark_permissions EMAIL`, on an
+instance with indexed documents, where EMAIL is the email of an existing
+admin or moderator. Without prefetch, the permissions are checked by
+loading each document from the database, as before `prefetch`.
+"""
+
+import statistics
+import time
+from contextlib import contextmanager
+from unittest import mock
+
+import click
+from flask import url_for
+from invenio_accounts.testutils import login_user_via_session
+from invenio_app.factory import create_api
+from invenio_db import db
+from sqlalchemy import event
+
+PAGE_SIZES = [10, 100, 1000]
+
+
+@contextmanager
+def count_queries():
+    """Count the SQL queries executed within the context.
+
+    :returns: List of executed statements.
+    """
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = db.engine
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+@contextmanager
+def without_prefetch():
+    """Disable the prefetch and the memo of permissions."""
+    module = "sonar.modules.documents.permissions"
+    with mock.patch(f"{module}.DocumentPermission.prefetch"), mock.patch(f"{module}.get_memo", return_value=None):
+        yield
+
+
+def measure(client, size, repeat):
+    """Measure the listing of a page of documents.
+
+    :param client: Test client, with a logged user.
+    :param size: Page size.
+    :param repeat: Number of requests.
+    :returns: Tuple (median duration, number of queries, number of hits).
+    """
+    durations = []
+    for _ in range(repeat):
+        with count_queries() as statements:
+            start = time.perf_counter()
+            res = client.get(url_for("invenio_records_rest.doc_list", size=size))
+            durations.append(time.perf_counter() - start)
+        assert res.status_code == 200, res.status_code
+    return statistics.median(durations), len(statements), len(res.json["hits"]["hits"])
+
+
+@click.command()
+@click.argument("email")
+@click.option("--repeat", default=5, help="Number of requests by page size.")
+def benchmark(email, repeat):
+    """Compare the documents listing with and without prefetch.
+
+    :param email: Email of the logged user.
+    :param repeat: Number of requests by page size.
+    """
+    app = create_api()
+    with app.app_context(), app.test_request_context(), app.test_client() as client:
+        login_user_via_session(client, email=email)
+        for size in PAGE_SIZES:
+            with without_prefetch():
+                legacy_duration, legacy_queries, hits = measure(client, size, repeat)
+            duration, queries, _ = measure(client, size, repeat)
+            click.echo(
+                f"Page size {size} ({hits} hits): "
+                f"without prefetch {legacy_duration * 1000:.0f} ms / {legacy_queries} queries, "
+                f"with prefetch {duration * 1000:.0f} ms / {queries} queries"
+            )
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -23,6 +23,8 @@ from flask import url_for
 from invenio_accounts.testutils import login_user_via_session
 from invenio_pidstore.models import PersistentIdentifier, PIDStatus
 
+from sonar.modules.documents.api import DocumentRecord
+
 
 def test_list(
     app,
@@ -425,3 +427,27 @@ def test_document_with_urn_delete(client, superuser, admin, minimal_thesis_docum
     pid = minimal_thesis_document_with_urn["pid"]
     res = client.delete(url_for("invenio_records_rest.doc_item", pid_value=pid))
     assert res.status_code == 403
+
+
+def test_list_permissions(client, document, minimal_thesis_document_with_urn, admin, moderator):
+    """Test permissions of the listed documents, prepared from the index."""
+    urn_document_pid = minimal_thesis_document_with_urn["pid"]
+    for user, permissions in [
+        (admin, {"read": True, "update": True, "delete": True}),
+        (moderator, {"read": True, "update": True, "delete": False}),
+    ]:
+        login_user_via_session(client, email=user["email"])
+        with mock.patch(
+            "sonar.modules.documents.permissions.DocumentRecord.get_record_by_pid",
+            wraps=DocumentRecord.get_record_by_pid,
+        ) as mock_get_record:
+            res = client.get(url_for("invenio_records_rest.doc_list"))
+            assert res.status_code == 200
+            # No document loaded from database.
+            mock_get_record.assert_not_called()
+
+        hits = {hit["metadata"]["pid"]: hit["metadata"] for hit in res.json["hits"]["hits"]}
+        assert hits[document["pid"]]["permissions"] == permissions
+        # A document with URN cannot be deleted.
+        if urn_document_pid in hits:
+            assert not hits[urn_document_pid]["permissions"]["delete"]
@@ -20,6 +20,9 @@ from invenio_accounts.testutils import login_user_via_session
 from invenio_db import db
 from invenio_pidstore.models import PersistentIdentifier, PIDStatus
 
+from sonar.modules.metadata_cache import metadata_cache
+from sonar.modules.organisations.api import OrganisationRecord
+
 
 def test_data_info(client, search_clear, superuser, document, monkeypatch):
     """Test integrity info."""
@@ -27,7 +30,9 @@ def test_data_info(client, search_clear, superuser, document, monkeypatch):
 
     response = client.get(url_for("monitoring_api.data_info"))
     assert response.status_code == 200
+    assert response.json["timestamp"]
     assert response.json == {
+        "timestamp": response.json["timestamp"],
         "data": {
             "depo": {"db": 0, "es": 0, "db-es": 0, "index": "deposits"},
             "doc": {"db": 1, "es": 1, "db-es": 0, "index": "documents"},
@@ -37,7 +42,7 @@ def test_data_info(client, search_clear, superuser, document, monkeypatch):
             "coll": {"db": 0, "es": 0, "db-es": 0, "index": "collections"},
             "subd": {"db": 0, "es": 0, "db-es": 0, "index": "subdivisions"},
             "stat": {"db": 0, "es": 0, "db-es": 0, "index": "stats"},
-        }
+        },
     }
 
     # With detail
@@ -177,6 +182,33 @@ def test_elastic_search(client, superuser, monkeypatch):
     assert response.json == {"error": "Unknown exception"}
 
 
+def test_indexer_refresh(client, superuser, document):
+    """Test indexer refresh counters."""
+    login_user_via_session(client, email=superuser["email"])
+
+    document.reindex()
+    response = client.get(url_for("monitoring_api.indexer_refresh"))
+    assert response.status_code == 200
+    assert response.json["data"]["policy"] == "refresh"
+    assert response.json["data"]["indices"]["documents"]["writes"] >= 1
+    assert response.json["data"]["pending"] == []
+
+
+def test_metadata_cache(client, superuser, organisation):
+    """Test organisations, collections and subdivisions cache counters."""
+    login_user_via_session(client, email=superuser["email"])
+
+    metadata_cache.clear()
+    metadata_cache.get_record(OrganisationRecord, organisation["pid"])
+    metadata_cache.get_record(OrganisationRecord, organisation["pid"])
+    response = client.get(url_for("monitoring_api.metadata_cache_info"))
+    assert response.status_code == 200
+    assert response.json["data"]["org"]["misses"] == 1
+    assert response.json["data"]["org"]["hits"] >= 1
+    assert response.json["data"]["org"]["entries"] == 1
+    assert response.json["data"]["coll"]["entries"] == 0
+
+
 def test_urn(client, search_clear, superuser, monkeypatch, minimal_thesis_document_with_urn):
     """Test unregistered urn counts."""
     login_user_via_session(client, email=superuser["email"])
@@ -176,6 +176,7 @@ def app_config(app_config):
     app_config["SONAR_APP_ARK_NAAN"] = "99999"
     app_config["SONAR_APP_ARK_SCHEME"] = "ark:"
     app_config["SONAR_APP_ARK_SHOULDER"] = "ffk3"
+    app_config["SONAR_APP_ARK_CACHE_TIMEOUT"] = 0
 
     # Celery
     app_config["CACHE_TYPE"] = "simple"
@@ -189,6 +190,11 @@ def app_config(app_config):
     # Other configs
     app_config["ACCOUNTS_SESSION_REDIS_URL"] = "redis://localhost:6379/1"
     app_config["CACHE_REDIS_URL"] = "redis://cache:6379/0"
+    # Sessions of the tests share a single connection
+    app_config["SONAR_APP_DATA_INTEGRITY_WORKERS"] = 1
+    app_config["SONAR_APP_DATA_INTEGRITY_CACHE_TTL"] = 0
+    app_config["SONAR_APP_DC_CACHE_TIMEOUT"] = 0
+    app_config["SONAR_DOCUMENTS_DERIVATIVES_DEFERRED"] = False
     app_config["CELERY_REDIS_SCHEDULER_URL"] = "redis://localhost:6379/4"
     app_config["CELERY_RESULT_BACKEND"] = "redis://localhost:6379/2"
     app_config["PDF_EXTRACTOR_GROBID_PORT"] = "8070"
@@ -0,0 +1,137 @@
+# Swiss Open Access Repository
+# Copyright (C) 2021 RERO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Load test of the ARK resolver blueprint.
+
+Compare the resolver with the former one, which searched the organisation
+of the NAAN and loaded the persistent identifier for each request, and
+built a new `Ark` instance from the whole configuration.
+
+Usage: `python -m tests.ui.ark.benchmark_resolver [--requests 2000]
+[--workers 8]`, on an instance with documents having an ARK identifier.
+The ARK identifiers are taken from the database, the requests are sent
+with the test client of the UI application, concurrently.
+"""
+
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import click
+from flask import current_app
+from invenio_app.factory import create_ui
+from invenio_pidstore.models import PersistentIdentifier, PIDStatus
+
+from sonar.modules.ark.api import Ark, ark_resolver
+
+
+def legacy_resolve(naan, path):
+    """Resolve an ARK identifier as done before `ArkResolver`.
+
+    :param naan: Ark NAAN.
+    :param path: The rest of the ARK identifier.
+    :returns: Tuple (organisation code, document PID) or None.
+    """
+    from sonar.modules.organisations.api import OrganisationSearch
+
+    if not (org := OrganisationSearch().get_organisation_from_naan(naan)):
+        return None
+    # The former constructor read the whole configuration.
+    for key in current_app.config:
+        if key.startswith("SONAR_APP_ARK_"):
+            current_app.config.get(key)
+    ark = Ark(naan)
+    if ark and (pid := ark.get(f"ark:/{naan}/{path}")) and (pid.is_registered() or pid.is_deleted()):
+        return org.code, path.replace(ark._shoulder, "")
+    return None
+
+
+def get_paths(size):
+    """Get the ARK identifiers of registered documents.
+
+    :param size: Maximum number of identifiers.
+    :returns: List of tuples (naan, path).
+    """
+    query = PersistentIdentifier.query.filter_by(pid_type="ark", status=PIDStatus.REGISTERED).limit(size)
+    return [tuple(pid.pid_value.split("/")[1:3]) for pid in query]
+
+
+def load(app, paths, requests, workers):
+    """Send requests to the resolver, concurrently.
+
+    :param app: UI application.
+    :param paths: List of tuples (naan, path).
+    :param requests: Number of requests.
+    :param workers: Number of concurrent clients.
+    :returns: Tuple (total duration, list of durations by request).
+    """
+
+    def send(index):
+        naan, path = paths[index % len(paths)]
+        with app.test_client() as client:
+            start = time.perf_counter()
+            res = client.get(f"/ark:/{naan}/{path}")
+            duration = time.perf_counter() - start
+        assert res.status_code == 302, res.status_code
+        return duration
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        durations = list(executor.map(send, range(requests)))
+    return time.perf_counter() - start, durations
+
+
+def report(label, total, durations):
+    """Print the throughput and the latencies of a load test.
+
+    :param label: Name of the resolver.
+    :param total: Total duration in seconds.
+    :param durations: List of durations by request.
+    """
+    durations = sorted(durations)
+    click.echo(
+        f"{label}: {len(durations) / total:.0f} requests/s, "
+        f"median {statistics.median(durations) * 1000:.1f} ms, "
+        f"p95 {durations[int(len(durations) * 0.95)] * 1000:.1f} ms"
+    )
+
+
+@click.command()
+@click.option("--requests", default=2000, help="Number of requests.")
+@click.option("--workers", default=8, help="Number of concurrent clients.")
+@click.option("--size", default=500, help="Number of distinct ARK identifiers.")
+def benchmark(requests, workers, size):
+    """Compare the ARK resolver with the former one.
+
+    :param requests: Number of requests.
+    :param workers: Number of concurrent clients.
+    :param size: Number of distinct ARK identifiers.
+    """
+    app = create_ui()
+    with app.app_context():
+        paths = get_paths(size)
+    if not paths:
+        raise click.ClickException("No ARK identifier found.")
+
+    with mock.patch.object(ark_resolver, "resolve", side_effect=legacy_resolve):
+        report("Former resolver", *load(app, paths, requests, workers))
+    # First pass to fill the caches.
+    report("Resolver, cold", *load(app, paths, len(paths), workers))
+    report("Resolver", *load(app, paths, requests, workers))
+
+
+if __name__ == "__main__":
+    benchmark()
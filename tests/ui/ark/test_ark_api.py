@@ -15,13 +15,14 @@
 
 """Test documents API."""
 
+from unittest import mock
 from uuid import uuid4
 
 from flask import url_for
 from invenio_db import db
 from invenio_pidstore.models import PersistentIdentifier, PIDStatus
 
-from sonar.modules.ark.api import Ark
+from sonar.modules.ark.api import Ark, ark_resolver
 
 
 def test_ark_create(app):
@@ -48,6 +49,13 @@ config:
     assert pid == ark.get(doc_pid)
     db.session.rollback()
 
+    # Instances are built once by NAAN
+    assert Ark(naan="99999") is ark
+    other = Ark(naan="88888")
+    assert other is not ark
+    assert other.resolve(f"ark:/88888/ffk3{doc_pid}") == doc_pid
+    assert not other.resolve(ark_id)
+
 
 def test_create_doc_with_ark(document, client, organisation):
     """Create a document and mint a ARK id."""
@@ -91,3 +99,31 @@ def test_create_doc_with_ark(document, client, organisation):
     # Gone
     assert res.status_code == 410
     db.session.rollback()
+
+
+def test_ark_resolver(app, document, organisation):
+    """Resolve ARK identifiers with the caches."""
+    app.config["SONAR_APP_ARK_CACHE_TIMEOUT"] = 60
+    path = f"ffk3{document['pid']}"
+
+    assert ark_resolver.get_organisation_code("99999") == organisation["code"]
+    assert not ark_resolver.get_organisation_code("FOO999")
+    assert ark_resolver.resolve("99999", path) == (organisation["code"], document["pid"])
+    assert not ark_resolver.resolve("99999", "ffk3foo")
+
+    # Resolved from the caches, without search nor database.
+    with (
+        mock.patch("sonar.modules.organisations.api.OrganisationSearch.scan") as scan,
+        mock.patch.object(Ark, "get") as get,
+    ):
+        assert ark_resolver.resolve("99999", path) == (organisation["code"], document["pid"])
+        assert not scan.called
+        assert not get.called
+
+    # The map is loaded again when an organisation is modified.
+    organisation["arkNAAN"] = "88888"
+    organisation.commit()
+    organisation.reindex()
+    assert not ark_resolver.get_organisation_code("99999")
+    assert ark_resolver.get_organisation_code("88888") == organisation["code"]
+    app.config["SONAR_APP_ARK_CACHE_TIMEOUT"] = 0
@@ -0,0 +1,116 @@
+# Swiss Open Access Repository
+# Copyright (C) 2021 RERO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmark of the IP checks done for masked documents and restricted files.
+
+Compare the compiled `get_ip_matcher` with the former `IPSet` built on each
+check, and check that both give the same answers.
+
+Usage: `python -m tests.ui.benchmark_ip_matcher [--ranges 500]`. The allowed
+IPs are generated like the lists of universities: networks, globs with
+hyphens and asterisks, and single addresses.
+"""
+
+import random
+import time
+
+import click
+from netaddr import AddrFormatError
+
+from sonar.modules.utils import get_ip_matcher, parse_ip_ranges
+
+
+def build_allowed_ips(size, seed=0):
+    """Build a list of allowed IPs, as stored in an organisation.
+
+    :param size: Number of ranges.
+    :param seed: Seed of the random generator.
+    :returns: IP ranges, one by line.
+    """
+    generator = random.Random(seed)
+    ranges = []
+    for index in range(size):
+        first, second, third = (generator.randint(1, 223), generator.randint(0, 255), generator.randint(0, 255))
+        kind = index % 4
+        if kind == 0:
+            ranges.append(f"{first}.{second}.{third}.0/{generator.choice([22, 23, 24, 28])}")
+        elif kind == 1:
+            start = generator.randint(0, 200)
+            ranges.append(f"{first}.{second}.{third}.{start}-{start + generator.randint(1, 55)}")
+        elif kind == 2:
+            ranges.append(f"{first}.{second}.{third}.*")
+        else:
+            ranges.append(f"{first}.{second}.{third}.{generator.randint(1, 254)}")
+    return "\n".join(ranges)
+
+
+def build_addresses(size, seed=1):
+    """Build random addresses to check.
+
+    :param size: Number of addresses.
+    :param seed: Seed of the random generator.
+    :returns: List of IP addresses.
+    """
+    generator = random.Random(seed)
+    return [".".join(str(generator.randint(0, 255)) for _ in range(4)) for _ in range(size)]
+
+
+def legacy_is_ip_in_list(ip_address, allowed_ips):
+    """Check an address as done before `get_ip_matcher`.
+
+    :param ip_address: IP address.
+    :param allowed_ips: IP ranges, one by line.
+    :returns: True if the address is allowed.
+    """
+    try:
+        return ip_address in parse_ip_ranges(allowed_ips.split("\n"))
+    except AddrFormatError:
+        return False
+
+
+@click.command()
+@click.option("--ranges", default=500, help="Number of allowed ranges.")
+@click.option("--checks", default=1000, help="Number of checked addresses.")
+def benchmark(ranges, checks):
+    """Compare the compiled matcher with an IPSet by check.
+
+    :param ranges: Number of allowed ranges.
+    :param checks: Number of checked addresses.
+    """
+    allowed_ips = build_allowed_ips(ranges)
+    addresses = build_addresses(checks)
+
+    start = time.perf_counter()
+    legacy_results = [legacy_is_ip_in_list(address, allowed_ips) for address in addresses]
+    legacy_duration = time.perf_counter() - start
+
+    get_ip_matcher.cache_clear()
+    start = time.perf_counter()
+    get_ip_matcher(allowed_ips)
+    compile_duration = time.perf_counter() - start
+    start = time.perf_counter()
+    results = [address in get_ip_matcher(allowed_ips) for address in addresses]
+    duration = time.perf_counter() - start
+
+    click.echo(f"Ranges: {ranges}, checks: {checks}, allowed: {sum(results)}")
+    click.echo(f"IPSet by check: {legacy_duration * 1000000 / checks:.1f} µs/check")
+    click.echo(
+        f"Compiled matcher: {duration * 1000000 / checks:.1f} µs/check, compiled in {compile_duration * 1000:.1f} ms"
+    )
+    click.echo(f"Differences: {sum(1 for legacy, result in zip(legacy_results, results) if legacy != result)}")
+
+
+if __name__ == "__main__":
+    benchmark()
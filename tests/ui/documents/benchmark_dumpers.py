@@ -0,0 +1,158 @@
+# Swiss Open Access Repository
+# Copyright (C) 2021 RERO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmark of the references resolution done by the document dumpers.
+
+Compare `resolve_refs` with the former double deep copy around
+`jsonref.replace_refs`, in time and memory, and check that both produce the
+same output.
+
+Usage: `python -m tests.ui.documents.benchmark_dumpers [FILE]`, where FILE
+is a JSON list or a JSON lines file of documents (for example produced by
+`utils export`). Without file, the corpus is built from the document
+sample, enlarged with many contributions and files.
+"""
+
+import json
+import time
+import tracemalloc
+from copy import deepcopy
+
+import click
+import jsonref
+
+from sonar.modules.utils import resolve_refs
+
+SAMPLE_FILE = "./data/complete_document_sample.json"
+ORGANISATIONS_FILE = "./data/organisations/data.json"
+
+
+def get_loader():
+    """Get a loader serving the organisations of the fixtures.
+
+    :returns: Callable loading an organisation from its URI.
+    """
+    with open(ORGANISATIONS_FILE) as file:
+        organisations = {organisation["code"]: organisation for organisation in json.load(file)}
+
+    def loader(uri, **kwargs):
+        """Load an organisation.
+
+        A new structure is returned for each call, like the JSON resolvers
+        which load the record from the database.
+        """
+        return deepcopy(organisations.get(uri.split("/")[-1], {"pid": uri.split("/")[-1]}))
+
+    return loader
+
+
+def legacy_resolve_refs(record, loader):
+    """Resolve references as done before `resolve_refs`.
+
+    :param record: Record data.
+    :param loader: Callable loading a resource by its URI.
+    :returns: Resolved data.
+    """
+    data = deepcopy(record)
+    return deepcopy(jsonref.replace_refs(data, loader=loader))
+
+
+def build_corpus(size=200):
+    """Build a corpus of documents based on the document sample.
+
+    :param size: Number of documents.
+    :returns: List of documents.
+    """
+    with open(SAMPLE_FILE) as file:
+        sample = json.load(file)
+
+    corpus = []
+    for index in range(size):
+        document = deepcopy(sample)
+        document["pid"] = str(index)
+        # Large documents, such as conference proceedings.
+        document["contribution"] = document["contribution"] * (1 + index % 50)
+        document["_files"] = [
+            {"key": f"file-{file_index}.pdf", "type": "file", "order": file_index, "label": f"File {file_index}"}
+            for file_index in range(index % 20)
+        ]
+        corpus.append(document)
+    return corpus
+
+
+def load_corpus(file):
+    """Load a corpus of documents from a JSON or JSON lines file.
+
+    :param file: Opened file.
+    :returns: List of documents.
+    """
+    content = file.read()
+    try:
+        documents = json.loads(content)
+    except json.JSONDecodeError:
+        documents = [json.loads(line) for line in content.splitlines() if line.strip()]
+    return [document.get("metadata", document) for document in documents]
+
+
+def measure(function, corpus, loader):
+    """Measure time and memory needed to resolve all documents of the corpus.
+
+    :param function: Resolution function.
+    :param corpus: List of documents.
+    :param loader: Callable loading a resource by its URI.
+    :returns: Tuple (results, duration, peak memory in bytes).
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    results = [function(document, loader) for document in corpus]
+    duration = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return results, duration, peak
+
+
+def compare(corpus, loader):
+    """Resolve the corpus with both implementations.
+
+    :param corpus: List of documents.
+    :param loader: Callable loading a resource by its URI.
+    :returns: Tuple (number of differences, legacy measures, new measures).
+    """
+    legacy_results, *legacy_measures = measure(legacy_resolve_refs, corpus, loader)
+    results, *measures = measure(resolve_refs, corpus, loader)
+    differences = sum(1 for legacy, result in zip(legacy_results, results) if legacy != result)
+    return differences, legacy_measures, measures
+
+
+@click.command()
+@click.argument("file", type=click.File("r"), required=False)
+@click.option("--size", default=200, help="Size of the generated corpus.")
+def benchmark(file, size):
+    """Compare `resolve_refs` with the double deep copy.
+
+    :param file: File containing documents.
+    :param size: Size of the generated corpus.
+    """
+    corpus = load_corpus(file) if file else build_corpus(size)
+    differences, (legacy_duration, legacy_peak), (duration, peak) = compare(corpus, get_loader())
+
+    click.echo(f"Documents: {len(corpus)}")
+    click.echo(f"Double deep copy: {legacy_duration:.3f}s, peak {legacy_peak / 1024 / 1024:.1f} MB")
+    click.echo(f"Single copy: {duration:.3f}s, peak {peak / 1024 / 1024:.1f} MB")
+    click.echo(f"Differences: {differences}")
+
+
+if __name__ == "__main__":
+    benchmark()
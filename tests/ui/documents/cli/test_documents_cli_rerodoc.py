@@ -18,9 +18,10 @@
 from click.testing import CliRunner
 
 import sonar.modules.documents.cli.rerodoc as cli
+from sonar.modules.documents.api import DocumentRecord
 
 
-def test_update_file_permissions(app, script_info, document_with_file):
+def test_update_file_permissions(app, script_info, document_with_file, tmp_path):
     """Test update file permissions."""
     runner = CliRunner()
 
@@ -48,10 +49,43 @@ def test_update_file_permissions(app, script_info, document_with_file):
     )
     assert "An error occured during file process" in result.output
 
+    # Rows not well formatted are counted as errors
+    permissions_file = tmp_path / "permissions_file.csv"
+    permissions_file.write_text('"id_bibrec","status","docname"\n\n111111\n111111,"status:RERO","test1"\n')
+    result = runner.invoke(
+        cli.update_file_permissions,
+        [str(permissions_file), "-c", "10", "--dry-run"],
+        obj=script_info,
+    )
+    assert "Row ['111111'] is not well formatted" in result.output
+    assert "Dry run: 3 rows processed" in result.output
+    assert "1 files updated, 2 errors" in result.output
+
+    # Dry run, nothing is saved
+    embargo_date = document_with_file.files["test1.pdf"]["embargo_date"]
+    result = runner.invoke(
+        cli.update_file_permissions,
+        ["./tests/ui/documents/data/permissions_file.csv", "-c", "2", "--dry-run"],
+        obj=script_info,
+    )
+    assert "Dry run: 6 rows processed" in result.output
+    assert "4 files updated, 2 errors" in result.output
+    assert "Process finished" in result.output
+    record = DocumentRecord.get_record(document_with_file.id)
+    assert record.files["test1.pdf"]["embargo_date"] == embargo_date
+
     # OK
     result = runner.invoke(
         cli.update_file_permissions,
         ["./tests/ui/documents/data/permissions_file.csv", "-c", "1"],
         obj=script_info,
     )
+    assert "Record 111112 not found" in result.output
+    assert "File test2.pdf not found in record 111111" in result.output
     assert "Process finished" in result.output
+
+    # The last permission of the file is applied
+    record = DocumentRecord.get_record(document_with_file.id)
+    assert record.files["test1.pdf"]["access"] == "coar:c_f1cf"
+    assert record.files["test1.pdf"]["embargo_date"] == "2014-07-14"
+    assert not record.files["test1.pdf"]["restricted_outside_organisation"]
@@ -0,0 +1,123 @@
+# Swiss Open Access Repository
+# Copyright (C) 2021 RERO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Test registry of the subdivisions and collections."""
+
+from unittest import mock
+
+from dojson.contrib.marc21.utils import create_record
+
+from sonar.modules.collections.api import Record as CollectionRecord
+from sonar.modules.documents.dojson.rerodoc.model import overdo
+from sonar.modules.documents.dojson.rerodoc.registry import (
+    collection_registry,
+    conversion_run,
+    flush,
+    subdivision_registry,
+)
+from sonar.modules.subdivisions.api import Record as SubdivisionRecord
+
+
+def test_conversion_run(app, bucket_location, make_organisation, make_subdivision):
+    """Test conversion of records during a run."""
+    make_organisation("unifr")
+    hep = make_subdivision("unifr")
+    hep["name"] = [{"language": "eng", "value": "HEP Fribourg"}]
+    hep.commit()
+    hep.reindex()
+
+    marc21json = create_record(
+        """
+        <record>
+            <datafield tag="980" ind1=" " ind2=" ">
+                <subfield code="b">BPUGE</subfield>
+            </datafield>
+            <datafield tag="982" ind1=" " ind2=" ">
+                <subfield code="a">Collection 1</subfield>
+            </datafield>
+        </record>
+        """
+    )
+
+    with conversion_run():
+        get_pid_by_hash_key = mock.Mock()
+        with (
+            mock.patch.multiple(SubdivisionRecord, get_pid_by_hash_key=get_pid_by_hash_key),
+            mock.patch.multiple(CollectionRecord, get_pid_by_hash_key=get_pid_by_hash_key),
+        ):
+            first = overdo.do(marc21json)
+            second = overdo.do(marc21json)
+        # No search during the run
+        assert not get_pid_by_hash_key.called
+
+        # Missing records are created at once
+        assert first["subdivisions"] == second["subdivisions"]
+        assert first["collections"] == second["collections"]
+        subdivision_pid = SubdivisionRecord.get_pid_by_ref_link(first["subdivisions"][0]["$ref"])
+        collection_pid = CollectionRecord.get_pid_by_ref_link(first["collections"][0]["$ref"])
+        assert not SubdivisionRecord.get_record_by_pid(subdivision_pid)
+        assert not CollectionRecord.get_record_by_pid(collection_pid)
+        flush()
+        assert SubdivisionRecord.get_record_by_pid(subdivision_pid)["name"][0]["value"] == "bge"
+        assert CollectionRecord.get_record_by_pid(collection_pid)["name"][0]["value"] == "Collection 1"
+
+        # Subdivision found by its name
+        data = overdo.do(
+            create_record(
+                """
+                <record>
+                    <datafield tag="980" ind1=" " ind2=" ">
+                        <subfield code="b">HEPFR</subfield>
+                    </datafield>
+                </record>
+                """
+            )
+        )
+        assert data["subdivisions"] == [{"$ref": f"https://sonar.ch/api/subdivisions/{hep['pid']}"}]
+
+    # Outside of a run, the records created during the run are found.
+    assert not subdivision_registry._runs
+    assert not collection_registry._runs
+    data = overdo.do(marc21json)
+    assert data["subdivisions"] == first["subdivisions"]
+    assert data["collections"] == first["collections"]
+
+    # A new run loads the records created.
+    hash_key = CollectionRecord.get_record_by_pid(collection_pid)["hashKey"]
+    with conversion_run():
+        assert collection_registry.get_or_create(hash_key, {}) == collection_pid
+        assert not collection_registry._pending
+
+
+def test_flush_created_meanwhile(app, db, make_organisation):
+    """Test flush of a record created by another process during a run."""
+    make_organisation("unifr")
+    data = {
+        "name": [{"language": "eng", "value": "Collection 2"}],
+        "organisation": {"$ref": "https://sonar.ch/api/organisations/unifr"},
+    }
+
+    with conversion_run():
+        reserved_pid = collection_registry.get_or_create("created-meanwhile", data)
+
+        # Created by another harvest in the meantime
+        existing = CollectionRecord.create({**data, "hashKey": "created-meanwhile"})
+        db.session.commit()
+
+        document = {"collections": [{"$ref": CollectionRecord.get_ref_link("collections", reserved_pid)}]}
+        flush([document])
+        assert document["collections"] == [{"$ref": CollectionRecord.get_ref_link("collections", existing["pid"])}]
+        assert not CollectionRecord.get_record_by_pid(reserved_pid)
+        assert collection_registry.get_or_create("created-meanwhile", data) == existing["pid"]
@@ -0,0 +1,107 @@
+# Swiss Open Access Repository
+# Copyright (C) 2021 RERO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Test cache of the Dublin Core serialization."""
+
+from datetime import date, timedelta
+from unittest import mock
+
+from lxml import etree
+
+from sonar.modules.documents.serializers.dc_cache import dc_cache, get_expiration
+from sonar.modules.metadata_cache import metadata_cache
+
+
+def test_get_expiration(app):
+    """Test validity of a serialization."""
+    tomorrow = (date.today() + timedelta(days=1)).isoformat()
+    next_week = (date.today() + timedelta(days=7)).isoformat()
+
+    # No files
+    assert get_expiration({}) == (True, None)
+
+    # Open access and past embargo
+    assert get_expiration(
+        {
+            "_files": [
+                {"type": "file", "access": "coar:c_abf2"},
+                {"type": "file", "access": "coar:c_f1cf", "embargo_date": "2000-01-01"},
+            ]
+        }
+    ) == (True, None)
+
+    # Until the end of the first embargo
+    assert get_expiration(
+        {
+            "_files": [
+                {"type": "file", "access": "coar:c_f1cf", "embargo_date": next_week},
+                {"type": "file", "access": "coar:c_f1cf", "embargo_date": tomorrow},
+                {"type": "fulltext", "access": "coar:c_16ec", "restricted_outside_organisation": True},
+            ]
+        }
+    ) == (True, tomorrow)
+
+    # Restricted outside organisation, depends on the client
+    assert get_expiration(
+        {"_files": [{"type": "file", "access": "coar:c_16ec", "restricted_outside_organisation": True}]}
+    ) == (False, None)
+    assert get_expiration(
+        {
+            "_files": [
+                {
+                    "type": "file",
+                    "access": "coar:c_f1cf",
+                    "embargo_date": tomorrow,
+                    "restricted_outside_organisation": True,
+                }
+            ]
+        }
+    ) == (False, None)
+
+
+def test_dc_cache_load(app, organisation):
+    """Test load serialization from cache."""
+    app.config["SONAR_APP_DC_CACHE_TIMEOUT"] = 60
+    data = {"pid": "1", "_updated": "2021-01-01T00:00:00+00:00"}
+    build = mock.Mock(side_effect=lambda: etree.fromstring("<dc><title>Title</title></dc>"))
+
+    with app.test_request_context("/oai2d"):
+        assert etree.tostring(dc_cache.load(data, build)) == b"<dc><title>Title</title></dc>"
+        assert etree.tostring(dc_cache.load(data, build)) == b"<dc><title>Title</title></dc>"
+        assert build.call_count == 1
+
+    # Other context
+    with app.test_request_context("/oai2d", base_url="https://other.sonar.ch"):
+        dc_cache.load(data, build)
+        assert build.call_count == 2
+
+    with app.test_request_context("/oai2d"):
+        # Document modified
+        data["_updated"] = "2021-01-02T00:00:00+00:00"
+        dc_cache.load(data, build)
+        assert build.call_count == 3
+        dc_cache.load(data, build)
+        assert build.call_count == 3
+
+        # Organisation modified
+        metadata_cache.invalidate(None, organisation)
+    with app.test_request_context("/oai2d"):
+        dc_cache.load(data, build)
+        assert build.call_count == 4
+
+        # Cache disabled
+        app.config["SONAR_APP_DC_CACHE_TIMEOUT"] = 0
+        dc_cache.load(data, build)
+        assert build.call_count == 5
@@ -163,3 +163,20 @@ def test_urn_create(app, db, bucket_location, organisation_with_urn):
             urn_pid = PersistentIdentifier.get("urn", urn_code)
             assert urn_pid.status == PIDStatus.DELETED
             db.session.rollback()
+
+
+def test_urn_check_digits(app):
+    """Test calculate and validate check digits by batches."""
+    assert Urn._calculate_check_digit("urn:nbn:ch:rero-006-1") == "7"
+    assert Urn.calculate_check_digits(["urn:nbn:ch:rero-006-1", "URN:NBN:CH:RERO-006-1", "urn:nbn:ch:rero-006-2"]) == [
+        "7",
+        "7",
+        "4",
+    ]
+    assert Urn.generate_urns([1, 2], {"code": 6}) == ["urn:nbn:ch:rero-006-17", "urn:nbn:ch:rero-006-24"]
+    assert Urn.validate_urns(["urn:nbn:ch:rero-006-17", "urn:nbn:ch:rero-006-18", "urn:nbn:ch:rero-006-1$", ""]) == [
+        True,
+        False,
+        False,
+        False,
+    ]
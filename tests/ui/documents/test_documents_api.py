@@ -16,9 +16,11 @@
 """Test documents API."""
 
 from copy import deepcopy
+from unittest import mock
 
 from flask import url_for
 from invenio_stats.tasks import aggregate_events, process_events
+from sqlalchemy import event
 
 from sonar.modules.documents.api import DocumentRecord
 
@@ -54,6 +56,51 @@ def test_get_record_by_identifier(app, db, document):
     assert not record
 
 
+def test_get_records_by_identifiers(app, db, document, document_json):
+    """Test getting records by several lists of identifiers at once."""
+    records = DocumentRecord.get_records_by_identifiers(
+        [
+            [{"value": "111111", "type": "bf:Local", "source": "RERO DOC"}],
+            [{"value": "oai:unknown", "type": "bf:Identifier"}],
+            [{"value": "unknown", "type": "bf:Local"}],
+            [],
+        ]
+    )
+    assert records[0]["pid"] == document["pid"]
+    assert records[1:] == [None, None, None]
+
+    # Record not yet indexed
+    data = deepcopy(document_json)
+    data.pop("pid", None)
+    data["identifiedBy"] = [{"value": "222222", "type": "bf:Local", "source": "RERO DOC"}]
+    record = DocumentRecord.create(data, dbcommit=True, with_bucket=True)
+    identifiers_list = [
+        [{"value": "222222", "type": "bf:Local"}],
+        [{"value": "111111", "type": "bf:Local", "source": "RERO DOC"}],
+        [{"value": "222222", "type": "bf:Local", "source": "Unmatching"}],
+    ]
+    assert DocumentRecord.get_records_by_identifiers(identifiers_list)[0] is None
+
+    # Found in database
+    app.config["SONAR_DOCUMENTS_IDENTIFIERS_DB_LOOKUP"] = True
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        records = DocumentRecord.get_records_by_identifiers(identifiers_list)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+    # Containment on the indexed expression
+    assert any("(records_metadata.json -> 'identifiedBy') @> " in statement for statement in statements)
+    assert records[0]["pid"] == record["pid"]
+    assert records[1]["pid"] == document["pid"]
+    assert records[2] is None
+    app.config["SONAR_DOCUMENTS_IDENTIFIERS_DB_LOOKUP"] = False
+
+
 def test_get_next_file_order(db, document_with_file, document):
     """Test getting next file position."""
     # One file with order 1
@@ -83,6 +130,42 @@ def test_get_files_list(db, document, pdf_file):
     assert files[0]["order"] == 1
 
 
+def test_link_file(app, db, document_with_file, document_json):
+    """Test linking a file of another record."""
+    data = deepcopy(document_json)
+    data.pop("pid", None)
+    data.pop("_oai", None)
+    document = DocumentRecord.create(data, dbcommit=True, with_bucket=True)
+    source = document_with_file.files["test1.pdf"]
+
+    with mock.patch("sonar.modules.documents.tasks.create_file_derivatives.delay") as mock_delay:
+        file = document.link_file(source.file, "linked.pdf", deferred=True, order=3)
+        document.commit()
+
+        # Same file instance, without copy
+        assert file.file.id == source.file.id
+        assert file.file.checksum == source.file.checksum
+        assert not file.file.writable
+        assert file["type"] == "file"
+        assert file["label"] == "linked.pdf"
+        assert file["order"] == 3
+        assert document["_files"][0]["key"] == "linked.pdf"
+
+        # Derivatives are created once the transaction is committed.
+        assert "linked-pdf.txt" not in document.files
+        mock_delay.assert_not_called()
+        db.session.commit()
+        mock_delay.assert_called_once_with(str(document.id), "linked.pdf")
+
+    # Already linked
+    assert not document.link_file(source.file, "linked.pdf")
+
+    # Derivatives created immediately
+    document.link_file(source.file, "other.pdf", deferred=False)
+    assert document.files["other-pdf.txt"]["type"] == "fulltext"
+    assert document.files["other-pdf.jpg"]["type"] == "thumbnail"
+
+
 def test_get_documents_by_project(db, project, document):
     """Test getting documents by a project."""
     document["projects"] = [{"$ref": f"https://sonar.ch/api/projects/{project.id}"}]
@@ -204,3 +287,11 @@ def test_affiliations(db, document):
     data["contribution"][0].pop("affiliation", None)
     document.update(data)
     assert "controlledAffiliation" not in document["contribution"][0]
+
+    # Already resolved affiliations
+    data["contribution"][0]["affiliation"] = "Uni of Geneva and HUG"
+    affiliations = DocumentRecord.resolve_affiliations([data, data])
+    assert affiliations == {"Uni of Geneva and HUG": ["University of Geneva and HUG"]}
+    affiliations["Uni of Geneva and HUG"] = ["Resolved"]
+    document.update(data, affiliations=affiliations)
+    assert document["contribution"][0]["controlledAffiliation"] == ["Resolved"]
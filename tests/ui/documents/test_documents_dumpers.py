@@ -16,8 +16,12 @@
 """Test documents recievers."""
 
 import random
+from unittest import mock
 
 from sonar.modules.documents.dumpers import IndexerDumper
+from sonar.modules.documents.fulltext import get_cache_key, get_fulltext_cache
+
+from .benchmark_dumpers import build_corpus, compare, get_loader
 
 
 def test_document_indexer_dumper(document, pdf_file):
@@ -82,3 +86,42 @@ def test_document_indexer_dumper_identifiers(document):
 
     data = document.dumps(IndexerDumper())
     assert data["identifiers"] == res
+
+
+def test_document_indexer_dumper_fulltext_cache(app, document, pdf_file, tmp_path, monkeypatch):
+    """Test fulltext is read from the cache."""
+    monkeypatch.setitem(app.config, "SONAR_DOCUMENTS_FULLTEXT_CACHE", "disk")
+    monkeypatch.setitem(app.config, "SONAR_DOCUMENTS_FULLTEXT_CACHE_PATH", str(tmp_path))
+
+    with open(pdf_file, "rb") as file:
+        document.add_file(file.read(), "test1.pdf", type="file")
+
+    # Cache is populated when the fulltext file is created.
+    key = get_cache_key(document.files["test1-pdf.txt"])
+    text = get_fulltext_cache().get(key)
+    assert "PHYSICAL REVIEW B 99" in text
+
+    # Storage is not read anymore.
+    def storage_error(*args, **kwargs):
+        raise AssertionError("Storage should not be read")
+
+    monkeypatch.setattr("invenio_files_rest.models.FileInstance.storage", storage_error)
+    data = document.dumps(IndexerDumper())
+    assert data["fulltext"] == [text]
+
+    # Redis backend
+    monkeypatch.setitem(app.config, "SONAR_DOCUMENTS_FULLTEXT_CACHE", "redis")
+    cache = get_fulltext_cache()
+    cache.set(key, "cached text")
+    assert document.dumps(IndexerDumper())["fulltext"] == ["cached text"]
+
+    # No expiration by default
+    with mock.patch("sonar.modules.documents.fulltext.current_cache") as current_cache:
+        cache.set(key, "cached text")
+        current_cache.set.assert_called_once_with(f"fulltext:{key}", "cached text", timeout=0)
+
+
+def test_resolve_refs_same_as_jsonref():
+    """Test references resolution gives the same result as jsonref."""
+    differences, *_ = compare(build_corpus(size=10), get_loader())
+    assert not differences
@@ -17,14 +17,16 @@
 
 from os import listdir
 from os.path import exists, join
+from unittest import mock
 
 from invenio_oaiharvester.tasks import get_records
 
 from sonar.modules.documents.receivers import (
-    chunks,
+    _parallel_map,
     export_json,
     transform_harvested_records,
 )
+from sonar.modules.utils import chunks
 
 
 def test_transform_harvested_records(app, bucket_location, capsys):
@@ -38,6 +40,15 @@ def test_transform_harvested_records(app, bucket_location, capsys):
     transform_harvested_records(None, records, name="rerodoc", max="1")
     captured = capsys.readouterr()
     assert captured.out.find("1 records harvested") != -1
+    assert captured.out.find("parse: 1 records") != -1
+    assert captured.out.find("dispatch: 1 records") != -1
+
+    # With a pool of processes
+    app.config["SONAR_DOCUMENTS_HARVEST_PROCESSES"] = 2
+    transform_harvested_records(None, records, name="rerodoc", max="1")
+    captured = capsys.readouterr()
+    assert captured.out.find("1 records harvested") != -1
+    app.config["SONAR_DOCUMENTS_HARVEST_PROCESSES"] = 1
 
     # Max set to 0 --> import all
     transform_harvested_records(None, records, name="rerodoc", max="0")
@@ -50,6 +61,20 @@ def test_transform_harvested_records(app, bucket_location, capsys):
     assert captured.out == ""
 
 
+def test_parallel_map():
+    """Test parsing in a pool of processes."""
+    assert list(_parallel_map(str, range(5), 2)) == ["0", "1", "2", "3", "4"]
+
+    # No pool in a daemonic process, such as a celery worker
+    with (
+        mock.patch("multiprocessing.current_process") as current_process,
+        mock.patch("sonar.modules.documents.receivers.ProcessPoolExecutor") as executor,
+    ):
+        current_process.return_value.daemon = True
+        assert list(_parallel_map(str, range(5), 2)) == ["0", "1", "2", "3", "4"]
+        executor.assert_not_called()
+
+
 def test_chunks():
     """Test chunks."""
     records = chunks([1, 2, 3, 4, 5, 6, 7, 8, 9, 10], 3)
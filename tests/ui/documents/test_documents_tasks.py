@@ -18,16 +18,16 @@
 from unittest import mock
 
 from sonar.modules.documents.api import DocumentRecord
-from sonar.modules.documents.tasks import import_records
+from sonar.modules.documents.tasks import create_file_derivatives, extract_fulltext, import_records
 
 
-@mock.patch("sonar.modules.documents.api.DocumentRecord.get_record_by_identifier")
-def test_import_records(mock_record_by_identifier, app, document_json, bucket_location):
+@mock.patch("sonar.modules.documents.api.DocumentRecord.get_records_by_identifiers")
+def test_import_records(mock_records_by_identifiers, app, document_json, bucket_location):
     """Test import records."""
     files = [{"key": "test.pdf", "url": "http://some.url/file.pdf"}]
 
     # Successful importing record
-    mock_record_by_identifier.return_value = None
+    mock_records_by_identifiers.return_value = [None]
     document_json["files"] = files
     ids = import_records([document_json])
     record = DocumentRecord.get_record(ids[0])
@@ -35,16 +35,69 @@ def test_import_records(mock_record_by_identifier, app, document_json, bucket_lo
     assert record["harvested"]
 
     # Update
-    mock_record_by_identifier.return_value = record
+    mock_records_by_identifiers.return_value = [record]
     ids = import_records([document_json])
     assert DocumentRecord.get_record(ids[0])
 
+    # Affiliations resolved record by record if the chunk resolution fails
+    with mock.patch.object(DocumentRecord, "resolve_affiliations", side_effect=Exception("Error")):
+        ids = import_records([document_json])
+    assert DocumentRecord.get_record(ids[0])
+
     # Error during importation of record
-    def exception_side_effect(data):
-        raise Exception("No record found for identifier")
+    mock_records_by_identifiers.return_value = [None]
+    with mock.patch.object(DocumentRecord, "create", side_effect=Exception("Error during creation")):
+        ids = import_records([document_json])
 
-    mock_record_by_identifier.side_effect = exception_side_effect
+    assert not ids
 
+    # Error during the search of the record
+    mock_records_by_identifiers.return_value = []
+    document_json["identifiedBy"].append({"value": "No type"})
     ids = import_records([document_json])
 
     assert not ids
+    mock_records_by_identifiers.assert_called_with([])
+
+
+def test_extract_fulltext(app, db, document, pdf_file):
+    """Test deferred fulltext extraction."""
+    app.config["SONAR_DOCUMENTS_EXTRACT_FULLTEXT_DEFERRED"] = True
+
+    with mock.patch("sonar.modules.documents.tasks.extract_fulltext.delay") as mock_delay:
+        with open(pdf_file, "rb") as file:
+            document.add_file(file, "test1.pdf")
+        document.commit()
+        assert "test1-pdf.txt" not in document.files
+        mock_delay.assert_not_called()
+
+        # Task is sent once the transaction is committed.
+        db.session.commit()
+        mock_delay.assert_called_once_with(str(document.id), "test1.pdf")
+
+    app.config["SONAR_DOCUMENTS_EXTRACT_FULLTEXT_DEFERRED"] = False
+
+    extract_fulltext(str(document.id), "test1.pdf")
+    record = DocumentRecord.get_record(document.id)
+    assert record.files["test1-pdf.txt"]["type"] == "fulltext"
+
+    # File removed in the meantime
+    extract_fulltext(str(document.id), "unknown.pdf")
+
+
+def test_create_file_derivatives(app, db, document_with_file):
+    """Test creation of the fulltext and the thumbnail of a file."""
+    document = document_with_file
+    with mock.patch("sonar.modules.documents.tasks.create_file_derivatives.delay"):
+        document.link_file(document.files["test1.pdf"].file, "linked.pdf", deferred=True)
+        document.commit()
+        db.session.commit()
+    assert "linked-pdf.txt" not in document.files
+
+    create_file_derivatives(str(document.id), "linked.pdf")
+    record = DocumentRecord.get_record(document.id)
+    assert record.files["linked-pdf.txt"]["type"] == "fulltext"
+    assert record.files["linked-pdf.jpg"]["type"] == "thumbnail"
+
+    # File removed in the meantime
+    create_file_derivatives(str(document.id), "unknown.pdf")
@@ -17,6 +17,8 @@
 
 """Test OAIPMH URLS."""
 
+from sonar.modules.documents.oaipmh_utils import getrecord_fetcher, getrecords_fetcher
+
 
 def test_oaipmh_get(client, app, document):
     """Test OAIPMH API."""
@@ -31,3 +33,30 @@ def test_oaipmh_get(client, app, document):
     res = client.get("/oai2d?verb=GetRecord&metadataPrefix=oai_dc&identifier=oai:sonar.ch:1")
     assert res.status_code == 200
     assert "<setSpec>org</setSpec>" in res.text
+
+
+def test_getrecords_fetcher(app, document_with_file, monkeypatch):
+    """Test fetching records for OAIPMH."""
+
+    def read_fulltext(file):
+        raise AssertionError("Fulltext must not be read")
+
+    monkeypatch.setattr("sonar.modules.documents.dumpers.read_fulltext", read_fulltext)
+
+    with app.test_request_context():
+        records = getrecords_fetcher([document_with_file.id])
+        record = records[str(document_with_file.id)]
+        assert record["pid"] == document_with_file["pid"]
+        assert record["updated"]
+        assert record["organisation"][0]["pid"] == "org"
+        assert "ips" not in record["organisation"][0]
+        assert "fulltext" not in record
+        assert record["identifiers"]["local"] == ["111111", "R003415713"]
+
+        # Data fetched with the page is reused
+        assert getrecord_fetcher(document_with_file.id) is record
+
+    # Without request
+    record = getrecord_fetcher(document_with_file.id)
+    assert record["pid"] == document_with_file["pid"]
+    assert "fulltext" not in record
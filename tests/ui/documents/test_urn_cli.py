@@ -15,13 +15,19 @@
 
 """Test URN cli."""
 
+import json
+import re
 from io import BytesIO
 from unittest import mock
 
+import requests_mock
 from click.testing import CliRunner
+from invenio_db import db
+from invenio_pidstore.models import PersistentIdentifier, PIDStatus
 from invenio_pidstore.providers.base import BaseProvider
 
-from sonar.modules.documents.cli.urn import snl_upload_file
+from sonar.modules.documents.cli.urn import check, create, snl_upload_file
+from sonar.modules.documents.models import UrnIdentifier
 from sonar.snl.ftp import SNLRepository
 
 
@@ -66,3 +72,62 @@ def test_snl_upload_file(mock_ftp_constructor, app, script_info, minimal_thesis_
         )
         assert "Template of email to send to SNL:" in result.output
         mock_ftp.mkdir.assert_called_with("/rero/rero-006-17")
+
+
+def test_create(app, script_info, organisation_with_urn, document):
+    """Test create and register URNs."""
+    document["documentType"] = "coar:c_db06"
+    document.commit()
+    db.session.commit()
+    document.reindex()
+
+    # Stub of the DNB REST API
+    registered = {}
+
+    def create_urn(request, context):
+        data = request.json()
+        registered[data["urn"]] = data["urls"]
+        context.status_code = 201
+        return data
+
+    def check_urn(request, context):
+        context.status_code = 200 if request.path.split("/")[-1] in registered else 404
+        return ""
+
+    runner = CliRunner()
+    base_url = app.config.get("SONAR_APP_URN_DNB_BASE_URL")
+    with mock.patch.object(UrnIdentifier, "next", return_value="1"), requests_mock.Mocker() as dnb:
+        dnb.head(re.compile(rf"{base_url}/urns/urn/.*"), text=check_urn)
+        dnb.post(f"{base_url}/urns", json=create_urn)
+        result = runner.invoke(create, ["--batch-size", "1", "--workers", "2"], obj=script_info)
+
+    assert "1 URN created, 1 URN registered." in result.output
+    urn_code = "urn:nbn:ch:rero-006-17"
+    assert registered == {
+        urn_code: [
+            {
+                "url": f"https://{app.config.get('SONAR_APP_SERVER_NAME')}/org/documents/{document['pid']}",
+                "priority": 1,
+            }
+        ]
+    }
+    assert json.loads(dnb.request_history[1].body)["urn"] == urn_code
+    assert PersistentIdentifier.get("urn", urn_code).status == PIDStatus.REGISTERED
+
+    # Nothing left to create
+    result = runner.invoke(create, obj=script_info)
+    assert "0 URN created, 0 URN registered." in result.output
+
+
+def test_check(app, script_info, minimal_thesis_document_with_urn):
+    """Test verify the check digits of the URNs."""
+    runner = CliRunner()
+    result = runner.invoke(check, obj=script_info)
+    assert "1 URN checked" in result.output
+    assert "0 invalid." in result.output
+
+    BaseProvider.create(pid_type="urn", pid_value="urn:nbn:ch:rero-006-18")
+    result = runner.invoke(check, ["--batch-size", "1"], obj=script_info)
+    assert "Invalid check digit: urn:nbn:ch:rero-006-18" in result.output
+    assert "2 URN checked" in result.output
+    assert "1 invalid." in result.output
@@ -17,8 +17,91 @@
 
 import json
 import os
+import subprocess
+from unittest import mock
 
-from sonar.modules.pdf_extractor.utils import format_extracted_data
+import pytest
+
+from sonar.modules.pdf_extractor import utils
+from sonar.modules.pdf_extractor.utils import (
+    extract_text_from_content,
+    extract_text_from_file,
+    format_extracted_data,
+    get_fulltext_backend,
+)
+
+
+def test_extract_text_from_content(app):
+    """Test full-text extraction."""
+    pdf_file = os.path.join(os.path.dirname(__file__), "data", "preprint.pdf")
+    with open(pdf_file, "rb") as file:
+        content = file.read()
+
+    app.config["PDF_EXTRACTOR_FULLTEXT_BACKEND"] = "pdftotext"
+    assert get_fulltext_backend() == "pdftotext"
+    text = extract_text_from_content(content)
+    assert text
+    assert "\n" not in text
+    assert extract_text_from_file(pdf_file) == text
+
+    # Limited number of pages
+    app.config["PDF_EXTRACTOR_FULLTEXT_MAX_PAGES"] = 1
+    with mock.patch("subprocess.run", wraps=subprocess.run) as run:
+        extract_text_from_content(content)
+        assert run.call_args[0][0][3:5] == ["-l", "1"]
+    app.config["PDF_EXTRACTOR_FULLTEXT_MAX_PAGES"] = 2000
+
+    # Not a PDF
+    with pytest.raises(subprocess.CalledProcessError):
+        extract_text_from_content(b"Not a PDF")
+
+    # Timeout
+    timeout = subprocess.TimeoutExpired("pdftotext", 1)
+    with mock.patch("subprocess.run", side_effect=timeout), pytest.raises(subprocess.TimeoutExpired):
+        extract_text_from_content(content)
+
+    # PDFium not installed
+    app.config["PDF_EXTRACTOR_FULLTEXT_BACKEND"] = "pdfium"
+    with mock.patch("sonar.modules.pdf_extractor.utils.find_spec", return_value=None), pytest.raises(ImportError):
+        get_fulltext_backend()
+
+    app.config["PDF_EXTRACTOR_FULLTEXT_BACKEND"] = "auto"
+    assert get_fulltext_backend() in ["pdfium", "pdftotext"]
+
+
+def test_extract_text_with_pdfium(app):
+    """Test full-text extraction with PDFium workers."""
+    pytest.importorskip("pypdfium2")
+    pdf_file = os.path.join(os.path.dirname(__file__), "data", "preprint.pdf")
+    with open(pdf_file, "rb") as file:
+        content = file.read()
+
+    app.config["PDF_EXTRACTOR_FULLTEXT_BACKEND"] = "pdfium"
+    text = extract_text_from_content(content)
+    assert text
+    assert "\n" not in text
+
+    # The worker is kept for the next extractions
+    worker = utils._pdfium_workers[-1]
+    app.config["PDF_EXTRACTOR_FULLTEXT_MAX_PAGES"] = 1
+    assert len(extract_text_from_content(content)) < len(text)
+    app.config["PDF_EXTRACTOR_FULLTEXT_MAX_PAGES"] = 2000
+
+    # Not a PDF, the worker is still used
+    with pytest.raises(subprocess.CalledProcessError):
+        extract_text_from_content(b"Not a PDF")
+    assert utils._pdfium_workers[-1] is worker
+
+    # Timeout, the worker is killed and a new one is started
+    app.config["PDF_EXTRACTOR_FULLTEXT_TIMEOUT"] = 0.0001
+    with pytest.raises(subprocess.TimeoutExpired):
+        extract_text_from_content(content)
+    assert worker not in utils._pdfium_workers
+    assert worker.process.poll() is not None
+    app.config["PDF_EXTRACTOR_FULLTEXT_TIMEOUT"] = 120
+    assert extract_text_from_content(content) == text
+
+    app.config["PDF_EXTRACTOR_FULLTEXT_BACKEND"] = "auto"
 
 
 def test_format_extracted_data(app):
@@ -21,7 +21,7 @@ import xml.etree.ElementTree as ET
 from datetime import date
 
 from sonar.modules.documents.api import DocumentRecord
-from sonar.modules.sitemap.sitemap import sitemap_generate
+from sonar.modules.sitemap.sitemap import _split_entries, sitemap_generate
 
 
 def test_sitemap(app, db, organisation, document):
@@ -87,6 +87,55 @@ def test_sitemap(app, db, organisation, document):
         assert f"https://org.domain.com/org/documents/{i}" == url.find(f"{namespace}loc").text
         assert date.today().strftime("%Y-%m-%d") == url.find(f"{namespace}lastmod").text
 
+    # ------- Incremental generation, only the file of the updated document
+    # is written
+    sitemap_generate("org.domain.com", 1, incremental=True)
+    files = {i: os.stat(os.path.join(path, organisation["pid"], f"sitemap_{i}.xml")).st_ino for i in range(1, 3)}
+    doc["title"][0]["mainTitle"][0]["value"] = "Updated title"
+    doc.commit()
+    doc.reindex()
+    db.session.commit()
+
+    sitemap_generate("org.domain.com", 1, incremental=True)
+    assert os.stat(os.path.join(path, organisation["pid"], "sitemap_1.xml")).st_ino == files[1]
+    assert os.stat(os.path.join(path, organisation["pid"], "sitemap_2.xml")).st_ino != files[2]
+
+    # Files written again when the server name changes
+    organisation["serverName"] = "other.domain.com"
+    organisation.commit()
+    organisation.reindex()
+    db.session.commit()
+    sitemap_generate("other.domain.com", 1, incremental=True)
+    assert os.stat(os.path.join(path, organisation["pid"], "sitemap_1.xml")).st_ino != files[1]
+    tree = ET.parse(os.path.join(path, organisation["pid"], "sitemap_1.xml"))
+    url = tree.findall(f"{namespace}url")[0]
+    assert url.find(f"{namespace}loc").text == "https://other.domain.com/org/documents/1"
+
+    # Back to a single file, the files of the previous generation are removed
+    sitemap_generate("other.domain.com", 10, incremental=True)
+    assert sorted(os.listdir(os.path.join(path, organisation["pid"]))) == ["sitemap.json", "sitemap.xml"]
+    tree = ET.parse(os.path.join(path, organisation["pid"], "sitemap.xml"))
+    assert len(tree.findall(f"{namespace}url")) == 2
+
     # Remove folder after test
     if os.path.isdir(path):
         shutil.rmtree(path, ignore_errors=True)
+
+
+def test_split_entries():
+    """Test split of the documents in files."""
+
+    def split(pids, size, starts):
+        entries = [(str(pid), "2024-01-01") for pid in pids]
+        return [[pid for pid, _ in file_entries] for file_entries in _split_entries(entries, size, starts)]
+
+    assert split(range(1, 8), 3, []) == [["1", "2", "3"], ["4", "5", "6"], ["7"]]
+
+    # The ranges of the last generation are kept, new documents are added to
+    # the last file.
+    assert split([1, 3, 4, 5, 6, 7, 8, 9, 10], 3, ["1", "4", "7"]) == [
+        ["1", "3"],
+        ["4", "5", "6"],
+        ["7", "8", "9"],
+        ["10"],
+    ]
@@ -25,8 +25,11 @@ from invenio_app.factory import create_api
 from invenio_pidstore.models import PersistentIdentifier, Redirect
 from six import BytesIO
 
-from sonar.modules.api import SonarRecord
+from sonar.modules.api import SonarRecord, _buckets_pids
 from sonar.modules.documents.api import DocumentIndexer, DocumentRecord
+from sonar.modules.refresh import get_index_alias, refresh_metrics, refresh_policy, refresh_scheduler
+from sonar.modules.refs_cache import get_refs_cache, refs_cache
+from sonar.modules.utils import resolve_refs
 
 create_app = create_api
 
@@ -64,6 +67,81 @@ def test_remove_from_index(client, db, document, superuser):
     assert res.json["hits"]["total"]["value"] == (total - 1)
 
 
+def test_index_refresh_policies(app, db, document_json):
+    """Test refresh policies when indexing a record."""
+    record = DocumentRecord.create(deepcopy(document_json), commit=True)
+    indexer = DocumentIndexer()
+    refresh_metrics.reset()
+
+    for policy in ["flush", "refresh", "wait_for"]:
+        indexer.index(record, refresh=policy)
+        assert DocumentRecord.get_record_by_identifier(record["identifiedBy"])
+
+    info = refresh_metrics.info()["documents"]
+    assert info == {"writes": 3, "refreshes": 2, "saved": 1}
+
+    # Deferred refresh, coalesced into one refresh.
+    with refresh_policy("deferred"):
+        indexer.index(record)
+        indexer.index(record)
+        assert refresh_scheduler.pending == ["documents"]
+    assert not refresh_scheduler.pending
+    assert refresh_metrics.info()["documents"] == {"writes": 5, "refreshes": 3, "saved": 2}
+
+    # No refresh
+    indexer.delete(record, refresh="none")
+    assert refresh_metrics.info()["documents"] == {"writes": 6, "refreshes": 3, "saved": 3}
+
+    with pytest.raises(ValueError), refresh_policy("unknown"):
+        pass
+
+    assert get_index_alias("documents-document-v1.0.0") == "documents"
+    assert get_index_alias("subdivisions") == "subdivisions"
+
+
+def test_refs_cache(app, db, organisation, document):
+    """Test cache of the resources linked by `$ref`."""
+    assert not get_refs_cache()
+
+    with refs_cache() as cache:
+        # Nested contexts share the same cache.
+        with refs_cache() as nested_cache:
+            assert nested_cache is cache
+
+        # Prefetch, all organisations are loaded at once.
+        cache.prefetch([document, document])
+        assert cache.get(document["organisation"][0]["$ref"])["pid"] == "org"
+
+        data = resolve_refs(document)
+        assert data["organisation"][0]["pid"] == "org"
+        assert "$schema" not in data["organisation"][0]
+        resolve_refs(document)
+        assert cache.hits == 2
+        assert cache.misses == 0
+
+        # Cache is invalidated when the organisation is updated.
+        organisation["name"] = "Updated"
+        organisation.commit()
+        db.session.commit()
+        assert not cache.get(document["organisation"][0]["$ref"])
+        assert resolve_refs(document)["organisation"][0]["name"] == "Updated"
+        assert cache.misses == 1
+
+    assert not get_refs_cache()
+
+    # Expired entries
+    with refs_cache(ttl=0) as cache:
+        resolve_refs(document)
+        resolve_refs(document)
+        assert cache.misses == 2
+
+    # Bulk indexing with prefetch
+    indexer = DocumentIndexer()
+    indexer.bulk_index([document.id])
+    indexer.process_bulk_queue()
+    assert DocumentRecord.get_record_by_identifier(document["identifiedBy"])
+
+
 def test_get_record_class_by_pid_type(app):
     """Test get record class by PID type."""
     record = SonarRecord.get_record_class_by_pid_type("doc")
@@ -281,6 +359,33 @@ def test_get_record_by_bucket(app, db, document_with_file):
     assert not SonarRecord.get_record_by_bucket(document_with_file["_bucket"])
 
 
+def test_get_records_by_buckets(app, db, document_with_file, deposit):
+    """Test retrieving the records of several buckets at once."""
+    bucket = document_with_file["_bucket"]
+    records = SonarRecord.get_records_by_buckets([bucket, deposit["_bucket"], "invalid"])
+    assert records[bucket]["pid"] == document_with_file["pid"]
+    assert isinstance(records[bucket], DocumentRecord)
+    assert records[deposit["_bucket"]]["pid"] == deposit["pid"]
+    assert records["invalid"] is None
+
+    # PIDs are cached, least recently used buckets are removed.
+    assert _buckets_pids[bucket] == ("doc", document_with_file["pid"])
+    _buckets_pids.clear()
+    app.config["SONAR_APP_BUCKETS_CACHE_SIZE"] = 1
+    assert SonarRecord.get_record_by_bucket(bucket)
+    assert SonarRecord.get_record_by_bucket(deposit["_bucket"])
+    assert list(_buckets_pids) == [deposit["_bucket"]]
+    app.config["SONAR_APP_BUCKETS_CACHE_SIZE"] = 10000
+
+    # Same instance for the request, until the record is updated.
+    with app.test_request_context():
+        record = SonarRecord.get_records_by_buckets([bucket], memoize=True)[bucket]
+        assert SonarRecord.get_records_by_buckets([bucket], memoize=True)[bucket] is record
+        assert SonarRecord.get_records_by_buckets([bucket])[bucket] is not record
+        record.commit()
+        assert SonarRecord.get_records_by_buckets([bucket], memoize=True)[bucket] is not record
+
+
 def test_sync_files(document_with_file):
     """Test update files for record."""
     document_with_file.sync_files(document_with_file.files["test1.pdf"])
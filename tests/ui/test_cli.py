@@ -16,13 +16,16 @@
 """Test CLI for utils."""
 
 from io import BytesIO
-from os.path import isdir
+from os.path import exists, isdir
 
 import invenio_accounts.cli as cliusers
 from click.testing import CliRunner
 from invenio_search.cli import destroy
 
 import sonar.modules.cli.utils as cli
+from sonar.modules.exporter import CHECKPOINT_FILE, DATA_FILE, RecordsExporter
+from sonar.modules.organisations.api import OrganisationRecord
+from sonar.modules.utils import read_json_records
 
 
 def test_es_init(app, script_info, search_clear):
@@ -48,10 +51,11 @@ def test_clear_files(app, script_info, bucket_location):
     assert result.output.find(f"Directory {bucket_location.uri} cannot be cleaned") != -1
 
 
-def test_export(app, script_info, document, organisation):
+def test_export(app, script_info, document, organisation, tmpdir):
     """Test export command."""
     # Add file to organisation
     organisation.files["logo.jpg"] = BytesIO(b"File content")
+    organisation.commit()
 
     runner = CliRunner()
 
@@ -64,12 +68,33 @@ def test_export(app, script_info, document, organisation):
     assert result.output.find('No record class found for type "fake"') != -1
 
     # Without export serializer
-    result = runner.invoke(cli.export, ["--pid-type", "doc", "--output-dir", "/tmp/doc"], obj=script_info)
+    result = runner.invoke(cli.export, ["--pid-type", "doc", "--output-dir", str(tmpdir / "doc")], obj=script_info)
     assert result.output.find('Export "doc" records') != -1
+    assert result.output.find("Finished, 1 records exported") != -1
 
     # With serializer
-    result = runner.invoke(cli.export, ["--pid-type", "org", "--output-dir", "/tmp/org"], obj=script_info)
+    output_dir = tmpdir / "org"
+    result = runner.invoke(cli.export, ["--pid-type", "org", "--output-dir", str(output_dir)], obj=script_info)
     assert result.output.find('Export "org" records') != -1
+    with open(output_dir / DATA_FILE) as file:
+        records = list(read_json_records(file))
+    assert [record["code"] for record in records] == ["org"]
+    assert records[0]["files"][0]["path"] == "./org/logo.jpg"
+    assert (output_dir / "org" / "logo.jpg").read_binary() == b"File content"
+    assert not exists(output_dir / CHECKPOINT_FILE)
+
+    # Resume an interrupted export, records written after the checkpoint are
+    # removed.
+    with open(output_dir / DATA_FILE, "a") as file:
+        file.write('{"partial')
+    exporter = RecordsExporter(OrganisationRecord, str(output_dir))
+    exporter.write_checkpoint({"pid_type": "org", "last_id": 0, "size": 0, "count": 0})
+    result = runner.invoke(
+        cli.export, ["--pid-type", "org", "--output-dir", str(output_dir), "--resume", "--hardlink"], obj=script_info
+    )
+    assert result.output.find("Finished, 1 records exported") != -1
+    with open(output_dir / DATA_FILE) as file:
+        assert [record["code"] for record in read_json_records(file)] == ["org"]
 
 
 def test_cli_access_token(app, db, script_info):
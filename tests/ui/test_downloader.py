@@ -0,0 +1,58 @@
+# Swiss Open Access Repository
+# Copyright (C) 2021 RERO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Test concurrent download of external files."""
+
+from os.path import exists
+
+import requests_mock
+
+from sonar.modules.downloader import FileDownloader
+
+
+def test_file_downloader(app):
+    """Test file downloader."""
+    with requests_mock.mock() as response, FileDownloader(retries=0) as downloader:
+        response.get("https://some.url/file1.pdf", content=b"File 1")
+        response.get("https://some.url/file2.pdf", content=b"File 2")
+        response.get("https://other.url/file3.pdf", status_code=404)
+
+        files = downloader.download(
+            [
+                "https://some.url/file1.pdf",
+                "https://some.url/file2.pdf",
+                "https://other.url/file3.pdf",
+                "https://some.url/file1.pdf",
+            ]
+        )
+        assert len(files) == 3
+        with open(files["https://some.url/file1.pdf"], "rb") as file:
+            assert file.read() == b"File 1"
+        assert not files["https://other.url/file3.pdf"]
+        assert response.call_count == 3
+
+        # Already downloaded
+        assert downloader.get("https://some.url/file2.pdf") == files["https://some.url/file2.pdf"]
+        assert response.call_count == 3
+
+        # Not yet downloaded
+        response.get("https://some.url/file4.pdf", content=b"File 4")
+        assert downloader.get("https://some.url/file4.pdf")
+        assert response.call_count == 4
+
+        path = files["https://some.url/file1.pdf"]
+
+    # Files are removed when downloader is closed.
+    assert not exists(path)
@@ -0,0 +1,47 @@
+# Swiss Open Access Repository
+# Copyright (C) 2021 RERO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Test cache of organisations, collections and subdivisions."""
+
+from unittest import mock
+
+from sonar.modules.metadata_cache import metadata_cache
+from sonar.modules.organisations.api import OrganisationRecord
+
+
+def test_get_record(app, db, organisation):
+    """Test getting records from the cache."""
+    metadata_cache.clear()
+
+    record = metadata_cache.get_record(OrganisationRecord, organisation["pid"])
+    assert record["name"] == organisation["name"]
+    assert isinstance(record, OrganisationRecord)
+
+    # No database access, and a new record each time.
+    with mock.patch.object(OrganisationRecord, "get_record_by_pid") as get_record_by_pid:
+        record["name"] = "Modified"
+        assert metadata_cache.get_record(OrganisationRecord, organisation["pid"])["name"] == organisation["name"]
+        get_record_by_pid.assert_not_called()
+
+    # Unknown record
+    assert not metadata_cache.get_record(OrganisationRecord, "unknown")
+    assert metadata_cache.info()["org"] == {"hits": 1, "misses": 2, "entries": 1}
+
+    # Updated record
+    organisation["name"] = "Updated"
+    organisation.commit()
+    db.session.commit()
+    assert metadata_cache.get_record(OrganisationRecord, organisation["pid"])["name"] == "Updated"
+    assert metadata_cache.info()["org"]["misses"] == 3
@@ -16,6 +16,7 @@
 """Test deposits utils."""
 
 import os
+from io import StringIO
 
 import pytest
 from flask import g
@@ -154,6 +155,35 @@ def test_is_ip_in_list():
     assert is_ip_in_list("10.10.10.10", ["10.10.10.0/24"])
 
 
+def test_get_ip_matcher():
+    """Test compiled IP ranges."""
+    matcher = get_ip_matcher("10.10.10.*\n192.168.1.3-5\n172.16.0.0/12\n2001:db8::/32\nwrong\n")
+    assert get_ip_matcher("10.10.10.*\n192.168.1.3-5\n172.16.0.0/12\n2001:db8::/32\nwrong\n") is matcher
+    assert "10.10.10.0" in matcher
+    assert "10.10.10.255" in matcher
+    assert "10.10.11.0" not in matcher
+    assert "192.168.1.2" not in matcher
+    assert "192.168.1.5" in matcher
+    assert "192.168.1.6" not in matcher
+    assert "172.31.255.255" in matcher
+    assert "2001:db8::1" in matcher
+    assert "2001:db9::1" not in matcher
+    assert "1.1.1.1" not in matcher
+    assert "wrong" not in matcher
+    assert None not in matcher
+
+    # Empty list
+    assert "10.10.10.10" not in get_ip_matcher("")
+    assert "10.10.10.10" not in get_ip_matcher(None)
+
+
+def test_read_json_records():
+    """Test reading records from a JSON list or JSON lines."""
+    assert list(read_json_records(StringIO('\n[{"pid": "1"}, {"pid": "2"}]'))) == [{"pid": "1"}, {"pid": "2"}]
+    assert list(read_json_records(StringIO('{"pid": "1"}\n\n{"pid": "2"}\n'))) == [{"pid": "1"}, {"pid": "2"}]
+    assert list(read_json_records(StringIO(""))) == []
+
+
 def test_remove_html():
     """Test remove html markup from string."""
     assert remove_html("No HTML") == "No HTML"
@@ -0,0 +1,181 @@
+# Swiss Open Access Repository
+# Copyright (C) 2021 RERO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmark of the affiliations resolver.
+
+Compare the compiled matcher with the former linear scan over all variants.
+
+Usage: `python -m tests.unit.affiliations.benchmark [FILE]`, where FILE
+contains one affiliation string per line (for example exported from the
+contributions of the documents). Without file, a corpus is generated from
+the variants of the affiliations list.
+"""
+
+import random
+import time
+
+import click
+from fuzzywuzzy import fuzz
+
+from sonar.affiliations import AffiliationMatcher, AffiliationResolver
+
+DEPARTMENTS = [
+    "Department of Biology",
+    "Institute of Physics",
+    "Faculty of Medicine",
+    "Clinic for Cardiovascular Surgery",
+    "Laboratory of Computational Science",
+    "Graduate School for Cellular and Biomedical Sciences",
+    "Division of Infectious Diseases",
+    "Research Center for Economics",
+]
+
+ADDRESSES = [
+    "Raemistrasse 100, 8091 Zurich, Switzerland",
+    "Rue Michel-Servet 1, 1211 Geneva, Switzerland",
+    "Hochschulstrasse 6, 3012 Bern, Switzerland",
+    "Bd de Pérolles 90, 1700 Fribourg, Switzerland",
+    "Switzerland",
+    "",
+]
+
+FOREIGN_AFFILIATIONS = [
+    "Universitat Pompeu Fabra (UPF), Barcelona 08003, Spain",
+    "Hospital del Mar Medical Research Institute (IMIM), Barcelona, Spain",
+    "University of Freiburg, Freiburg im Breisgau, Germany",
+    "Max Planck Institute for Biology, Tübingen, Germany",
+    "Department of Statistics, University of Oxford, United Kingdom",
+    "Harvard Medical School, Boston, MA, USA",
+    "Institut Pasteur, Paris, France",
+    "Lucerne Cantonal Hospital, Lucerne, Switzerland",
+]
+
+
+def legacy_resolve(affiliations, searched_affiliation):
+    """Resolve affiliations by comparing the string with every variant.
+
+    This is the implementation used before the compiled matcher.
+
+    :param affiliations: List of affiliations.
+    :param searched_affiliation: Affiliation to match.
+    :returns: List of matching standard forms.
+    """
+    if not searched_affiliation:
+        return None
+
+    collected_affiliations = []
+    for variants in affiliations:
+        standard_form = variants[0]
+        for affiliation in variants:
+            score = fuzz.partial_ratio(searched_affiliation, affiliation)
+            if score > 92 and standard_form not in collected_affiliations:
+                if (
+                    affiliation.lower() == "zurich university"
+                    and "zurich university of the arts" in searched_affiliation.lower()
+                ):
+                    continue
+                if affiliation.lower() == "cern" and "lucerne" in searched_affiliation.lower():
+                    continue
+                if "university of freiburg" in searched_affiliation.lower():
+                    break
+
+                collected_affiliations.append(standard_form)
+    return collected_affiliations
+
+
+def build_corpus(affiliations, size=3000, seed=42):
+    """Build a corpus of affiliation strings as found in harvested records.
+
+    :param affiliations: List of affiliations.
+    :param size: Number of strings.
+    :param seed: Seed of the random generator, for reproducible corpora.
+    :returns: List of strings.
+    """
+    generator = random.Random(seed)
+    variants = [variant for row in affiliations for variant in row]
+    corpus = []
+    while len(corpus) < size:
+        if generator.random() < 0.2:
+            corpus.append(generator.choice(FOREIGN_AFFILIATIONS))
+            continue
+
+        variant = generator.choice(variants)
+        if generator.random() < 0.3:
+            variant = variant.lower()
+        if generator.random() < 0.1 and len(variant) > 10:
+            # Typo
+            position = generator.randrange(len(variant))
+            variant = variant[:position] + variant[position + 1 :]
+        parts = [generator.choice(DEPARTMENTS), variant, generator.choice(ADDRESSES)]
+        if generator.random() < 0.2:
+            parts.insert(2, generator.choice(variants))
+        corpus.append(", ".join(part for part in parts if part))
+    return corpus
+
+
+def compare(affiliations, rejections, corpus):
+    """Resolve all strings of the corpus with both implementations.
+
+    :param affiliations: List of affiliations.
+    :param rejections: List of rejected matches.
+    :param corpus: List of affiliation strings.
+    :returns: Tuple (list of differences, legacy duration, matcher duration,
+        memoized matcher duration).
+    """
+    start = time.perf_counter()
+    legacy_results = [legacy_resolve(affiliations, value) for value in corpus]
+    legacy_duration = time.perf_counter() - start
+
+    matcher = AffiliationMatcher(affiliations, rejections)
+    start = time.perf_counter()
+    results = [list(matcher.resolve(value)) for value in corpus]
+    duration = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for value in corpus:
+        matcher.resolve(value)
+    memo_duration = time.perf_counter() - start
+
+    differences = [
+        (value, legacy, result) for value, legacy, result in zip(corpus, legacy_results, results) if legacy != result
+    ]
+    return differences, legacy_duration, duration, memo_duration
+
+
+@click.command()
+@click.argument("file", type=click.File("r"), required=False)
+@click.option("--size", default=3000, help="Size of the generated corpus.")
+def benchmark(file, size):
+    """Compare the compiled matcher with the linear scan.
+
+    :param file: File containing one affiliation per line.
+    :param size: Size of the generated corpus.
+    """
+    resolver = AffiliationResolver()
+    corpus = [line.strip() for line in file if line.strip()] if file else build_corpus(resolver.affiliations, size)
+
+    differences, legacy_duration, duration, memo_duration = compare(resolver.affiliations, resolver.rejections, corpus)
+
+    click.echo(f"Affiliations: {len(corpus)} ({len(set(corpus))} unique)")
+    click.echo(f"Linear scan: {legacy_duration:.3f}s")
+    click.echo(f"Compiled matcher: {duration:.3f}s (x{legacy_duration / duration:.1f})")
+    click.echo(f"Compiled matcher, memoized: {memo_duration:.3f}s")
+    click.echo(f"Differences: {len(differences)}")
+    for value, legacy, result in differences:
+        click.secho(f"{value}: {legacy} != {result}", fg="red")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -17,6 +17,8 @@
 
 from sonar.affiliations import AffiliationResolver
 
+from .benchmark import build_corpus, compare
+
 
 def test_affiliations_property():
     """Test loading affiliations from file."""
@@ -66,3 +68,47 @@ def test_resolve():
 
     test_string = "University of Freiburg"
     assert not affiliation_resolver.resolve(test_string)
+
+
+def test_rejections_property():
+    """Test loading rejected matches from file."""
+    affiliation_resolver = AffiliationResolver()
+    assert ("cern", "lucerne") in affiliation_resolver.rejections
+    assert (None, "university of freiburg") in affiliation_resolver.rejections
+
+
+def test_matcher_same_as_linear_scan():
+    """Test compiled matcher gives the same results as the linear scan."""
+    affiliation_resolver = AffiliationResolver()
+    corpus = build_corpus(affiliation_resolver.affiliations, size=100)
+    differences, *_ = compare(affiliation_resolver.affiliations, affiliation_resolver.rejections, corpus)
+    assert not differences
+
+
+def test_resolve_memoized():
+    """Test resolved affiliations are memoized and not shared."""
+    affiliation_resolver = AffiliationResolver()
+    test_string = "Department of Biology, University of Bern"
+    result = affiliation_resolver.resolve(test_string)
+    assert result == ["University of Bern and Hospital"]
+    result.append("Modified")
+    assert AffiliationResolver().resolve(test_string) == ["University of Bern and Hospital"]
+    assert affiliation_resolver.matcher.resolve.cache_info().hits >= 1
+
+
+def test_resolve_many():
+    """Test resolving several affiliations at once."""
+    affiliation_resolver = AffiliationResolver()
+    test_strings = [
+        "Department of Biology, University of Bern",
+        None,
+        "Institute of Physics, ETH Zurich, Switzerland",
+        "Department of Biology, University of Bern",
+        "Not existing",
+    ]
+    expected = {
+        "Department of Biology, University of Bern": ["University of Bern and Hospital"],
+        "Institute of Physics, ETH Zurich, Switzerland": ["ETH Zurich"],
+        "Not existing": [],
+    }
+    assert affiliation_resolver.resolve_many(test_strings) == expected
@@ -15,6 +15,8 @@
 
 """Test data integrity monitoring."""
 
+from unittest import mock
+
 import pytest
 from invenio_search import current_search
 
@@ -113,6 +115,27 @@ def test_info(app, search_clear, document, project, deposit):
     assert info["projects"]["es"] == 1
 
 
+def test_cached_info(app, search_clear, document):
+    """Test info kept in cache."""
+    monitoring = DataIntegrityMonitoring()
+    app.config["SONAR_APP_DATA_INTEGRITY_CACHE_TTL"] = 60
+
+    info, timestamp = monitoring.cached_info()
+    assert info["doc"]["db-es"] == 0
+    with mock.patch.object(DataIntegrityMonitoring, "info") as mock_info:
+        assert monitoring.cached_info() == (info, timestamp)
+        mock_info.assert_not_called()
+
+    # Refresh
+    document.delete()
+    assert monitoring.cached_info()[0]["doc"]["db-es"] == 0
+    info, refresh_timestamp = monitoring.cached_info(refresh=True)
+    assert info["doc"]["db-es"] == -1
+    assert refresh_timestamp != timestamp
+
+    app.config["SONAR_APP_DATA_INTEGRITY_CACHE_TTL"] = 0
+
+
 def test_has_error(app, search_clear, document):
     """Test if data has error."""
     # No error